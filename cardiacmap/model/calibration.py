@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+
+from cardiacmap.model.npy import map_numpy_array
+from cardiacmap.model.stream import CHUNK_READERS, DEFAULT_CHUNK_FRAMES, iter_frames
+
+
+class Calibration:
+    """Dark-frame subtraction and flat-field normalization of raw frames:
+
+        corrected = (raw - dark) * mean(flat - dark) / (flat - dark)
+
+    Both frames are in the layout the loaders return, (H, W), and either may be None.
+    Pixels where the flat field is not above the dark level are zeroed. The correction
+    is applied while raw frames are converted to float32, so it needs no extra pass over
+    the recording and no full-size temporaries.
+    """
+
+    def __init__(self, dark: np.ndarray = None, flat: np.ndarray = None):
+        self.dark = None if dark is None else np.asarray(dark, dtype=np.float32)
+        self.flat = None if flat is None else np.asarray(flat, dtype=np.float32)
+
+        self.gain = None
+        if self.flat is not None:
+            response = self.flat - self.dark if self.dark is not None else self.flat
+            valid = response > 0
+            self.gain = np.zeros(response.shape, dtype=np.float32)
+            if valid.any():
+                np.divide(response[valid].mean(), response, out=self.gain, where=valid)
+
+    @property
+    def shape(self):
+        return (self.dark if self.dark is not None else self.flat).shape
+
+    def crop(self, xs: slice, ys: slice) -> "Calibration":
+        """Calibration for a region of the frames"""
+        cropped = Calibration()
+        cropped.dark = None if self.dark is None else self.dark[xs, ys]
+        cropped.flat = None if self.flat is None else self.flat[xs, ys]
+        cropped.gain = None if self.gain is None else self.gain[xs, ys]
+        return cropped
+
+    def apply(self, frames, out: np.ndarray = None) -> np.ndarray:
+        """Correct a block of frames into float32. `out` may be `frames` itself, if
+        that is already float32.
+
+        Args:
+            frames (array): raw frames of size (frame, H, W), any dtype
+            out (array, optional): preallocated float32 output of the same size
+
+        Returns:
+            out: float32 array of size (frame, H, W)
+        """
+        if frames.shape[1:] != self.shape:
+            raise ValueError(
+                f"Calibration frames are {self.shape}, the recording's frames are {frames.shape[1:]}"
+            )
+        if out is None:
+            out = np.empty(frames.shape, dtype=np.float32)
+
+        # converting and subtracting in one ufunc call avoids a float copy of the block
+        if self.dark is not None:
+            np.subtract(frames, self.dark, out=out)
+        elif out is not frames:
+            out[...] = frames
+        if self.gain is not None:
+            out *= self.gain
+        return out
+
+
+def read_mean_frame(filepath: str, chunk_frames: int = DEFAULT_CHUNK_FRAMES) -> np.ndarray:
+    """Average the frames of a recording (e.g. a dark or flat-field recording) into one
+    (H, W) float32 frame, reading a block at a time, the next one while the current one
+    is summed. A 2D .npy / .npz array is taken as the frame itself.
+
+    Args:
+        filepath (str): Input file path, any of stream.CHUNK_READERS
+        chunk_frames (int): number of frames read at a time
+
+    Returns:
+        frame: float32 array of size (H, W)
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext in (".npy", ".npz"):
+        array = map_numpy_array(filepath)
+        if array.ndim == 2:
+            return np.asarray(array, dtype=np.float32)
+    if ext not in CHUNK_READERS:
+        raise ValueError(f"Cannot read calibration frames from {ext} files")
+
+    total, count = None, 0
+    for chunk in iter_frames(filepath, chunk_frames):
+        chunk_sum = np.sum(chunk, axis=0, dtype=np.float64)
+        total = chunk_sum if total is None else total + chunk_sum
+        count += len(chunk)
+    if not count:
+        raise ValueError(f"{os.path.basename(filepath)} holds no frames")
+
+    # iter_frames blocks are (t, y, x); calibration frames are (H, W) as the loaders read them
+    return np.ascontiguousarray((total / count).T, dtype=np.float32)
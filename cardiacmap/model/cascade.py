@@ -4,29 +4,23 @@ import struct
 import numpy as np
 
 from cardiacmap.model.data import CardiacSignal
-from cardiacmap.viewer.components import large_file_check
+from cardiacmap.model.planner import large_file_check
 from typing import Dict
 
 
-def read_cascade_data(filepath: str, largeFilePopup) -> np.ndarray:
-    """Load raw data from cascade .dat files. Returns a 3D signal array. Can be used in load_cascade_file
-    as the helper method to parse the .dat file or by itself for debug
+def read_cascade_header(file) -> Dict:
+    """Parse the header of an open cascade .dat file. Leaves the file positioned at
+    the first frame.
 
     Args:
-        filepath (str): Input file path
-        largeFilePopup (func): callback function to open popup window for larger-than-memory files
+        file (BinaryIO): File opened in binary mode, positioned at the start
 
     Returns:
-        metadata: dict of metadata
-        imarray: numpy array of size (frame, H, W)
+        header: dict with metadata, span_T / span_X / span_Y, skip_bytes (per-frame
+            trailer), endian and offset (byte offset of the first frame)
     """
-    file = open(filepath, "rb")
-    filename = os.path.basename(filepath)
-
     endian = "<"
-
-    metadata = {"filename": filename}
-    sigarray = None
+    metadata = {}
 
     # First byte of the data is the file version
     file_version = file.read(1).decode()
@@ -72,36 +66,91 @@ def read_cascade_data(filepath: str, largeFilePopup) -> np.ndarray:
 
         skip_bytes = 8
 
-    # This reads the actual signal data
-    skip = skip_bytes // 2
+    else:
+        raise ValueError(f"Unknown cascade file version: {file_version!r}")
+
+    return dict(
+        metadata=metadata,
+        span_T=span_T,
+        span_X=span_X,
+        span_Y=span_Y,
+        skip_bytes=skip_bytes,
+        endian=endian,
+        offset=file.tell(),
+    )
+
+
+def map_cascade_frames(filepath: str, header: Dict) -> np.memmap:
+    """Memory-map the frames of a cascade .dat file without reading them. Each frame
+    on disk is span_X * span_Y uint16 values followed by a skip_bytes trailer; the
+    trailer is stepped over via the frame stride, so no data is copied and pages are
+    only read from disk when a frame or pixel trace is accessed.
+
+    Args:
+        filepath (str): Input file path
+        header (dict): Parsed header from read_cascade_header
+
+    Returns:
+        frames: read-only memmap view of size (frame, H, W)
+    """
+    span_X, span_Y = header["span_X"], header["span_Y"]
+    dt = np.dtype(header["endian"] + "u2")
+    frame_words = span_X * span_Y + header["skip_bytes"] // dt.itemsize
+
+    # Clamp to the frames actually present, in case the recording was cut short
+    available = (os.path.getsize(filepath) - header["offset"]) // (frame_words * dt.itemsize)
+    span_T = min(header["span_T"], available)
+
+    frames = np.memmap(
+        filepath, dtype=dt, mode="r", offset=header["offset"], shape=(span_T, frame_words)
+    )
+
+    # Dropping the trailer columns and splitting the pixel axis are both views
+    return frames[:, : span_X * span_Y].reshape(span_T, span_X, span_Y)
+
+
+def read_cascade_data(filepath: str, largeFilePopup) -> np.ndarray:
+    """Load raw data from cascade .dat files. Returns a 3D signal array. Can be used in load_cascade_file
+    as the helper method to parse the .dat file or by itself for debug. The signal array is a
+    memory-mapped view over the file, so opening is near-instant regardless of file size.
+
+    Args:
+        filepath (str): Input file path
+        largeFilePopup (func): callback function to open popup window for larger-than-memory files
+
+    Returns:
+        metadata: dict of metadata
+        imarray: numpy array of size (frame, H, W)
+    """
+    filename = os.path.basename(filepath)
+
+    with open(filepath, "rb") as file:
+        header = read_cascade_header(file)
+
+    metadata = {"filename": filename}
+    metadata.update(header["metadata"])
+    sigarray = None
 
-    trimFrames = large_file_check(filepath, largeFilePopup, span_T)
+    span_T = header["span_T"]
+    span_X = header["span_X"]
+    span_Y = header["span_Y"]
+
+    trimFrames = large_file_check(
+        filepath, largeFilePopup, span_T, span_X, span_Y, itemsize=2, mappable=True
+    )
     print(trimFrames)
     if trimFrames is not None:
-        if trimFrames[1] == 0:
-            sigarray = np.frombuffer(file.read(), dtype="uint16")
-        else:
-            file.read(
-                trimFrames[0] * 2 * span_X * span_Y + trimFrames[0] * skip_bytes
-            )  # skip
-            sigarray = np.frombuffer(
-                file.read(
-                    trimFrames[1] * 2 * span_X * span_Y + trimFrames[1] * skip_bytes
-                ),
-                dtype="uint16",
-            )  # read
-            span_T = trimFrames[1]  # set new spanT
-
-        sigarray = sigarray.reshape(span_T, -1)[:, :-skip].reshape(
-            span_T, span_X, span_Y
-        )
+        sigarray = map_cascade_frames(filepath, header)
+
+        if trimFrames[1] != 0:
+            sigarray = sigarray[trimFrames[0] : trimFrames[0] + trimFrames[1]]
+
+        span_T = len(sigarray)
 
         metadata["span_T"] = span_T
         metadata["span_X"] = span_X
         metadata["span_Y"] = span_Y
 
-    file.close()
-
     return metadata, sigarray
 
 
@@ -137,3 +186,25 @@ def load_cascade_file(filepath, largeFilePopup, dual_mode=False) -> Dict[int, Ca
 
     return signals
 
+
+
+def iter_cascade_chunks(filepath: str, chunk_frames: int, start: int = 0, end: int = None):
+    """Yield consecutive blocks of raw frames from a cascade .dat file, read through the
+    memory map so only the requested frames are pulled from disk.
+
+    Args:
+        filepath (str): Input file path
+        chunk_frames (int): number of frames per block
+        start (int): first frame to read
+        end (int, optional): frame to stop at (exclusive). Defaults to the end of the file.
+
+    Yields:
+        chunk: uint16 array of size (chunk_frames, H, W); the last block may be shorter
+    """
+    with open(filepath, "rb") as file:
+        header = read_cascade_header(file)
+    frames = map_cascade_frames(filepath, header)
+
+    end = len(frames) if end is None else min(end, len(frames))
+    for i in range(start, end, chunk_frames):
+        yield frames[i : min(i + chunk_frames, end)]
@@ -0,0 +1,112 @@
+import numpy as np
+
+from cardiacmap.transforms.transforms import CHUNK_BYTES
+
+
+class PixelMap:
+    """Index map between (t, y, x) data and a compacted (t, n) layout holding only the
+    n pixels inside a mask, so work and memory scale with tissue area rather than
+    sensor area"""
+
+    def __init__(self, mask: np.ndarray):
+        mask = np.asarray(mask)
+        self.frame_shape = mask.shape
+        # flat (y * span_X + x) index of each stored pixel, in row-major order
+        self.flat = np.flatnonzero(mask)
+        # column of each pixel in the compacted layout, -1 outside the mask
+        self.columns = np.full(mask.shape, -1, dtype=np.intp)
+        self.columns.flat[self.flat] = np.arange(len(self.flat))
+
+    @property
+    def size(self) -> int:
+        """Number of pixels stored"""
+        return len(self.flat)
+
+    @property
+    def column_mask(self) -> np.ndarray:
+        """Mask in the compacted layout: every stored pixel is inside it"""
+        return np.ones(self.size)
+
+    def compact(self, data, dtype=None) -> np.ndarray:
+        """Gather the masked pixels of (t, y, x) data into a new (t, n) array, a block
+        of frames at a time"""
+        dtype = np.dtype(dtype or data.dtype)
+        out = np.empty((len(data), self.size), dtype=dtype)
+        itemsize = max(dtype.itemsize, np.dtype(data.dtype).itemsize)
+        step = self._block_frames(itemsize * int(np.prod(self.frame_shape)))
+        for i in range(0, len(data), step):
+            block = np.asarray(data[i : i + step])
+            out[i : i + len(block)] = block.reshape(len(block), -1)[:, self.flat]
+        return out
+
+    def scatter(self, values: np.ndarray, fill=0, dtype=None) -> np.ndarray:
+        """Lay compacted (..., n) values back out as (..., y, x) frames, with `fill`
+        outside the mask"""
+        values = np.asarray(values)
+        size = int(np.prod(self.frame_shape))
+        out = np.full(values.shape[:-1] + (size,), fill, dtype=dtype or values.dtype)
+        out[..., self.flat] = values
+        return out.reshape(values.shape[:-1] + self.frame_shape)
+
+    def map_frames(self, func, values: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """Apply `func`, which takes and returns (t, y, x) frames, to compacted (t, n)
+        values a block of frames at a time. For transforms that need the spatial layout,
+        e.g. spatial averaging."""
+        out = values if out is None else out
+        step = self._block_frames(values.dtype.itemsize * int(np.prod(self.frame_shape)))
+        for i in range(0, len(values), step):
+            frames = func(self.scatter(values[i : i + step]))
+            out[i : i + len(frames)] = frames.reshape(len(frames), -1)[:, self.flat]
+        return out
+
+    @staticmethod
+    def _block_frames(frame_bytes: int) -> int:
+        return max(1, CHUNK_BYTES // max(1, frame_bytes))
+
+
+class CompactFrames:
+    """Array-like (t, y, x) view of compacted (t, n) pixel data. Indexing lays out only
+    the frames and pixels asked for, so reading a trace or a frame stays cheap;
+    np.asarray lays out the whole recording, e.g. for display."""
+
+    ndim = 3
+
+    def __init__(self, values: np.ndarray, pixels: PixelMap):
+        self.values = values
+        self.pixels = pixels
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def shape(self):
+        return (len(self.values),) + self.pixels.frame_shape
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    def __array__(self, dtype=None, copy=None):
+        return self.pixels.scatter(self.values, dtype=dtype)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if len(key) > 3 or any(k is Ellipsis or k is None for k in key):
+            return np.asarray(self)[key]
+        key = key + (slice(None),) * (3 - len(key))
+        if not all(isinstance(k, (slice, int, np.integer)) for k in key[1:]):
+            # anything but basic indexing of the pixels reads the frames asked for in full
+            return self.pixels.scatter(self.values[key[0]])[(Ellipsis,) + key[1:]]
+
+        t, y, x = key
+        columns = self.pixels.columns[y, x]
+        if columns.ndim == 0:
+            # a single pixel: its trace, or zeros outside the mask
+            trace = self.values[t, max(columns, 0)]
+            return trace if columns >= 0 else np.zeros_like(trace)
+        values = self.values[t]
+        out = np.zeros(values.shape[:-1] + columns.shape, dtype=values.dtype)
+        inside = columns >= 0
+        out[..., inside] = values[..., columns[inside]]
+        return out
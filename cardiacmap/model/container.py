@@ -0,0 +1,399 @@
+import concurrent.futures as cf
+import hashlib
+import json
+import os
+import pickle
+import struct
+import threading
+import weakref
+import zlib
+from functools import lru_cache
+from typing import Dict
+
+import numpy as np
+
+from cardiacmap.model.data import CardiacSignal
+from cardiacmap.model.history import TransformHistory
+from cardiacmap.model.pipeline import RegionCache
+
+# File layout:
+#   MAGIC | uint64 header offset | uint64 header length | chunk data ... | JSON header
+# The JSON header is written last so chunks can be streamed to disk, and holds the
+# metadata, analysis state and, for each array, its chunk grid, chunk index and a digest
+# of each chunk's raw bytes. Session files (see session.py) append changed chunks and a
+# new header, then repoint the preamble, so the header need not be the last thing in it.
+MAGIC = b"CMAPSIG1"
+PREAMBLE = struct.Struct("<8sQQ")
+
+# (frames, rows, columns) per chunk: a frame range or a single pixel trace only
+# decodes the chunks it overlaps
+CHUNK_SHAPE = (64, 16, 16)
+CHUNK_CACHE_SIZE = 256
+
+
+class ChunkedArray:
+    """Read-only array stored as a grid of (optionally zlib-compressed) chunks. Indexing
+    with slices / integers decodes only the chunks that overlap the selection."""
+
+    def __init__(self, file, spec: Dict, lock: threading.Lock):
+        self.file = file
+        self.lock = lock
+        self.shape = tuple(spec["shape"])
+        self.dtype = np.dtype(spec["dtype"])
+        self.chunk_shape = tuple(spec["chunk_shape"])
+        self.compression = spec["compression"]
+        self.index = spec["chunks"]
+        self.grid = tuple(-(-s // c) for s, c in zip(self.shape, self.chunk_shape))
+        self.read_chunk = lru_cache(maxsize=CHUNK_CACHE_SIZE)(self._read_chunk)
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __array__(self, dtype=None, copy=None):
+        data = self.read()
+        return data if dtype is None else data.astype(dtype)
+
+    def min(self):
+        return min(block.min() for block in self._frame_blocks())
+
+    def max(self):
+        return max(block.max() for block in self._frame_blocks())
+
+    def _frame_blocks(self):
+        # one row of chunks at a time, so reductions never decode the whole array
+        step = self.chunk_shape[0]
+        for i in range(0, len(self), step):
+            yield self[i : i + step]
+
+    def _chunk_bounds(self, chunk_pos):
+        return [
+            (p * c, min((p + 1) * c, s))
+            for p, c, s in zip(chunk_pos, self.chunk_shape, self.shape)
+        ]
+
+    def _read_chunk(self, chunk_idx: int) -> np.ndarray:
+        offset, nbytes = self.index[chunk_idx]
+        if hasattr(os, "pread"):
+            buffer = os.pread(self.file.fileno(), nbytes, offset)
+        else:
+            with self.lock:
+                self.file.seek(offset)
+                buffer = self.file.read(nbytes)
+        if self.compression == "zlib":
+            buffer = zlib.decompress(buffer)
+
+        chunk_pos = np.unravel_index(chunk_idx, self.grid)
+        shape = [hi - lo for lo, hi in self._chunk_bounds(chunk_pos)]
+        return np.frombuffer(buffer, dtype=self.dtype).reshape(shape)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),) * (self.ndim - len(key))
+
+        ranges, squeeze = [], []
+        for axis, k in enumerate(key):
+            if isinstance(k, slice):
+                start, stop, step = k.indices(self.shape[axis])
+                if step != 1:
+                    return self.read()[key]
+                ranges.append((start, max(start, stop)))
+            else:
+                k = int(k)
+                if k < 0:
+                    k += self.shape[axis]
+                if not 0 <= k < self.shape[axis]:
+                    raise IndexError(f"index {k} is out of bounds for axis {axis}")
+                ranges.append((k, k + 1))
+                squeeze.append(axis)
+
+        out = self.read(ranges)
+        return out.squeeze(axis=tuple(squeeze)) if squeeze else out
+
+    def read(self, ranges=None, threads: int = 1) -> np.ndarray:
+        """Decode the region given by per-axis (start, stop) ranges into a new array.
+        Defaults to the whole array. Chunks are decoded on `threads` threads (zlib
+        releases the GIL)."""
+        if ranges is None:
+            ranges = [(0, s) for s in self.shape]
+        out = np.empty([hi - lo for lo, hi in ranges], dtype=self.dtype)
+
+        chunk_ranges = [
+            range(lo // c, -(-hi // c)) for (lo, hi), c in zip(ranges, self.chunk_shape)
+        ]
+
+        def copy_chunk(chunk_pos):
+            bounds = self._chunk_bounds(chunk_pos)
+            src, dst = [], []
+            for (lo, hi), (c_lo, c_hi) in zip(ranges, bounds):
+                a, b = max(lo, c_lo), min(hi, c_hi)
+                src.append(slice(a - c_lo, b - c_lo))
+                dst.append(slice(a - lo, b - lo))
+            chunk_idx = int(np.ravel_multi_index(chunk_pos, self.grid))
+            out[tuple(dst)] = self.read_chunk(chunk_idx)[tuple(src)]
+
+        positions = np.ndindex(*[len(r) for r in chunk_ranges])
+        positions = [tuple(r[p] for r, p in zip(chunk_ranges, pos)) for pos in positions]
+        if threads > 1:
+            with cf.ThreadPoolExecutor(max_workers=threads) as executor:
+                list(executor.map(copy_chunk, positions))
+        else:
+            for pos in positions:
+                copy_chunk(pos)
+        return out
+
+
+class SignalContainer:
+    """Lazily opened chunked .signal file. Only the JSON header is read on open; arrays
+    are exposed as ChunkedArray objects that decode chunks on demand.
+
+    Usage:
+        with SignalContainer(path) as container:
+            frames = container["data"][100:200]
+            trace = container["data"][:, y, x]
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.file = open(filepath, "rb")
+        magic, header_offset, header_len = PREAMBLE.unpack(self.file.read(PREAMBLE.size))
+        if magic != MAGIC:
+            self.file.close()
+            raise ValueError(f"{filepath} is not a chunked signal container")
+        self.file.seek(header_offset)
+        self.header = json.loads(self.file.read(header_len).decode())
+        self.metadata = self.header["metadata"]
+        self.state = self.header["state"]
+        lock = threading.Lock()
+        self.arrays = {
+            name: ChunkedArray(self.file, spec, lock) for name, spec in self.header["arrays"].items()
+        }
+
+    def __getitem__(self, name) -> ChunkedArray:
+        return self.arrays[name]
+
+    def __contains__(self, name):
+        return name in self.arrays
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+
+def is_signal_container(filepath: str) -> bool:
+    with open(filepath, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _json_default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def encode_header(metadata: Dict, state: Dict, specs: Dict) -> bytes:
+    return json.dumps(
+        dict(format=1, metadata=metadata, state=state, arrays=specs),
+        default=_json_default,
+    ).encode()
+
+
+def _write_array(
+    file, array, chunk_shape, compression, level, previous: Dict = None, check=None, frames=(0, None)
+) -> Dict:
+    """Write `array` chunk by chunk at the end of `file` and return its spec. Chunks
+    whose bytes match those of `previous`, the spec of an earlier write of the same
+    array to the same file, are not written again: their entry is reused. Chunks
+    outside `frames`, the range [start, end) of the first axis that changed since
+    `previous` was written (an end of None means to the last), are not even read.
+    `check` is called after each chunk is read, e.g. to stop if the array changed
+    meanwhile."""
+    if not hasattr(array, "shape"):
+        array = np.asarray(array)
+    chunk_shape = tuple(max(1, min(c, s)) for c, s in zip(chunk_shape, array.shape))
+    grid = tuple(-(-s // c) for s, c in zip(array.shape, chunk_shape))
+    spec = dict(
+        shape=list(array.shape),
+        dtype=np.dtype(array.dtype).str,
+        chunk_shape=list(chunk_shape),
+        compression=compression,
+    )
+    if previous is not None and any(previous.get(k) != v for k, v in spec.items()):
+        previous = None
+    previous_digests = (previous or {}).get("digests")
+
+    start, end = (0, None) if previous is None else (frames or (0, 0))
+    end = array.shape[0] if end is None else end
+
+    index, digests = [], []
+    for i, chunk_pos in enumerate(np.ndindex(*grid)):
+        region = tuple(
+            slice(p * c, min((p + 1) * c, s))
+            for p, c, s in zip(chunk_pos, chunk_shape, array.shape)
+        )
+        if previous_digests and not (region[0].start < end and start < region[0].stop):
+            index.append(previous["chunks"][i])
+            digests.append(previous_digests[i])
+            continue
+        buffer = np.ascontiguousarray(array[region]).tobytes()
+        if check is not None:
+            check()
+        digests.append(hashlib.blake2b(buffer, digest_size=16).hexdigest())
+        if previous_digests and previous_digests[i] == digests[-1]:
+            index.append(previous["chunks"][i])
+            continue
+        if compression == "zlib":
+            buffer = zlib.compress(buffer, level)
+        index.append([file.tell(), len(buffer)])
+        file.write(buffer)
+
+    return dict(spec, chunks=index, digests=digests)
+
+
+def write_signal_container(
+    filepath: str,
+    arrays: Dict[str, np.ndarray],
+    metadata: Dict,
+    state: Dict,
+    chunk_shape=CHUNK_SHAPE,
+    compression="zlib",
+    level: int = 1,
+):
+    """Write named arrays plus JSON metadata / state to a chunked container.
+
+    Args:
+        filepath (str): Output file path
+        arrays (dict): name -> array. 3D arrays are chunked by chunk_shape, lower
+            dimensional arrays are stored as a single chunk.
+        metadata (dict): file metadata
+        state (dict): JSON-serializable analysis state
+        chunk_shape (tuple): (frames, rows, columns) per chunk
+        compression (str, optional): "zlib" or None
+        level (int): zlib compression level
+    """
+    tmp_path = filepath + ".part"
+    with open(tmp_path, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, 0, 0))
+
+        specs = {}
+        for name, array in arrays.items():
+            array_chunks = chunk_shape if np.ndim(array) == 3 else np.shape(array)
+            specs[name] = _write_array(f, array, array_chunks, compression, level)
+
+        header = encode_header(metadata, state, specs)
+        header_offset = f.tell()
+        f.write(header)
+        f.seek(0)
+        f.write(PREAMBLE.pack(MAGIC, header_offset, len(header)))
+    os.replace(tmp_path, filepath)
+
+
+def signal_arrays(data, state: Dict) -> Dict[str, np.ndarray]:
+    """Arrays a signal is saved as: its (t, y, x) data, mask and ragged per-pixel
+    lists. They are popped from `state`, a signal's get_state(), leaving what goes into
+    the JSON header. Ragged lists are stored flattened, with each element's shape and
+    dtype so they load back as they were (see _unpack_ragged)."""
+    arrays = {"data": data, "mask": np.asarray(state.pop("mask"))}
+    ragged_dtypes = {}
+    for attr in CardiacSignal.RAGGED_STATE_ATTRS:
+        values = [np.asarray(v) for v in state.pop(attr)]
+        if len(values):
+            dtypes = sorted({v.dtype.str for v in values})
+            ragged_dtypes[attr] = dtypes
+            arrays[attr + ".values"] = np.concatenate([np.ravel(v) for v in values])
+            arrays[attr + ".lengths"] = np.array([v.size for v in values])
+            arrays[attr + ".ndims"] = np.array([v.ndim for v in values])
+            arrays[attr + ".shapes"] = np.array([n for v in values for n in v.shape], dtype=np.int64)
+            arrays[attr + ".dtypes"] = np.array([dtypes.index(v.dtype.str) for v in values])
+    state["ragged_dtypes"] = ragged_dtypes
+    return arrays
+
+
+def _unpack_ragged(container: "SignalContainer", attr: str, dtypes) -> list:
+    # the list of arrays signal_arrays stored as attr
+    values = container[attr + ".values"].read()
+    lengths = container[attr + ".lengths"].read()
+    elements = np.split(values, np.cumsum(lengths)[:-1])
+    if attr + ".ndims" not in container:
+        # written before shapes and dtypes were kept
+        return elements
+    ndims = container[attr + ".ndims"].read()
+    shapes = np.split(container[attr + ".shapes"].read(), np.cumsum(ndims)[:-1])
+    codes = container[attr + ".dtypes"].read()
+    return [
+        element.astype(dtypes[code]).reshape(tuple(shape))
+        for element, shape, code in zip(elements, shapes, codes)
+    ]
+
+
+def save_signal(signal: CardiacSignal, filepath: str, compression="zlib"):
+    """Save a signal's transformed data and analysis state to a chunked .signal file.
+    Data is written straight from the signal, without copying the whole object."""
+    state = signal.get_state()
+    arrays = signal_arrays(signal.transformed_data, state)
+    state["channel"] = signal.channel
+    write_signal_container(filepath, arrays, signal.metadata, state, compression=compression)
+
+
+def load_signal(filepath: str, threads: int = 4, lazy: bool = False) -> CardiacSignal:
+    """Load a .signal file into a CardiacSignal. Chunked containers are decoded in
+    parallel into a single array, or with `lazy` left in the file as the signal's
+    base_data, which decodes chunks as they are read; older pickled .signal files are
+    still supported."""
+    if not is_signal_container(filepath):
+        with open(filepath, "rb") as f:
+            signal = pickle.load(f)
+        # repopulate data fields; None reads through to base_data
+        signal.pipeline = []
+        signal.region_cache = RegionCache()
+        signal._data_version = 0
+        signal._changed_frames = (0, None)
+        signal._pixel_data = None
+        signal.transformed_data = signal.__dict__.pop("transformed_data", None)
+        signal.__dict__.pop("previous_transform", None)
+        signal.history = TransformHistory()
+        signal.working_dtype = np.dtype(CardiacSignal.WORKING_DTYPE)
+        signal.pixels = None
+        # older files pickled a float64 image_data; it is remade on first use
+        signal.__dict__.pop("image_data", None)
+        signal.image_data = None
+        signal._base_image = None
+        if not hasattr(signal, "transform_history"):
+            signal.transform_history = []
+        return signal
+
+    container = SignalContainer(filepath)
+    try:
+        state = dict(container.state)
+        data = container["data"] if lazy else container["data"].read(threads=threads)
+        if "mask" in container:
+            state["mask"] = container["mask"].read()
+        ragged_dtypes = state.pop("ragged_dtypes", {})
+        for attr in CardiacSignal.RAGGED_STATE_ATTRS:
+            if attr + ".values" in container:
+                state[attr] = _unpack_ragged(container, attr, ragged_dtypes.get(attr))
+
+        signal = CardiacSignal.from_saved(
+            data, container.metadata, state.pop("channel", "Single"), state
+        )
+    except BaseException:
+        container.close()
+        raise
+    if lazy:
+        # the file stays open for the data to read from, until the data (which signals
+        # sharing it also hold, see CardiacSignal.share) is garbage collected
+        weakref.finalize(data, container.file.close)
+    else:
+        container.close()
+    return signal
@@ -1,17 +1,30 @@
-from copy import deepcopy
+import weakref
 from typing import Dict, List, Literal, Tuple
 
 import numpy as np
 
+from cardiacmap.model.compact import CompactFrames, PixelMap
+from cardiacmap.model.history import (
+    Affine,
+    Deferred,
+    FrameDelta,
+    Snapshot,
+    TransformHistory,
+    frame_union,
+)
+from cardiacmap.model import pipeline
+from cardiacmap.model.pipeline import Region, RegionCache, evaluate_region, input_regions
 from cardiacmap.transforms import (
     ButterworthFilter,
     FFT,
+    GetThresholdIntersections,
     InvertSignal,
     NormalizeData,
     NormalizeDataGlobal,
     RemoveBaselineDrift,
     SpatialAverage,
     Stacking,
+    ComputeDtype,
     TimeAverage,
     TrimSignal,
 )
@@ -36,6 +49,18 @@ class CardiacSignal:
     mask: np.ndarray
     spatial_apds = []
 
+    # float32 transformed_data, about as much again for the undo history and again for its
+    # pixel-major copy, plus float16 image_data. base_data is the loader's array itself and
+    # is accounted for by the planner.
+    RESIDENT_BYTES_PER_SAMPLE = 3 * 4 + 2
+
+    # The display image only needs to be good to a few significant digits
+    IMAGE_DTYPE = np.float16
+    IMAGE_CHUNK_FRAMES = 256
+
+    # Default dtype transformed_data is stored in; see set_precision
+    WORKING_DTYPE = np.float32
+
     def __init__(
         self,
         signal: np.ndarray,
@@ -55,23 +80,67 @@ class CardiacSignal:
         # This is transposed to account go y-x instead of x-y
         signal = signal.transpose(0, 2, 1)
 
-        # This is the single source of truth that will be referred to again
-        self.base_data = deepcopy(signal).astype(np.float32)
-
-        # Variable to hold the data signal for transformations. We use np.float32 to conserve memory
-        self.transformed_data = deepcopy(signal).astype(np.float32)
+        # This is the single source of truth that will be referred to again. It is kept
+        # as the loader's array (a view, possibly strided over a memory-mapped file, e.g.
+        # one channel of a dual recording) rather than copied
+        self.base_data = signal
 
-        # Extra copy to save the previous transform in case user wants to undo an action
-        self.previous_transform = deepcopy(signal).astype(np.float32)
+        # Variable to hold the data signal for transformations. We use np.float32 to conserve memory.
+        # Until the first transform this is None and transformed_data reads base_data
+        self._transformed_data = None
 
-        # This is the base image data
-        self.image_data = (signal - signal.min()) / signal.max()
+        # This is the base image data, made from base_data on first use
+        self._image_data = None
 
         # This is the length of the data
         self.span_T = len(signal)
         self.span_Y = len(signal[0])
         self.span_X = len(signal[0][0])
 
+        self._init_state()
+
+    @classmethod
+    def from_saved(
+        cls,
+        data: np.ndarray,
+        metadata: Dict[str, str],
+        channel: Literal["Single", "Odd", "Even"],
+        state: Dict = None,
+    ):
+        """Rebuild a signal from saved (t, y, x) float32 data without the extra copies
+        __init__ makes. The saved data becomes base_data, as with pickled .signal files.
+        """
+        signal = cls.__new__(cls)
+        signal.metadata = metadata
+        signal.channel = channel
+        signal.signal_name = (state or {}).get("signal_name") or (
+            metadata.get("filename", "").split(".")[0]
+            if channel == "Single"
+            else metadata.get("filename", "").split(".")[0] + "_" + channel
+        )
+
+        signal.base_data = data
+        signal._transformed_data = None
+        signal._image_data = None
+
+        signal.span_T, signal.span_Y, signal.span_X = data.shape
+
+        signal._init_state()
+        if state:
+            signal.set_state(state)
+        return signal
+
+    def share(self) -> "CardiacSignal":
+        """Another signal over the same recording, as if it were loaded again, sharing
+        base_data and base_image rather than copying them. Its working copy is made on
+        its first transform as usual, so its transforms, mask and analysis are its own.
+        """
+        signal = CardiacSignal.from_saved(self.base_data, self.metadata, self.channel)
+        signal.image_data = self.base_image
+        signal._base_image = weakref.ref(signal.image_data)
+        return signal
+
+    def _init_state(self):
         self.trimmed = [0, 0]
 
         # Inverted Flag, used when accessing base_data
@@ -96,6 +165,273 @@ class CardiacSignal:
         # Mask to isolate relevant bits of the signal only
         self.mask = np.ones((self.span_Y, self.span_X))
 
+        # Index map of the masked pixels while the working data is stored compacted as
+        # (t, n), see apply_mask. None while it is stored as (t, y, x)
+        self.pixels = None
+
+        # Log of transforms applied to transformed_data, oldest first
+        self.transform_history = []
+
+        # Undo / redo steps for transformed_data
+        self.history = TransformHistory()
+
+        # dtype transformed_data is stored in; transforms compute in at least float32
+        self.working_dtype = np.dtype(self.WORKING_DTYPE)
+
+        # Transforms recorded but not yet run over the whole recording, oldest first.
+        # transformed_data runs them; transformed_region evaluates just the part asked for
+        self.pipeline = []
+        self.region_cache = RegionCache()
+        # bumped whenever the data the pipeline starts from changes
+        self._data_version = 0
+        # frames [start, end) of that data changed since take_changed_frames last ran,
+        # None if none did; an end of None means to the last frame
+        self._changed_frames = (0, None)
+        # pixel-major copy of that data, made on first use; see pixel_data
+        self._pixel_data = None
+        # weak reference to base_image, once made
+        self._base_image = None
+
+    # scalar attributes saved alongside the data
+    STATE_ATTRS = [
+        "signal_name",
+        "trimmed",
+        "inverted",
+        "show_baseline",
+        "apdThreshold",
+        "show_apd_threshold",
+        "transform_history",
+    ]
+    # per-pixel lists of arrays saved alongside the data
+    RAGGED_STATE_ATTRS = [
+        "baselineX",
+        "baselineY",
+        "apdDIThresholdIdxs",
+        "apds",
+        "apd_indices",
+        "dis",
+        "di_indices",
+    ]
+
+    def get_state(self) -> Dict:
+        """Analysis state other than the signal data, for saving. Ragged per-pixel
+        lists are returned as lists of arrays under their attribute name."""
+        state = {attr: getattr(self, attr) for attr in self.STATE_ATTRS}
+        state["mask"] = self.mask
+        for attr in self.RAGGED_STATE_ATTRS:
+            state[attr] = [np.asarray(a) for a in getattr(self, attr)]
+        return state
+
+    def set_state(self, state: Dict):
+        for attr in self.STATE_ATTRS + self.RAGGED_STATE_ATTRS + ["mask"]:
+            if attr in state:
+                setattr(self, attr, state[attr])
+
+    @property
+    def transformed_data(self) -> np.ndarray:
+        """Current data, with every pending transform run. This is base_data itself until
+        a transform needs a working copy, and a CompactFrames, which lays the masked
+        pixels out as they are read, while the working data is compacted"""
+        self._flush()
+        return self._baked_data()
+
+    @transformed_data.setter
+    def transformed_data(self, data: np.ndarray):
+        self._transformed_data = data
+        self._data_changed()
+
+    @property
+    def pixel_data(self) -> np.ndarray:
+        """Current data laid out pixel-major, as a contiguous (y, x, t) array, or (n, t)
+        while the working data is compacted, so each pixel's trace is contiguous. Made on
+        first use and kept until the data changes. Only for analyses over every pixel
+        (baseline, stacking, APD): single traces are read from the frame-major data."""
+        self._flush()
+        return self._pixel_major()
+
+    def _pixel_major(self) -> np.ndarray:
+        # pixel_data of the data with every transform but the pending ones
+        if self._pixel_data is None:
+            data = self.base_data if self._transformed_data is None else self._transformed_data
+            self._pixel_data = np.ascontiguousarray(np.moveaxis(data, 0, -1))
+        return self._pixel_data
+
+    def _data_changed(self, frames=(0, None)):
+        # the data the pipeline starts from changed, so cached copies of it are stale.
+        # `frames` is the range of frames that changed, None when called before a write
+        self._data_version += 1
+        self._pixel_data = None
+        self._changed_frames = frame_union([self._changed_frames, frames])
+
+    def take_changed_frames(self):
+        """Frames [start, end) of the data that changed since this was last called, or
+        None if none did. An end of None means to the last frame."""
+        frames, self._changed_frames = self._changed_frames, None
+        return frames
+
+    @property
+    def transformed_region(self):
+        """Index into the current data without running pending transforms over the whole
+        recording, e.g. signal.transformed_region[:, y, x] for one pixel trace or
+        signal.transformed_region[t] for one frame. Takes ints and unit-step slices."""
+        return _RegionIndexer(self)
+
+    @property
+    def frame_shape(self) -> Tuple[int, int]:
+        """(span_Y, span_X), the shape of one frame"""
+        return self.span_Y, self.span_X
+
+    @property
+    def center(self) -> Tuple[int, int]:
+        """Index of the pixel at the center of a frame"""
+        return self.span_Y // 2, self.span_X // 2
+
+    @property
+    def frame_count(self) -> int:
+        """Number of frames in transformed_data, without running pending transforms"""
+        length = len(self._baked_data())
+        for op in self.pipeline:
+            length = op.output_length(length)
+        return length
+
+    def _baked_data(self) -> np.ndarray:
+        # data with every transform but the pending ones
+        if self._transformed_data is None:
+            return self.base_data
+        if self.pixels is not None:
+            return CompactFrames(self._transformed_data, self.pixels)
+        return self._transformed_data
+
+    def _frame_mask(self) -> np.ndarray:
+        # mask in the layout of the working data
+        return self.mask if self.pixels is None else self.pixels.column_mask
+
+    def _defer(self, op, state: Dict = None):
+        """Record a transform in the pipeline. It is run when the whole recording is
+        next needed."""
+        self.pipeline.append(op)
+        self.history.push(Deferred(op, state))
+
+    def _flush(self, count: int = None):
+        """Run the first `count` (default all) pending transforms over the whole recording"""
+        if not self.pipeline:
+            return
+        count = len(self.pipeline) if count is None else count
+        ops, self.pipeline = self.pipeline[:count], self.pipeline[count:]
+        for op in ops:
+            # bumped before as well as after the data is written in place, so a reader
+            # on another thread can tell a copy it made may be torn (see session.py)
+            self._data_changed(None)
+            # the undo step of a pending transform becomes the one its run records
+            with self.history.capture() as steps:
+                op.run(self)
+            op.step.applied = steps
+            self._data_changed(op.step.changed_frames)
+        self.history.evict()
+
+    def _evaluate(self, region: Region) -> np.ndarray:
+        # transforms needing their whole input are run over the recording first
+        full = [k for k, op in enumerate(self.pipeline) if op.full_input]
+        if full:
+            self._flush(full[-1] + 1)
+        return evaluate_region(
+            self._baked_data(),
+            self.pipeline,
+            region,
+            self.region_cache,
+            self._data_version,
+            ComputeDtype(self.working_dtype),
+        )
+
+    def preview(self, ops, y: int, x: int) -> np.ndarray:
+        """Trace of pixel (y, x) as it would be after the pipeline Operations `ops`,
+        without recording them. Only the neighbourhood of the pixel the trace depends on
+        is evaluated, so this is fast enough to follow parameters as they are edited.
+        Operations needing their whole input (e.g. global normalize) take the statistics
+        of that neighbourhood instead."""
+        length = self.frame_count
+        for op in ops:
+            length = op.output_length(length)
+        shape = (self.frame_count, self.span_Y, self.span_X)
+        regions = input_regions(shape, ops, Region(0, length, y, y + 1, x, x + 1))
+
+        # the current data is evaluated (and cached) as usual; the previewed ops are not
+        block = self._evaluate(regions[0])
+        for k, op in enumerate(ops):
+            block = op.apply(block, regions[k], regions[k + 1])
+        return block[:, 0, 0]
+
+    @property
+    def image_data(self) -> np.ndarray:
+        """Image for display: base_image, masked once a mask is applied"""
+        if self._image_data is None:
+            self._image_data = self.base_image
+        return self._image_data
+
+    @property
+    def base_image(self) -> np.ndarray:
+        """base_data scaled as (base - min) / max for display, computed on first use. It
+        is never written to, so signals over the same recording share it (see share)."""
+        image = self._base_image() if self._base_image is not None else None
+        if image is None:
+            image = self._make_image(self.base_data)
+            # held through image_data, so it is freed once masking replaces that
+            self._base_image = weakref.ref(image)
+        return image
+
+    @image_data.setter
+    def image_data(self, data: np.ndarray):
+        self._image_data = data
+
+    def _make_image(self, data: np.ndarray) -> np.ndarray:
+        # Converted a block of frames at a time, so there is no full-size float64 temporary
+        lo, hi = np.float32(data.min()), np.float32(data.max())
+        image = np.empty(data.shape, dtype=self.IMAGE_DTYPE)
+        for i in range(0, len(data), self.IMAGE_CHUNK_FRAMES):
+            # a copy: for float32 data asarray would be a view of it
+            chunk = np.array(data[i : i + self.IMAGE_CHUNK_FRAMES], dtype=np.float32)
+            chunk -= lo
+            chunk /= hi
+            image[i : i + len(chunk)] = chunk
+        return image
+
+    def _working_data(self) -> np.ndarray:
+        """Writable working copy in working_dtype, materialized from base_data on first use"""
+        if self._transformed_data is None:
+            self._transformed_data = np.ascontiguousarray(self.base_data, dtype=self.working_dtype)
+        return self._transformed_data
+
+    def _checkpoint(self, start: int = 0, end: int = None) -> np.ndarray:
+        """Keep frames [start, end) of the current data for undo, then return the
+        writable working copy"""
+        if self._transformed_data is None:
+            # undo goes back to reading base_data, so nothing needs copying
+            self.history.push(Snapshot(None))
+            return self._working_data()
+        data = self._working_data()
+        self.history.push(FrameDelta(data, start, len(data) if end is None else end))
+        return data
+
+    def set_precision(self, dtype):
+        """Store transformed_data as `dtype` from now on: float16 halves its memory (and
+        is computed in float32), float64 doubles it. Existing data is converted, which
+        can be undone."""
+        dtype = np.dtype(dtype)
+        if dtype == self.working_dtype:
+            return
+        self._flush()
+        if self._transformed_data is not None:
+            self.history.push(
+                Snapshot(self._transformed_data, state={"working_dtype": self.working_dtype})
+            )
+            self.transformed_data = self._transformed_data.astype(dtype)
+        self.working_dtype = dtype
+        # regions are evaluated in the new compute dtype
+        self._data_changed()
+
+    def _log(self, transform: str, **params):
+        self.transform_history.append(dict(transform=transform, **params))
+
     def perform_average(
         self,
         type: Literal["time", "spatial"],
@@ -107,71 +443,150 @@ class CardiacSignal:
         end=None,
     ):
         start = start or 0
-        end = end or len(self.transformed_data) - 1
+        end = end or self.frame_count - 1
 
         if update_progress:
             update_progress(0.2)
 
-        self.previous_transform = deepcopy(self.transformed_data)
+        self._log(type + "_average", sigma=sig, radius=rad, mode=mode, start=start, end=end)
+        self._defer(pipeline.Average(type, sig, rad, mode, start, end, self.mask))
 
+    def _perform_average(self, type, sig, rad, mode, start, end):
+        data = self._checkpoint(start, end)
         if type == "time":
             print("Time Averaging")
-            self.transformed_data[start:end] = TimeAverage(
-                self.transformed_data[start:end], sig, rad, self.mask, mode
+            TimeAverage(
+                data[start:end], sig, rad, self._frame_mask(), mode, out=data[start:end]
+            )
+        elif type == "spatial" and self.pixels is not None:
+            print("Spatial Averaging")
+            # neighbourhoods need the pixels laid out, a block of frames at a time
+            self.pixels.map_frames(
+                lambda frames: SpatialAverage(frames, sig, rad, self.mask, mode, out=frames),
+                data[start:end],
             )
         elif type == "spatial":
             print("Spatial Averaging")
-            self.transformed_data[start:end] = SpatialAverage(
-                self.transformed_data[start:end], sig, rad, self.mask, mode
+            SpatialAverage(
+                data[start:end], sig, rad, self.mask, mode, out=data[start:end]
             )
 
     def butterworth(self, order, low, high, ms):
-        self.transformed_data = ButterworthFilter(self.transformed_data, order, low, high, ms, self.mask)
+        self._log("butterworth", order=order, low=low, high=high, ms=ms)
+        self._defer(pipeline.Butterworth(order, low, high, ms))
+
+    def _butterworth(self, order, low, high, ms):
+        data = self._checkpoint()
+        ButterworthFilter(data, order, low, high, ms, self._frame_mask(), out=data)
 
     def invert_data(self):
-        self.transformed_data = InvertSignal(self.transformed_data)
+        self._log("invert")
+        self._defer(pipeline.Invert(), state={"inverted": self.inverted})
         self.inverted = not self.inverted
 
+    def _invert_data(self):
+        data = self._working_data()
+        # InvertSignal maps x to max - x, which is its own inverse
+        self.history.push(Affine(0, len(data), -1, np.max(data)))
+        InvertSignal(data, out=data)
+
     def trim_data(self, startTrim, endTrim):
+        self._log("trim", start=startTrim, end=endTrim)
+        self._defer(pipeline.Trim(startTrim, endTrim), state={"trimmed": self.trimmed})
         self.trimmed = [self.trimmed[0] + startTrim, self.trimmed[1] + endTrim]
-        self.previous_transform = deepcopy(self.transformed_data)
-        self.transformed_data = self.transformed_data[startTrim:-endTrim, :, :]
+
+    def _trim_data(self, startTrim, endTrim):
+        untrimmed = self._transformed_data
+        if untrimmed is None:
+            trimmed = np.array(self.base_data[startTrim:-endTrim, :, :], dtype=self.working_dtype)
+        else:
+            # a view: the untrimmed data is kept for undo at no extra cost
+            trimmed = untrimmed[startTrim:-endTrim]
+        self.history.push(Snapshot(untrimmed, trimmed))
+        self.transformed_data = trimmed
 
     def reset_data(self):
-        self.transformed_data = deepcopy(self.base_data)
+        self._log("reset")
+        # pending transforms are dropped, and come back on undo
+        self.history.push(
+            Snapshot(
+                self._transformed_data,
+                state={
+                    "trimmed": self.trimmed,
+                    "inverted": self.inverted,
+                    "pipeline": self.pipeline,
+                    "pixels": self.pixels,
+                },
+            )
+        )
+        self.transformed_data = None
+        self.pixels = None
+        self.pipeline = []
+        self.trimmed = [0, 0]
+        self.inverted = False
 
     def undo(self):
-        self.transformed_data = self.previous_transform
+        # steps may write to the data in place, see _flush
+        self._data_changed(None)
+        step = self.history.undo(self)
+        if step:
+            self._log("undo")
+            if not step.pending:
+                self._data_changed(step.changed_frames)
+
+    def redo(self):
+        # steps may write to the data in place, see _flush
+        self._data_changed(None)
+        step = self.history.redo(self)
+        if step:
+            self._log("redo")
+            if not step.pending:
+                self._data_changed(step.changed_frames)
 
     def reset_image(self):
-        self.image_data = (self.base_data - self.base_data.min()) / self.base_data.max()
+        self.image_data = None
 
     def normalize(self, normalize_global: bool, start=None, end=None):
         start = start or 0
-        end = end or len(self.transformed_data)
+        end = end or self.frame_count
+        self._log("normalize", normalize_global=normalize_global, start=start, end=end)
+        self._defer(pipeline.Normalize(normalize_global, start, end))
+
+    def _normalize(self, normalize_global, start, end):
+        data = self._working_data()[start:end]
         if normalize_global:
-            n = NormalizeDataGlobal(self.transformed_data[start:end, :, :])
+            lo = np.float32(data.min())
+            span = data.max() - lo
         else:
-            n = NormalizeData(self.transformed_data[start:end, :, :])
-        
+            lo = data.min(axis=0).astype(np.float32)
+            span = data.max(axis=0) - lo
+
+        # normalizing is affine, so undo only needs the per-pixel offset and scale. Flat
+        # pixels are left at 0, which span 1 maps back as well.
+        span = np.where(span > 0, span, 1)
+        self.history.push(Affine(start, end, 1 / span, -lo / span))
+        n = (NormalizeDataGlobal if normalize_global else NormalizeData)(data, out=data)
         print("Normalized Max:", np.unique(n.max(axis=0)), "Min:", np.unique(n.min(axis=0)))
-        self.transformed_data[start:end, :, :] = n
 
     def remove_baseline(
         self, params, peaks=False , start=None, end=None, update_progress=None
     ):
         start = start or 0
-        end = end or len(self.transformed_data) - 1
+        end = end or self.frame_count - 1
 
-        mask = self.mask
-        self.previous_transform = deepcopy(self.transformed_data)
-        data = self.transformed_data[start:end]
+        self._log("remove_baseline", params=params, peaks=peaks, start=start, end=end)
+        self._defer(pipeline.RemoveBaseline(params, peaks, start, end, self.mask))
+
+    def _remove_baseline(self, params, peaks, start, end, update_progress=None):
+        working = self._checkpoint(start, end)
         mask = self.mask
         threads = 4
 
-
-        # flip data axes so we can look at it signal-wise instead of frame-wise
-        dataSwapped = np.moveaxis(data, 0, -1)  # y, x, t
+        # look at the data signal-wise instead of frame-wise, with each trace contiguous
+        dataSwapped = self._pixel_major()[..., start:end]  # y, x, t
+        if self.pixels is not None:
+            # the stored pixels, as an (n, 1) frame
+            dataSwapped, mask = dataSwapped[:, None], self.pixels.column_mask[:, None]
 
         results = RemoveBaselineDrift(
             dataSwapped,
@@ -184,7 +599,7 @@ class CardiacSignal:
 
         # flip data axes back and store results
         data = np.moveaxis(results, -1, 0)
-        self.transformed_data[start:end] = data
+        working[start:end] = data.reshape(working[start:end].shape)
 
     def get_baseline(self):
         return self.baselineX, self.baselineY
@@ -236,13 +651,30 @@ class CardiacSignal:
 
         return key_frame
 
-    def apply_mask(self, mask_arr):
+    def apply_mask(self, mask_arr, compact=False):
+        """Zero the pixels outside `mask_arr`. With `compact`, only the pixels inside
+        it are kept, as a (t, n) working copy: transforms, APDs, stacking and FFT then
+        only process those, and they are laid out as (t, y, x) as they are read."""
+        # pending transforms run with the mask they were recorded with
+        self._flush()
         self.mask = mask_arr
+        self._log("mask")
         print("Mask Applied")
         # print(self.transformed_data.shape)
         # print(self.image_data.shape)
-        self.transformed_data = self.transformed_data * self.mask
-        self.image_data = self.image_data * self.mask
+        self.history.push(Snapshot(self._transformed_data, state={"pixels": self.pixels}))
+        data = self.transformed_data
+        pixels = PixelMap(mask_arr) if compact else None
+        if pixels is not None and 0 < pixels.size < np.size(mask_arr):
+            self.pixels = pixels
+            self.transformed_data = pixels.compact(data, self.working_dtype)
+        else:
+            self.pixels = None
+            self.transformed_data = np.multiply(
+                data, self.mask, out=np.empty(data.shape, dtype=self.working_dtype), casting="same_kind"
+            )
+        # a new image rather than in place, as the unmasked one may be shared
+        self.image_data = np.multiply(self.image_data, self.mask, dtype=self.IMAGE_DTYPE, casting="unsafe")
 
     def get_curr_signal(self):
         return self.transformed_data
@@ -258,26 +690,37 @@ class CardiacSignal:
         mask=None,
         update_progress=None,
     ):
-        # prep data
-        if self.inverted:
-            data = -self.base_data
-        else:
-            data = self.base_data
-        derivative = np.gradient(self.transformed_data, axis=0)
+        # prep data. Stacking reads pixel by pixel, so it is given pixel-major data (as
+        # time-major views). While compacted only the stored pixels are stacked, as an
+        # (n, 1) frame
+        current = self.pixel_data
+        if self.pixels is not None:
+            current = current[:, None]
+            mask = np.ones(self.frame_shape) if mask is None else np.asarray(mask)
+            mask = mask.ravel()[self.pixels.flat, None]
+        derivative = np.gradient(current, axis=-1)
 
         # plt.plot(derivative[:, 64, 64])
         # plt.show()
         # trim data
-        if endingFrame > len(derivative) or endingFrame <= startingFrame:
-            endingFrame = len(derivative)
+        if endingFrame > derivative.shape[-1] or endingFrame <= startingFrame:
+            endingFrame = derivative.shape[-1]
 
-        data = data[
+        data = self.base_data[
             startingFrame
             + self.trimmed[0] : startingFrame
             + self.trimmed[0]
             + endingFrame
         ]
-        derivative = derivative[startingFrame : startingFrame + endingFrame]
+        if self.pixels is not None:
+            data = self.pixels.compact(data).T[:, None]
+        else:
+            data = np.moveaxis(data, 0, -1)
+        data = np.ascontiguousarray(data, dtype=np.float32)
+        if self.inverted:
+            data = -data
+        data = np.moveaxis(data, -1, 0)
+        derivative = np.moveaxis(derivative[..., startingFrame : startingFrame + endingFrame], -1, 0)
 
         # perform stacking
         results, longestRes = Stacking(
@@ -293,12 +736,29 @@ class CardiacSignal:
 
         # reshape for display
         results = pad(results, longestRes)
+        if self.pixels is not None:
+            return NormalizeData(self.pixels.scatter(results.T))
         results = results.reshape((self.span_Y, self.span_X, longestRes))
         results = np.moveaxis(results, -1, 0)
         return NormalizeData(results)
 
     def perform_fft(self, start, end):
-        return FFT(self.transformed_data[start:end])
+        data = self.transformed_data
+        if self.pixels is not None:
+            return self.pixels.scatter(FFT(data.values[start:end]))
+        return FFT(data[start:end])
+
+    def perform_apd(self, threshold, spacing, intervals=None):
+        """APDs, DIs and first threshold crossings of every pixel, as returned by
+        GetThresholdIntersections. While compacted only the stored pixels are measured,
+        and the rest are 0."""
+        # time-major view of the pixel-major data, so each trace is read contiguously
+        data = np.moveaxis(self.pixel_data, -1, 0)
+        if self.pixels is None:
+            return GetThresholdIntersections(data, threshold, spacing, intervals)
+        apds, dis, offsets = GetThresholdIntersections(data, threshold, spacing, intervals)
+        scatter = self.pixels.scatter
+        return [scatter(a) for a in apds], [scatter(d) for d in dis], scatter(offsets)
 
 
 # helper function to pad an array with zeros until it is rectangular
@@ -308,3 +768,36 @@ def pad(array, targetWidth):
         zeros = np.zeros(numZeros)
         array[i] = np.concatenate((array[i], zeros))
     return np.asarray(array)
+
+
+class _RegionIndexer:
+    """numpy-style basic indexing into a CardiacSignal's current data, evaluating only
+    the region asked for"""
+
+    def __init__(self, signal: CardiacSignal):
+        self.signal = signal
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if not self.signal.pipeline:
+            return self.signal.transformed_data[key]
+
+        key = key + (slice(None),) * (3 - len(key))
+        shape = (self.signal.frame_count, self.signal.span_Y, self.signal.span_X)
+        bounds, index = [], []
+        for k, n in zip(key, shape):
+            if isinstance(k, slice):
+                start, stop, step = k.indices(n)
+                if step != 1:
+                    raise IndexError("transformed_region only takes unit-step slices")
+                bounds += [start, max(start, stop)]
+                index.append(slice(None))
+            else:
+                k = int(k) + n if k < 0 else int(k)
+                if not 0 <= k < n:
+                    raise IndexError(f"index {k} is out of bounds for size {n}")
+                bounds += [k, k + 1]
+                index.append(0)
+        return self.signal._evaluate(Region(*bounds))[tuple(index)]
+
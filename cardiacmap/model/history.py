@@ -0,0 +1,262 @@
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Default memory the undo history of one signal may hold
+DEFAULT_UNDO_BUDGET = 1024 * 2**20
+
+
+def _swap_state(step, signal):
+    # signal attributes the step changed along with the data, e.g. trimmed
+    if step.state:
+        current = {attr: getattr(signal, attr) for attr in step.state}
+        for attr, value in step.state.items():
+            setattr(signal, attr, value)
+        step.state = current
+
+
+def frame_union(ranges):
+    """Smallest frame range [start, end) covering `ranges`. An end of None means to the
+    last frame; a range of None (nothing changed) is skipped, and so returned if all are."""
+    ranges = [r for r in ranges if r is not None]
+    if not ranges:
+        return None
+    ends = [end for _, end in ranges]
+    return min(start for start, _ in ranges), None if None in ends else max(ends)
+
+
+class FrameDelta:
+    """Undo step for a transform that rewrote frames [start, end) of the working data in
+    place. Keeps only those frames."""
+
+    pending = False
+
+    def __init__(self, data: np.ndarray, start: int, end: int):
+        self.start, self.end = start, end
+        self.frames = np.array(data[start:end])
+
+    @property
+    def nbytes(self) -> int:
+        return self.frames.nbytes
+
+    @property
+    def changed_frames(self):
+        return self.start, self.end
+
+    def swap(self, signal):
+        data = signal._working_data()
+        current = np.array(data[self.start : self.end])
+        data[self.start : self.end] = self.frames
+        self.frames = current
+
+
+class Snapshot:
+    """Undo step for a transform that replaced the working data. Keeps the replaced
+    array, which is None for base_data. Arrays the new data is a view of (e.g. after a
+    trim) cost nothing extra."""
+
+    pending = False
+
+    def __init__(self, data: np.ndarray, current: np.ndarray = None, state: dict = None):
+        self.data = data
+        self.state = state
+        self._nbytes = 0
+        if data is not None and (current is None or not np.may_share_memory(data, current)):
+            self._nbytes = data.nbytes
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    @property
+    def changed_frames(self):
+        # the data may change shape, e.g. trim
+        return 0, None
+
+    def swap(self, signal):
+        self.data, signal.transformed_data = signal._transformed_data, self.data
+        _swap_state(self, signal)
+
+
+class Affine:
+    """Undo step for a transform that mapped frames [start, end) as x * scale + offset,
+    e.g. invert or normalize. Keeps only the parameters, which may be per pixel."""
+
+    pending = False
+
+    def __init__(self, start: int, end: int, scale, offset, state: dict = None):
+        self.start, self.end = start, end
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.offset = np.asarray(offset, dtype=np.float32)
+        self.state = state
+
+    @property
+    def nbytes(self) -> int:
+        return self.scale.nbytes + self.offset.nbytes
+
+    @property
+    def changed_frames(self):
+        return self.start, self.end
+
+    def swap(self, signal):
+        data = signal._working_data()[self.start : self.end]
+        data -= self.offset
+        data /= self.scale
+        # the inverse map, for redo
+        self.scale, self.offset = 1 / self.scale, -self.offset / self.scale
+        _swap_state(self, signal)
+
+
+class Group:
+    """Steps undone and redone together, e.g. a transform and the normalize after it"""
+
+    def __init__(self, steps):
+        self.steps = steps
+
+    @property
+    def nbytes(self) -> int:
+        return sum(step.nbytes for step in self.steps)
+
+    @property
+    def pending(self) -> bool:
+        return all(step.pending for step in self.steps)
+
+    @property
+    def changed_frames(self):
+        return frame_union(step.changed_frames for step in self.steps)
+
+    def swap(self, signal):
+        for step in reversed(self.steps):
+            step.swap(signal)
+        self.steps.reverse()
+
+
+class Deferred:
+    """Undo step for a transform recorded in the signal's pipeline. While the transform
+    is pending, undoing it just takes it out of the pipeline. Once the pipeline has been
+    run, the step swaps back the steps the run recorded (`applied`)."""
+
+    def __init__(self, op, state: dict = None):
+        self.op = op
+        self.state = state
+        self.applied = None
+        op.step = self
+
+    @property
+    def pending(self) -> bool:
+        return self.applied is None
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if self.applied is None else sum(step.nbytes for step in self.applied)
+
+    @property
+    def changed_frames(self):
+        # frames of the working data swapping the step rewrites, None while pending
+        if self.applied is None:
+            return None
+        return frame_union(step.changed_frames for step in self.applied)
+
+    def swap(self, signal):
+        if self.applied is not None:
+            for step in reversed(self.applied):
+                step.swap(signal)
+            self.applied.reverse()
+        elif any(op is self.op for op in signal.pipeline):
+            signal.pipeline.remove(self.op)
+        else:
+            signal.pipeline.append(self.op)
+        _swap_state(self, signal)
+
+
+class TransformHistory:
+    """Multi-level undo / redo for a CardiacSignal. Each step records only what it needs
+    to swap the working data back: the rewritten frame range, the replaced array, or the
+    parameters of an invertible map. Steps are swapped in place, so undoing a step turns
+    it into its redo step.
+
+    The history holds at most `budget` bytes; the oldest steps are dropped first, but
+    the latest step is always kept.
+    """
+
+    def __init__(self, budget: int = DEFAULT_UNDO_BUDGET):
+        self.budget = budget
+        self.undo_steps = deque()
+        self.redo_steps = []
+        self._group = None
+        self._captured = None
+
+    @property
+    def nbytes(self) -> int:
+        return sum(step.nbytes for step in self.undo_steps) + sum(
+            step.nbytes for step in self.redo_steps
+        )
+
+    def can_undo(self) -> bool:
+        return bool(self.undo_steps)
+
+    def can_redo(self) -> bool:
+        return bool(self.redo_steps)
+
+    def push(self, step):
+        if self._captured is not None:
+            self._captured.append(step)
+            return
+        if self._group is not None:
+            self._group.append(step)
+            return
+        self.redo_steps.clear()
+        self.undo_steps.append(step)
+        self.evict()
+
+    @contextmanager
+    def grouped(self):
+        """Record the steps pushed inside the block as a single step"""
+        if self._group is not None:
+            yield
+            return
+        self._group = []
+        try:
+            yield
+        finally:
+            steps, self._group = self._group, None
+            if len(steps) == 1:
+                self.push(steps[0])
+            elif steps:
+                self.push(Group(steps))
+
+    @contextmanager
+    def capture(self):
+        """Collect the steps pushed inside the block, instead of recording them"""
+        outer, self._captured = self._captured, []
+        try:
+            yield self._captured
+        finally:
+            self._captured = outer
+
+    def evict(self):
+        while len(self.undo_steps) > 1 and self.nbytes > self.budget:
+            self.undo_steps.popleft()
+
+    def undo(self, signal):
+        """Undo the latest step. Returns the step, or None if there is nothing to undo."""
+        if not self.undo_steps:
+            return None
+        step = self.undo_steps.pop()
+        step.swap(signal)
+        self.redo_steps.append(step)
+        return step
+
+    def redo(self, signal):
+        """Redo the latest undone step. Returns the step, or None if there is nothing to redo."""
+        if not self.redo_steps:
+            return None
+        step = self.redo_steps.pop()
+        step.swap(signal)
+        self.undo_steps.append(step)
+        return step
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps.clear()
@@ -0,0 +1,204 @@
+import concurrent.futures as cf
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+
+from cardiacmap.model.cascade import map_cascade_frames, read_cascade_header
+from cardiacmap.model.scimedia import map_scimedia_frames, pooled_size, read_scimedia_header
+
+DEFAULT_INDEX_PATH = "./recordings_index.json"
+INDEX_VERSION = 1
+
+RECORDING_EXTENSIONS = (".dat", ".gsd")
+
+# Dual mode recordings alternate excitation between frames, so the mean intensity of
+# odd and even frames differs consistently. A few frames are enough to tell.
+DUAL_SAMPLE_FRAMES = 8
+DUAL_CONTRAST = 0.05
+
+
+def guess_dual_mode(frames) -> bool:
+    """Guess whether frames alternate between two channels from a short sample.
+
+    Args:
+        frames (array): first few frames of a recording, size (frame, H, W)
+
+    Returns:
+        bool: True if odd and even frames differ consistently in mean intensity
+    """
+    n = len(frames) // 2 * 2
+    if n < 2:
+        return False
+    means = np.asarray(frames[:n], dtype=np.float32).reshape(n, -1).mean(axis=1)
+    diffs = means[0::2] - means[1::2]
+    scale = np.abs(means).mean()
+    if scale == 0:
+        return False
+    consistent = np.all(diffs > 0) or np.all(diffs < 0)
+    return bool(consistent and np.abs(diffs).min() > DUAL_CONTRAST * scale)
+
+
+def read_recording_info(filepath: str) -> Dict:
+    """Summarize a recording from its header, plus a few frames for the dual mode guess.
+    No other pixel data is read.
+
+    Args:
+        filepath (str): Input file path (.dat or .gsd)
+
+    Returns:
+        info: dict with format, span_T (frames in the file), span_X / span_Y (frame
+            size as loaded), framerate, datetime, size, mtime and dual (dual mode guess)
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+    stat = os.stat(filepath)
+
+    with open(filepath, "rb") as file:
+        if ext == ".dat":
+            header = read_cascade_header(file)
+            frames = map_cascade_frames(filepath, header)
+            info = dict(
+                format="cascade",
+                span_T=len(frames),
+                span_X=header["span_X"],
+                span_Y=header["span_Y"],
+                framerate=header["metadata"].get("framerate"),
+                datetime=header["metadata"].get("datetime"),
+            )
+        elif ext == ".gsd":
+            header = read_scimedia_header(file, read_background=False)
+            frames = map_scimedia_frames(filepath, header)
+            # frames are pooled on load
+            info = dict(
+                format="scimedia",
+                span_T=len(frames),
+                span_X=pooled_size(header["xPixels"]),
+                span_Y=pooled_size(header["yPixels"]),
+                framerate=500,
+                datetime=None,
+            )
+        else:
+            raise ValueError(f"Indexing is not supported for {ext} files")
+
+    info.update(
+        filename=os.path.basename(filepath),
+        size=stat.st_size,
+        mtime=stat.st_mtime,
+        dual=guess_dual_mode(frames[:DUAL_SAMPLE_FRAMES]),
+    )
+    return info
+
+
+def find_recordings(directory: str, recursive: bool = True) -> List[str]:
+    """List the recordings (.dat / .gsd files) in a directory tree"""
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        found.extend(
+            os.path.join(root, f) for f in sorted(files)
+            if f.lower().endswith(RECORDING_EXTENSIONS)
+        )
+        if not recursive:
+            break
+    return found
+
+
+class RecordingIndex:
+    """Persistent index of recording headers, keyed by absolute path. Entries are
+    reused as long as the file's size and mtime are unchanged, so re-indexing a
+    directory only reads headers of new or modified files.
+
+    Usage:
+        index = RecordingIndex()
+        infos = index.update(find_recordings(directory))
+        index.save()
+    """
+
+    def __init__(self, index_path: str = DEFAULT_INDEX_PATH):
+        self.index_path = index_path
+        self.recordings: Dict[str, Dict] = {}
+        try:
+            with open(index_path, "r") as f:
+                index = json.load(f)
+            if index.get("version") == INDEX_VERSION:
+                self.recordings = index["recordings"]
+        except (OSError, ValueError, KeyError):
+            # no index yet, or an unreadable one which is rebuilt
+            pass
+
+    def __len__(self):
+        return len(self.recordings)
+
+    def __contains__(self, filepath):
+        return os.path.abspath(filepath) in self.recordings
+
+    def __getitem__(self, filepath) -> Dict:
+        return self.recordings[os.path.abspath(filepath)]
+
+    def get(self, filepath, default=None):
+        return self.recordings.get(os.path.abspath(filepath), default)
+
+    def _is_current(self, filepath, info) -> bool:
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return False
+        return info["size"] == stat.st_size and info["mtime"] == stat.st_mtime
+
+    def update(self, filepaths, workers: int = 8) -> Dict[str, Dict]:
+        """Index filepaths, reading headers of new or modified files in parallel.
+        Files that can't be read are skipped.
+
+        Args:
+            filepaths (list): recording paths
+            workers (int): number of header reads in flight
+
+        Returns:
+            infos: dict of absolute path -> info, for the files that could be indexed
+        """
+        filepaths = [os.path.abspath(f) for f in filepaths]
+        stale = [
+            f for f in filepaths
+            if f not in self.recordings or not self._is_current(f, self.recordings[f])
+        ]
+
+        if stale:
+            with cf.ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(read_recording_info, f): f for f in stale}
+                for future in cf.as_completed(futures):
+                    filepath = futures[future]
+                    try:
+                        self.recordings[filepath] = future.result()
+                    except Exception as e:
+                        print("Error indexing", filepath, ":", e)
+                        self.recordings.pop(filepath, None)
+
+        return {f: self.recordings[f] for f in filepaths if f in self.recordings}
+
+    def prune(self):
+        """Drop entries for files that no longer exist"""
+        self.recordings = {f: info for f, info in self.recordings.items() if os.path.exists(f)}
+
+    def save(self):
+        tmp_path = self.index_path + ".part"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(dict(version=INDEX_VERSION, recordings=self.recordings), f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print("Could not save recording index:", e)
+
+
+def index_directory(
+    directory: str, recursive: bool = True, index_path: str = DEFAULT_INDEX_PATH
+) -> Dict[str, Dict]:
+    """Index every recording in a directory tree and save the index.
+
+    Returns:
+        infos: dict of absolute path -> info, in path order
+    """
+    index = RecordingIndex(index_path)
+    infos = index.update(find_recordings(directory, recursive))
+    index.save()
+    return infos
@@ -0,0 +1,309 @@
+import os
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from scipy.signal import firwin
+
+from cardiacmap.model.calibration import Calibration, read_mean_frame
+from cardiacmap.model.data import CardiacSignal
+from cardiacmap.model.scimedia import pool_frames, pooled_size, read_scimedia_background
+from cardiacmap.model.stream import CHUNK_READERS, DEFAULT_CHUNK_FRAMES
+from cardiacmap.model.planner import large_file_check
+
+# Half length of the decimation low-pass, per unit of decimation factor. The filter has
+# 2 * DECIMATION_HALF_WIDTH * factor + 1 taps, so its transition band scales with the
+# new sampling rate.
+DECIMATION_HALF_WIDTH = 5
+
+
+class LoadOptions(NamedTuple):
+    """Corrections and reductions applied while a recording is streamed in from disk.
+
+    binning: NxN spatial mean-pooling (after any pooling the format does itself)
+    roi: (x_start, x_end, y_start, y_end) crop, in span_X / span_Y pixels, or None
+    decimation: integer temporal decimation factor, low-pass filtered against aliasing
+    dark_frame: recording (or 2D .npy frame) whose mean is subtracted from every frame
+    flat_field: recording (or 2D .npy frame) whose mean each frame is normalized by
+    background: use a SciMedia file's own background image as the flat field
+    """
+
+    binning: int = 1
+    roi: Optional[Tuple[int, int, int, int]] = None
+    decimation: int = 1
+    dark_frame: Optional[str] = None
+    flat_field: Optional[str] = None
+    background: bool = False
+
+    @property
+    def is_default(self) -> bool:
+        return self == LoadOptions()
+
+
+def load_options_from_settings(settings) -> LoadOptions:
+    """Read LoadOptions from the "Load Options" settings group"""
+    group = settings.child("Load Options")
+    roi = (
+        group.child("X Start").value(),
+        group.child("X End").value(),
+        group.child("Y Start").value(),
+        group.child("Y End").value(),
+    )
+    return LoadOptions(
+        binning=group.child("Binning").value(),
+        roi=None if roi == (0, -1, 0, -1) else roi,
+        decimation=group.child("Decimation").value(),
+        dark_frame=group.child("Dark Frame").value() or None,
+        flat_field=group.child("Flat Field").value() or None,
+        background=group.child("Flat Field from Background").value(),
+    )
+
+
+def load_calibration(filepath: str, options: LoadOptions) -> Optional[Calibration]:
+    """Read the dark / flat-field frames the options ask for, if any"""
+    dark = read_mean_frame(options.dark_frame) if options.dark_frame else None
+    flat = None
+    if options.flat_field:
+        flat = read_mean_frame(options.flat_field)
+    elif options.background and os.path.splitext(filepath)[1].lower() == ".gsd":
+        flat = read_scimedia_background(filepath)
+
+    if dark is None and flat is None:
+        return None
+    return Calibration(dark, flat)
+
+
+def _roi_slices(options: LoadOptions, span_X: int, span_Y: int):
+    if options.roi is None:
+        return slice(None), slice(None)
+    x0, x1, y0, y1 = options.roi
+    # negative ends count back from the edge, -1 keeping the last pixel
+    return slice(x0, x1 if x1 >= 0 else span_X + 1 + x1), slice(y0, y1 if y1 >= 0 else span_Y + 1 + y1)
+
+
+def reduced_size(span_X: int, span_Y: int, options: LoadOptions) -> Tuple[int, int]:
+    """Frame size after the ROI crop and binning"""
+    xs, ys = _roi_slices(options, span_X, span_Y)
+    span_X = pooled_size(len(range(span_X)[xs]), options.binning)
+    span_Y = pooled_size(len(range(span_Y)[ys]), options.binning)
+    return span_X, span_Y
+
+
+class Decimator:
+    """Anti-aliased temporal decimation of a stream of frame blocks. Frames are low-pass
+    filtered with a linear-phase (windowed sinc) FIR filter and every `factor`-th frame is
+    kept, as scipy.signal.decimate does, but without needing the whole recording: only
+    the filter's history is carried between blocks. The filter is centred on each kept
+    frame, so there is no time shift, and the ends are padded by repeating the first and
+    last frames. Only the kept frames are ever computed.
+
+    Usage:
+        decimator = Decimator(4)
+        for chunk in chunks:
+            out = decimator.push(chunk)
+        out = decimator.flush()
+    """
+
+    def __init__(self, factor: int):
+        self.factor = factor
+        self.half = DECIMATION_HALF_WIDTH * factor
+        self.taps = firwin(2 * self.half + 1, 1 / factor).astype(np.float32)
+
+        self.buffer = None  # frames not yet consumed by the filter
+        self.start = 0  # frame index of buffer[0]
+        self.count = 0  # frames pushed so far
+        self.next_out = 0  # index of the next output frame
+
+    def _compute(self, n_out) -> np.ndarray:
+        q = self.factor
+        base = self.next_out * q - self.half - self.start
+        out = np.zeros((n_out,) + self.buffer.shape[1:], dtype=np.float32)
+        if n_out:
+            for k, tap in enumerate(self.taps):
+                out += tap * self.buffer[base + k : base + k + q * (n_out - 1) + 1 : q]
+            self.next_out += n_out
+
+        # drop frames no later output needs
+        drop = self.next_out * q - self.half - self.start
+        if drop > 0:
+            self.buffer = self.buffer[drop:]
+            self.start += drop
+        return out
+
+    def push(self, chunk) -> np.ndarray:
+        """Add frames and return the output frames whose filter support is complete"""
+        chunk = np.asarray(chunk, dtype=np.float32)
+        if not len(chunk):
+            return self._compute(0) if self.buffer is not None else chunk
+        if self.buffer is None:
+            # extend the recording backwards with its first frame
+            self.buffer = np.concatenate([np.repeat(chunk[:1], self.half, axis=0), chunk])
+            self.start = -self.half
+        else:
+            self.buffer = np.concatenate([self.buffer, chunk])
+        self.count += len(chunk)
+
+        last = self.start + len(self.buffer) - 1
+        n_out = max(0, (last - self.half) // self.factor + 1 - self.next_out)
+        return self._compute(n_out)
+
+    def flush(self) -> np.ndarray:
+        """Return the remaining output frames, extending the recording with its last frame"""
+        if self.buffer is None:
+            return np.zeros((0,), dtype=np.float32)
+        self.buffer = np.concatenate([self.buffer, np.repeat(self.buffer[-1:], self.half, axis=0)])
+        n_out = -(-self.count // self.factor) - self.next_out
+        return self._compute(n_out)
+
+
+def read_reduced_frames(
+    filepath: str,
+    options: LoadOptions,
+    start: int = 0,
+    end: int = None,
+    channels: int = 1,
+    chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+    update_progress=None,
+    calibration: Calibration = None,
+) -> List[np.ndarray]:
+    """Stream a recording from disk, applying the ROI crop, calibration, binning and
+    decimation to one block at a time, into preallocated float32 outputs. Only the
+    reduced recording is ever held in memory.
+
+    Args:
+        filepath (str): Input file path, any of stream.CHUNK_READERS
+        options (LoadOptions): reductions to apply
+        start (int): first frame to read
+        end (int): frame to stop at (exclusive)
+        channels (int): number of interleaved channels (2 for dual mode). Each channel
+            is decimated separately.
+        chunk_frames (int): number of frames read at a time
+        update_progress (func, optional): progress callback, normalized to 1
+        calibration (Calibration, optional): dark / flat-field correction, applied as
+            the frames are converted to float32
+
+    Returns:
+        frames: list with one float32 array of size (frame, H, W) per channel, in the
+            same layout as the loaders return
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext not in CHUNK_READERS:
+        raise ValueError(f"Load options are not supported for {ext} files")
+    # keep blocks aligned to the channel interleave
+    chunk_frames = max(channels, chunk_frames // channels * channels)
+
+    decimators = [Decimator(options.decimation) for _ in range(channels)] if options.decimation > 1 else None
+    outputs = [None] * channels
+    filled = [0] * channels
+    xs = ys = None
+    read = 0
+
+    def store(c, frames):
+        if outputs[c] is None:
+            # every output size is known up front when the frame range is
+            n = len(range(c, end - start, channels)) if end is not None else len(frames)
+            n = -(-n // options.decimation)
+            outputs[c] = np.empty((n,) + frames.shape[1:], dtype=np.float32)
+        elif filled[c] + len(frames) > len(outputs[c]):
+            outputs[c] = np.concatenate([outputs[c][: filled[c]], frames])
+            filled[c] += len(frames)
+            return
+        outputs[c][filled[c] : filled[c] + len(frames)] = frames
+        filled[c] += len(frames)
+
+    for chunk in CHUNK_READERS[ext](filepath, chunk_frames, start, end):
+        if xs is None:
+            xs, ys = _roi_slices(options, chunk.shape[1], chunk.shape[2])
+            if calibration is not None:
+                if calibration.shape != chunk.shape[1:]:
+                    raise ValueError(
+                        f"Calibration frames are {calibration.shape}, the recording's frames are {chunk.shape[1:]}"
+                    )
+                calibration = calibration.crop(xs, ys)
+        chunk = chunk[:, xs, ys]
+        if calibration is not None:
+            chunk = calibration.apply(chunk)
+        if options.binning > 1:
+            chunk = pool_frames(chunk, chunk_frames=len(chunk), factor=options.binning)
+        else:
+            chunk = np.asarray(chunk, dtype=np.float32)
+
+        for c in range(channels):
+            frames = chunk[c::channels]
+            if decimators:
+                frames = decimators[c].push(frames)
+            store(c, frames)
+
+        read += len(chunk)
+        if update_progress and end is not None:
+            update_progress(min(read / (end - start), 1))
+
+    for c in range(channels):
+        if decimators and decimators[c].buffer is not None:
+            store(c, decimators[c].flush())
+        if outputs[c] is not None:
+            # a file may hold fewer frames than its header claims
+            outputs[c] = outputs[c][: filled[c]]
+
+    return outputs
+
+
+def load_reduced_file(
+    filepath: str,
+    metadata: Dict,
+    options: LoadOptions,
+    largeFilePopup,
+    dual_mode=False,
+    update_progress=None,
+) -> Dict[int, CardiacSignal]:
+    """Load a recording with load-time corrections and reductions, to return a single or
+    dual channel signal.
+
+    Args:
+        filepath (str): Path to file
+        metadata (dict): header metadata, with span_T / span_X / span_Y as the file loads
+        options (LoadOptions): corrections and reductions to apply
+        largeFilePopup (func): callback function to open popup window for larger-than-memory files
+        dual_mode (bool, optional): Whether the input signal is dual mode (Voltage / Calcium). Defaults to False.
+        update_progress (func, optional): progress callback, normalized to 1
+
+    Returns:
+        signals: Dictionary of CardiacSignal
+    """
+    signals = {}
+    span_T = metadata["span_T"]
+    span_X, span_Y = reduced_size(metadata["span_X"], metadata["span_Y"], options)
+    if span_X < 1 or span_Y < 1:
+        raise ValueError("The region of interest is empty after binning")
+
+    # The popup works in decimated frames
+    trimFrames = large_file_check(
+        filepath, largeFilePopup, span_T // options.decimation, span_X, span_Y, itemsize=4
+    )
+    if trimFrames is None:
+        return signals
+
+    start, end = 0, span_T
+    if trimFrames[1] != 0:
+        start = trimFrames[0] * options.decimation
+        end = min(span_T, (trimFrames[0] + trimFrames[1]) * options.decimation)
+
+    channels = 2 if dual_mode else 1
+    frames = read_reduced_frames(
+        filepath, options, start, end, channels=channels, update_progress=update_progress,
+        calibration=load_calibration(filepath, options),
+    )
+    if frames[0] is None:
+        return signals
+
+    file_metadata = dict(metadata)
+    if file_metadata.get("framerate"):
+        file_metadata["framerate"] = file_metadata["framerate"] / options.decimation
+    file_metadata.update(span_T=len(frames[0]), span_X=span_X, span_Y=span_Y, load_options=options._asdict())
+
+    if dual_mode:
+        signals[0] = CardiacSignal(signal=frames[0], metadata=file_metadata, channel="Odd")
+        signals[1] = CardiacSignal(signal=frames[1], metadata=file_metadata, channel="Even")
+    else:
+        signals[0] = CardiacSignal(signal=frames[0], metadata=file_metadata, channel="Single")
+
+    return signals
@@ -1,44 +1,207 @@
+import concurrent.futures as cf
 import os
 import cv2
 import numpy as np
 
 from cardiacmap.model.data import CardiacSignal
 
-def read_mkv_data(filepath: str):
+MIN_SEGMENT_FRAMES = 64
+
+
+def _decode_frame(frame):
+    # frames are kept at the video's own resolution; binning at load time reduces them
+    return frame[:, :, 0]
+
+
+def _frame_shape(capture):
+    return int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+
+
+def _seek(capture, frame: int) -> bool:
+    """Seek to `frame` and return whether the capture landed on it. Seeks can be inexact
+    in MKV with the FFmpeg backend, so the position is read back."""
+    capture.set(cv2.CAP_PROP_POS_FRAMES, frame)
+    return int(capture.get(cv2.CAP_PROP_POS_FRAMES)) == frame
+
+
+def _skip(capture, frames: int):
+    # move forward by decoding, for when seeking isn't exact
+    for _ in range(frames):
+        if not capture.grab():
+            break
+
+
+def _open_capture(filepath: str, start: int = 0, exact: bool = True):
+    """Open a capture at frame `start`. If the seek there misses, the capture is reopened
+    and decodes its way to `start`, or with `exact` False None is returned instead."""
     capture = cv2.VideoCapture(filepath)
     if not capture.isOpened():
         print("Error opening video file")
+        return None
+    if start and not _seek(capture, start):
+        capture.release()
+        if not exact:
+            return None
+        capture = cv2.VideoCapture(filepath)
+        _skip(capture, start)
+    return capture
 
-    frame_rate = int(capture.get(cv2.CAP_PROP_FPS))
-    data = []
-    i = 0
-    while capture.isOpened():
-        ret, frame = capture.read()
-        if ret:
-            data.append(cv2.resize(frame, (128,128))[:, :, 0])
-        else:
-            break
-        i+=1
+
+def _decode_segment(filepath: str, out: np.ndarray, start: int, end: int) -> int:
+    """Decode frames [start, end) into out[start:end] with a capture of its own.
+    Returns the number of frames decoded, which is short if the video ends early, or
+    None if the seek to `start` missed."""
+    capture = _open_capture(filepath, start, exact=False)
+    if capture is None:
+        return None
+    i = start
+    try:
+        while i < end:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            out[i] = _decode_frame(frame)
+            i += 1
+    finally:
+        capture.release()
+    return i - start
+
+
+def read_mkv_info(filepath: str):
+    """Frame rate, frame count and frame size of a video file as reported by its
+    container, without decoding any frames. Returns None if it cannot be opened."""
+    capture = _open_capture(filepath)
+    if capture is None:
+        return None
+    span_X, span_Y = _frame_shape(capture)
+    info = {
+        "framerate": int(capture.get(cv2.CAP_PROP_FPS)),
+        "span_T": int(capture.get(cv2.CAP_PROP_FRAME_COUNT)),
+        "span_X": span_X,
+        "span_Y": span_Y,
+    }
     capture.release()
+    return info
+
 
+def read_mkv_data(filepath: str, threads: int = 4, update_progress=None):
+    """Load a video file. The frame count is read up front and frames are decoded
+    straight into one preallocated uint8 array, split into seek-based segments that are
+    decoded in parallel (OpenCV releases the GIL while decoding).
+
+    Args:
+        filepath (str): Input file path
+        threads (int): number of segments to decode in parallel
+        update_progress (func, optional): progress callback, normalized to 1. Called as
+            segments finish.
+
+    Returns:
+        metadata: dict of metadata
+        imarray: numpy array of size (frame, height, width)
+    """
     filename = os.path.basename(filepath)
-    metadata = {"filename": filename, "span_T": len(data), "span_X": 128, "span_Y": 128, "framerate": frame_rate}
-    return metadata, np.array(data)
 
-def load_mkv_file(filepath):
+    info = read_mkv_info(filepath)
+    if info is None:
+        return {"filename": filename}, None
+    frame_rate, span_T = info["framerate"], info["span_T"]
+    frame_shape = (info["span_X"], info["span_Y"])
+
+    if span_T <= 0:
+        # Container doesn't report a frame count, so decode sequentially instead
+        chunks = list(iter_mkv_chunks(filepath, 256))
+        data = np.concatenate(chunks) if chunks else None
+    else:
+        data = np.empty((span_T,) + frame_shape, dtype=np.uint8)
+        n_segments = max(1, min(threads, span_T // MIN_SEGMENT_FRAMES))
+        bounds = np.linspace(0, span_T, n_segments + 1).astype(int)
+
+        with cf.ThreadPoolExecutor(max_workers=n_segments) as executor:
+            futures = [
+                executor.submit(_decode_segment, filepath, data, bounds[i], bounds[i + 1])
+                for i in range(n_segments)
+            ]
+            if update_progress:
+                for done, _ in enumerate(cf.as_completed(futures), 1):
+                    update_progress(done / n_segments)
+            decoded = [f.result() for f in futures]
+
+        if None in decoded:
+            # a seek to a segment start missed, so decode the video in one pass instead
+            print("Inexact seeking in", filename, "- decoding sequentially")
+            n = 0
+            for chunk in iter_mkv_chunks(filepath, 256, end=span_T):
+                data[n : n + len(chunk)] = chunk
+                n += len(chunk)
+            data = data[:n]
+        else:
+            # The reported frame count can overshoot; keep frames up to the first short segment
+            for i, n in enumerate(decoded):
+                if n < bounds[i + 1] - bounds[i]:
+                    data = data[: bounds[i] + n]
+                    break
+
+    if data is None:
+        return {"filename": filename}, None
+
+    metadata = {"filename": filename, "span_T": len(data), "span_X": data.shape[1], "span_Y": data.shape[2], "framerate": frame_rate}
+    return metadata, data
+
+
+def iter_mkv_chunks(filepath: str, chunk_frames: int, start: int = 0, end: int = None):
+    """Yield consecutive blocks of decoded frames from a video file, decoding one block
+    at a time.
+
+    Args:
+        filepath (str): Input file path
+        chunk_frames (int): number of frames per block
+        start (int): first frame to read
+        end (int, optional): frame to stop at (exclusive). Defaults to the end of the video.
+
+    Yields:
+        chunk: uint8 array of size (chunk_frames, height, width); the last block may be shorter
+    """
+    capture = _open_capture(filepath, start)
+    if capture is None:
+        return
+
+    frame_shape = _frame_shape(capture)
+    i = start
+    try:
+        while end is None or i < end:
+            n = chunk_frames if end is None else min(chunk_frames, end - i)
+            chunk = np.empty((n,) + frame_shape, dtype=np.uint8)
+            decoded = 0
+            while decoded < n:
+                ret, frame = capture.read()
+                if not ret:
+                    break
+                chunk[decoded] = _decode_frame(frame)
+                decoded += 1
+            i += decoded
+            if decoded:
+                yield chunk[:decoded]
+            if decoded < n:
+                break
+    finally:
+        capture.release()
+
+
+def load_mkv_file(filepath, update_progress=None):
     """Wrapper to load a raw .MKV file.
 
     Args:
         filepath (str): Path ot file
+        update_progress (func, optional): progress callback, normalized to 1
 
     Returns:
         signals: Dictionary of CascadeSignal
     """
     signals = {}
 
-    file_metadata, sigarray = read_mkv_data(filepath)
+    file_metadata, sigarray = read_mkv_data(filepath, update_progress=update_progress)
     if sigarray is not None:
         signals[0] = CardiacSignal(
             signal=sigarray, metadata=file_metadata, channel="Single"
         )
-    return signals
\ No newline at end of file
+    return signals
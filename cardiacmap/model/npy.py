@@ -0,0 +1,180 @@
+import os
+import struct
+import zipfile
+from typing import Dict
+
+import numpy as np
+
+from cardiacmap.model.data import CardiacSignal
+from cardiacmap.model.sidecar import read_sidecar
+from cardiacmap.model.planner import large_file_check
+
+# Sidecar "layout" of arrays exported from a CardiacSignal, which are stored (t, y, x).
+# Arrays without it (e.g. from scripts/cascade_parser.py) hold frames as read from the
+# recording, (t, x, y), like the other loaders return.
+SIGNAL_LAYOUT = "signal"
+
+# Name of the array to load from an .npz archive, as for .mat files
+NPZ_KEY = "data"
+
+ZIP_LOCAL_HEADER = struct.Struct("<4s5H3I2H")
+
+
+def _map_npz_member(filepath: str, archive: zipfile.ZipFile, name: str):
+    """Memory-map an array stored uncompressed in an .npz archive. Returns None if the
+    member is compressed and has to be read instead."""
+    info = archive.getinfo(name)
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+
+    with open(filepath, "rb") as f:
+        # The member's data follows its local header, whose name / extra field lengths
+        # can differ from those in the central directory
+        f.seek(info.header_offset)
+        local_header = ZIP_LOCAL_HEADER.unpack(f.read(ZIP_LOCAL_HEADER.size))
+        f.seek(local_header[-2] + local_header[-1], os.SEEK_CUR)
+
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+
+    if dtype.hasobject:
+        return None
+    return np.memmap(
+        filepath, dtype=dtype, mode="r", offset=offset, shape=shape,
+        order="F" if fortran_order else "C",
+    )
+
+
+def map_numpy_array(filepath: str) -> np.ndarray:
+    """Open the array in a .npy file, or the `data` array (else the first array) of an
+    .npz archive, memory-mapped so nothing is read until frames are accessed. Members
+    of compressed .npz archives can't be mapped and are read whole.
+
+    Args:
+        filepath (str): Input file path
+
+    Returns:
+        array: read-only array, a memmap where possible
+    """
+    if os.path.splitext(filepath)[1].lower() != ".npz":
+        return np.load(filepath, mmap_mode="r")
+
+    with zipfile.ZipFile(filepath) as archive:
+        names = [n for n in archive.namelist() if n.endswith(".npy")]
+        if not names:
+            raise ValueError(f"{os.path.basename(filepath)} contains no arrays")
+        name = NPZ_KEY + ".npy" if NPZ_KEY + ".npy" in names else names[0]
+
+        array = _map_npz_member(filepath, archive, name)
+        if array is None:
+            with archive.open(name) as member:
+                array = np.lib.format.read_array(member)
+    return array
+
+
+def map_numpy_frames(filepath: str, metadata: Dict = None) -> np.ndarray:
+    """Frames of a .npy / .npz file as (frame, H, W), the layout the recording loaders
+    return. Arrays exported from a signal are swapped back, which is only a view."""
+    array = map_numpy_array(filepath)
+    if array.ndim != 3:
+        raise ValueError(f"Expected a 3D (frame, H, W) array, got shape {array.shape}")
+
+    if metadata is None:
+        metadata = read_sidecar(filepath) or {}
+    if metadata.get("layout") == SIGNAL_LAYOUT:
+        array = array.transpose(0, 2, 1)
+    return array
+
+
+def read_numpy_data(filepath: str, largeFilePopup):
+    """Open a .npy / .npz file. Metadata comes from the .json sidecar next to it, if any.
+
+    Args:
+        filepath (str): Input file path
+        largeFilePopup (func): callback function to open popup window for larger-than-memory files
+
+    Returns:
+        metadata: dict of metadata
+        imarray: numpy array of size (frame, H, W)
+    """
+    sidecar = read_sidecar(filepath) or {}
+    frames = map_numpy_frames(filepath, sidecar)
+    span_T, span_X, span_Y = frames.shape
+
+    metadata = {"filename": os.path.basename(filepath), "framerate": 500}
+    metadata.update(
+        {k: v for k, v in sidecar.items() if k not in ("layout", "span_T", "span_X", "span_Y")}
+    )
+    sigarray = None
+
+    trimFrames = large_file_check(
+        filepath, largeFilePopup, span_T, span_X, span_Y,
+        itemsize=frames.dtype.itemsize, mappable=isinstance(frames, np.memmap),
+    )
+    if trimFrames is not None:
+        sigarray = frames
+        if trimFrames[1] != 0:
+            sigarray = sigarray[trimFrames[0] : trimFrames[0] + trimFrames[1]]
+
+        metadata["span_T"] = len(sigarray)
+        metadata["span_X"] = span_X
+        metadata["span_Y"] = span_Y
+
+    return metadata, sigarray
+
+
+def iter_numpy_chunks(filepath: str, chunk_frames: int, start: int = 0, end: int = None):
+    """Yield consecutive blocks of frames from a .npy / .npz file, read through the
+    memory map.
+
+    Args:
+        filepath (str): Input file path
+        chunk_frames (int): number of frames per block
+        start (int): first frame to read
+        end (int, optional): frame to stop at (exclusive). Defaults to the last frame.
+
+    Yields:
+        chunk: array of size (chunk_frames, H, W); the last block may be shorter
+    """
+    frames = map_numpy_frames(filepath)
+
+    end = len(frames) if end is None else min(end, len(frames))
+    for i in range(start, end, chunk_frames):
+        yield frames[i : min(i + chunk_frames, end)]
+
+
+def load_numpy_file(filepath, largeFilePopup, dual_mode=False) -> Dict[int, CardiacSignal]:
+    """Wrapper to load a .npy / .npz file to return a single or dual channel signal.
+
+    Args:
+        filepath (str): Path to file
+        largeFilePopup (func): callback function to open popup window for larger-than-memory files
+        dual_mode (bool, optional): Whether the input signal is dual mode (Voltage / Calcium). Defaults to False.
+
+    Returns:
+        signals: Dictionary of CardiacSignal
+    """
+    signals = {}
+
+    file_metadata, sigarray = read_numpy_data(filepath, largeFilePopup)
+    if sigarray is not None:
+
+        if dual_mode:
+            odd_frames, even_frames = [sigarray[::2, :, :], sigarray[1::2, :, :]]
+            signals[0] = CardiacSignal(
+                signal=odd_frames, metadata=file_metadata, channel="Odd"
+            )
+            signals[1] = CardiacSignal(
+                signal=even_frames, metadata=file_metadata, channel="Even"
+            )
+            file_metadata["span_T"] = file_metadata["span_T"] // 2
+        else:
+            signals[0] = CardiacSignal(
+                signal=sigarray, metadata=file_metadata, channel="Single"
+            )
+
+    return signals
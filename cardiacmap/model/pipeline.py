@@ -0,0 +1,308 @@
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+
+from cardiacmap.transforms import (
+    AverageReach,
+    ButterworthFilter,
+    InvertSignal,
+    NormalizeData,
+    RemoveBaselineDrift,
+    RemoveBaselineTrace,
+    SpatialAverage,
+    SpatialAverageAt,
+    TimeAverage,
+    TimeAverageTrace,
+)
+
+# Memory the evaluated regions of one signal may hold
+REGION_CACHE_BYTES = 64 * 2**20
+
+
+class Region(NamedTuple):
+    """Box of a (t, y, x) array, as [t0, t1) x [y0, y1) x [x0, x1)"""
+
+    t0: int
+    t1: int
+    y0: int
+    y1: int
+    x0: int
+    x1: int
+
+    @property
+    def slices(self):
+        return slice(self.t0, self.t1), slice(self.y0, self.y1), slice(self.x0, self.x1)
+
+    def within(self, outer: "Region"):
+        """Slices of this region in an array holding `outer`"""
+        return (
+            slice(self.t0 - outer.t0, self.t1 - outer.t0),
+            slice(self.y0 - outer.y0, self.y1 - outer.y0),
+            slice(self.x0 - outer.x0, self.x1 - outer.x0),
+        )
+
+    @property
+    def is_trace(self) -> bool:
+        return self.y1 - self.y0 == 1 and self.x1 - self.x0 == 1
+
+    @classmethod
+    def full(cls, shape):
+        return cls(0, shape[0], 0, shape[1], 0, shape[2])
+
+
+class Operation:
+    """A transform recorded in a CardiacSignal's pipeline. It can be run eagerly over
+    the whole recording, through the signal's own transform methods, or evaluated for a
+    region of its output from just the region of its input that region depends on.
+
+    Operations that need statistics of their whole input (full_input) are not evaluated
+    by region; the pipeline is run up to them instead. Their `apply` is only used for
+    previews, and takes the statistics of the region it is given.
+    """
+
+    full_input = False
+
+    def output_length(self, length: int) -> int:
+        return length
+
+    def input_region(self, region: Region, shape) -> Region:
+        """Region of the input needed to compute `region` of the output"""
+        return region
+
+    def apply(self, block: np.ndarray, in_region: Region, out_region: Region) -> np.ndarray:
+        """Compute `out_region` of the output from `block`, which holds `in_region` of
+        the input"""
+        raise NotImplementedError
+
+    def run(self, signal):
+        """Run over the whole recording"""
+        raise NotImplementedError
+
+
+class Trim(Operation):
+    def __init__(self, start: int, end: int):
+        self.start, self.end = start, end
+
+    def output_length(self, length):
+        return len(range(length)[self.start : -self.end])
+
+    def input_region(self, region, shape):
+        return region._replace(t0=region.t0 + self.start, t1=region.t1 + self.start)
+
+    def apply(self, block, in_region, out_region):
+        return block
+
+    def run(self, signal):
+        signal._trim_data(self.start, self.end)
+
+
+class Invert(Operation):
+    # maps x to max - x over the whole recording
+    full_input = True
+
+    def apply(self, block, in_region, out_region):
+        return InvertSignal(np.asarray(block))
+
+    def run(self, signal):
+        signal._invert_data()
+
+
+class Normalize(Operation):
+    def __init__(self, normalize_global: bool, start: int, end: int):
+        self.normalize_global = normalize_global
+        self.start, self.end = start, end
+        # global normalization scales by the min / max over every pixel
+        self.full_input = normalize_global
+
+    def input_region(self, region, shape):
+        # each pixel is scaled by its own min / max over [start, end)
+        return region._replace(
+            t0=min(region.t0, self.start), t1=min(max(region.t1, self.end), shape[0])
+        )
+
+    def apply(self, block, in_region, out_region):
+        out = np.array(block[out_region.within(in_region)])
+        s, e = max(out_region.t0, self.start), min(out_region.t1, self.end)
+        if s < e:
+            n = NormalizeData(block[self.start - in_region.t0 : self.end - in_region.t0])
+            out[s - out_region.t0 : e - out_region.t0] = n[s - self.start : e - self.start]
+        return out
+
+    def run(self, signal):
+        signal._normalize(self.normalize_global, self.start, self.end)
+
+
+class Average(Operation):
+    def __init__(self, type: str, sig, rad, mode: str, start: int, end: int, mask: np.ndarray):
+        self.type, self.sig, self.rad, self.mode = type, sig, rad, mode
+        self.start, self.end = start, end
+        self.mask = mask
+        self.halo = AverageReach(rad, mode)
+
+    def input_region(self, region, shape):
+        h = self.halo
+        if self.type == "time":
+            return region._replace(t0=max(0, region.t0 - h), t1=min(shape[0], region.t1 + h))
+        return region._replace(
+            y0=max(0, region.y0 - h), y1=min(shape[1], region.y1 + h),
+            x0=max(0, region.x0 - h), x1=min(shape[2], region.x1 + h),
+        )
+
+    def apply(self, block, in_region, out_region):
+        out = np.array(block[out_region.within(in_region)])
+        s, e = max(out_region.t0, self.start), min(out_region.t1, self.end)
+        if s >= e:
+            return out
+
+        mask = self.mask[in_region.y0 : in_region.y1, in_region.x0 : in_region.x1]
+        y, x = out_region.y0 - in_region.y0, out_region.x0 - in_region.x0
+        if self.type == "time":
+            # filter the frames within the halo, clipped to [start, end) like the full
+            # transform, so the filter sees the same boundaries
+            fs, fe = max(self.start, s - self.halo), min(self.end, e + self.halo)
+            frames = block[fs - in_region.t0 : fe - in_region.t0]
+            if out_region.is_trace:
+                averaged = TimeAverageTrace(frames[:, y, x], self.sig, self.rad, self.mode)
+                averaged = averaged[s - fs : e - fs, None, None]
+            else:
+                averaged = TimeAverage(frames, self.sig, self.rad, mask, self.mode)
+                averaged = averaged[(slice(s - fs, e - fs),) + out_region.within(in_region)[1:]]
+        else:
+            frames = block[s - in_region.t0 : e - in_region.t0]
+            if out_region.is_trace:
+                averaged = SpatialAverageAt(frames, self.sig, self.rad, y, x, mask, self.mode)
+                averaged = averaged[:, None, None]
+            else:
+                averaged = SpatialAverage(frames, self.sig, self.rad, mask, self.mode)
+                averaged = averaged[(slice(None),) + out_region.within(in_region)[1:]]
+        out[s - out_region.t0 : e - out_region.t0] = averaged
+        return out
+
+    def run(self, signal):
+        signal._perform_average(self.type, self.sig, self.rad, self.mode, self.start, self.end)
+
+
+class Butterworth(Operation):
+    def __init__(self, order, low, high, ms):
+        self.order, self.low, self.high, self.ms = order, low, high, ms
+
+    def input_region(self, region, shape):
+        # the filter is causal, so frame t depends on frames [0, t]
+        return region._replace(t0=0)
+
+    def apply(self, block, in_region, out_region):
+        filtered = ButterworthFilter(block, self.order, self.low, self.high, self.ms)
+        return np.asarray(filtered[out_region.within(in_region)], dtype=block.dtype)
+
+    def run(self, signal):
+        signal._butterworth(self.order, self.low, self.high, self.ms)
+
+
+class RemoveBaseline(Operation):
+    def __init__(self, params, peaks: bool, start: int, end: int, mask: np.ndarray):
+        self.params, self.peaks = params, peaks
+        self.start, self.end = start, end
+        self.mask = mask
+
+    # baseline is fitted per pixel over [start, end)
+    input_region = Normalize.input_region
+
+    def apply(self, block, in_region, out_region):
+        out = np.array(block[out_region.within(in_region)])
+        s, e = max(out_region.t0, self.start), min(out_region.t1, self.end)
+        if s < e:
+            data = block[self.start - in_region.t0 : self.end - in_region.t0]
+            mask = self.mask[in_region.y0 : in_region.y1, in_region.x0 : in_region.x1]
+            if in_region.is_trace:
+                results = data
+                if mask[0, 0] != 0:
+                    results = RemoveBaselineTrace(data[:, 0, 0], self.params, self.peaks)[:, None, None]
+            else:
+                results = RemoveBaselineDrift(np.moveaxis(data, 0, -1), mask, 4, self.params, self.peaks)
+                results = np.moveaxis(results, -1, 0)
+            out[s - out_region.t0 : e - out_region.t0] = results[s - self.start : e - self.start]
+        return out
+
+    def run(self, signal):
+        signal._remove_baseline(self.params, self.peaks, self.start, self.end)
+
+
+class RegionCache:
+    """Evaluated regions of pipeline prefixes, least recently used evicted first"""
+
+    def __init__(self, max_bytes: int = REGION_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        block = self.entries.get(key)
+        if block is not None:
+            self.entries.move_to_end(key)
+        return block
+
+    def put(self, key, block: np.ndarray):
+        if block.nbytes > self.max_bytes:
+            return
+        if key in self.entries:
+            self.nbytes -= self.entries.pop(key).nbytes
+        self.entries[key] = block
+        self.nbytes += block.nbytes
+        while self.nbytes > self.max_bytes:
+            self.nbytes -= self.entries.popitem(last=False)[1].nbytes
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+
+def input_regions(shape, ops, region: Region):
+    """Regions of the input of each operation, and of the output of the last, needed to
+    compute `region` of the output of a pipeline applied to an input of `shape`"""
+    shapes = [shape]
+    for op in ops:
+        shapes.append((op.output_length(shapes[-1][0]),) + shapes[-1][1:])
+
+    regions = [None] * len(ops) + [region]
+    for k in range(len(ops) - 1, -1, -1):
+        regions[k] = ops[k].input_region(regions[k + 1], shapes[k])
+    return regions
+
+
+def evaluate_region(
+    data: np.ndarray, ops, region: Region, cache: RegionCache = None, key=(), dtype=np.float32
+):
+    """Evaluate `region` of the output of a pipeline of operations applied to `data`,
+    reading only the parts of `data` it depends on. Intermediate results are cached per
+    pipeline prefix, so re-evaluating after adding or undoing an operation reuses them.
+
+    Args:
+        data (array): input of the pipeline, (t, y, x)
+        ops (list): Operations, none of them full_input
+        region (Region): region of the pipeline's output
+        cache (RegionCache, optional): cache of evaluated regions
+        key (tuple): identifies `data` in cache keys
+        dtype (dtype): dtype the region is computed in
+
+    Returns:
+        block: array holding `region`
+    """
+    regions = input_regions(data.shape, ops, region)
+
+    # start from the deepest prefix already evaluated for the region it is needed for
+    first, block = 0, None
+    if cache is not None:
+        for k in range(len(ops), 0, -1):
+            block = cache.get((key, tuple(ops[:k]), regions[k]))
+            if block is not None:
+                first = k
+                break
+    if block is None:
+        block = np.asarray(data[regions[0].slices], dtype=dtype)
+
+    for k in range(first, len(ops)):
+        block = ops[k].apply(block, regions[k], regions[k + 1])
+        if cache is not None:
+            cache.put((key, tuple(ops[: k + 1]), regions[k + 1]), block)
+    return block
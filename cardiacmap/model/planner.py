@@ -0,0 +1,111 @@
+from typing import NamedTuple, Optional
+
+import psutil
+
+from cardiacmap.model.data import CardiacSignal
+
+# Fraction of available memory a recording may use, leaving room for apd, di, fft, etc.
+USAGE_THRESHOLD = 0.5
+
+# Transforms allocate roughly one float32 working copy on top of the resident data
+TRANSFORM_HEADROOM_BYTES = 4
+
+
+class LoadPlan(NamedTuple):
+    """Result of plan_load.
+
+    strategy is "memory" (raw data read into RAM alongside the signal copies),
+    "mmap" (raw data stays memory-mapped on disk, only the signal copies are
+    resident) or None when no strategy fits and the recording has to be trimmed.
+    """
+
+    strategy: Optional[str]
+    footprint: int
+    budget: int
+    max_frames: int
+
+
+def frame_nbytes(span_X: int, span_Y: int, itemsize: int = 2, mapped: bool = False) -> int:
+    """Bytes one loaded frame costs once a CardiacSignal has been built from it.
+
+    Args:
+        span_X, span_Y (int): frame size as handed to CardiacSignal
+        itemsize (int): bytes per sample of the array handed to CardiacSignal
+        mapped (bool): whether that array is memory-mapped rather than resident
+    """
+    per_sample = CardiacSignal.RESIDENT_BYTES_PER_SAMPLE + TRANSFORM_HEADROOM_BYTES
+    if not mapped:
+        per_sample += itemsize
+    return span_X * span_Y * per_sample
+
+
+def plan_load(
+    span_T: int,
+    span_X: int,
+    span_Y: int,
+    itemsize: int = 2,
+    mappable: bool = False,
+    free_mem: Optional[int] = None,
+) -> LoadPlan:
+    """Pick the cheapest way to open a recording that fits in memory. Strategies are
+    tried in order: fully in RAM, then memory-mapped.
+
+    Args:
+        span_T, span_X, span_Y (int): recording size as handed to CardiacSignal
+        itemsize (int): bytes per sample of the raw array
+        mappable (bool): whether the loader can memory-map the raw data
+        free_mem (int, optional): bytes available. Defaults to psutil's available memory.
+
+    Returns:
+        LoadPlan
+    """
+    if free_mem is None:
+        free_mem = psutil.virtual_memory().available
+    budget = int(free_mem * USAGE_THRESHOLD)
+
+    candidates = [("memory", frame_nbytes(span_X, span_Y, itemsize, mapped=False))]
+    if mappable:
+        candidates.append(("mmap", frame_nbytes(span_X, span_Y, itemsize, mapped=True)))
+
+    for strategy, per_frame in candidates:
+        if span_T * per_frame <= budget:
+            return LoadPlan(strategy, span_T * per_frame, budget, span_T)
+
+    # Most frames that can be opened with the cheapest in-memory strategy
+    per_frame = candidates[-1][1]
+    max_frames = budget // per_frame
+    return LoadPlan(None, span_T * per_frame, budget, max_frames)
+
+
+def large_file_check(
+    filepath, _callback, fileLen, span_X=128, span_Y=128, itemsize=2, mappable=False
+):
+    """Helper method to check a recording against available RAM to avoid OOM error. The
+    footprint is computed from the recording size and the copies CardiacSignal keeps, and
+    the trim popup is only shown when no load strategy fits.
+    Args:
+        filepath(str): Input file path
+        _callback (func): popup asking the user for a frame range, called as _callback(fileLen, maxFrames)
+        fileLen (int): number of frames in the file
+        span_X, span_Y (int): frame size as handed to CardiacSignal
+        itemsize (int): bytes per sample of the raw array
+        mappable (bool): whether the loader memory-maps the raw data
+    Returns:
+        tuple: (skip_frames, read_frames) or (0, 0) if file is small enough to handle
+    """
+    plan = plan_load(fileLen, span_X, span_Y, itemsize, mappable)
+
+    (skip, size) = (0, 0)
+
+    if plan.strategy is None:
+        start, end = _callback(fileLen, plan.max_frames)  # pauses execution until popup is closed
+
+        print(start, end)
+
+        if start is not None and end is not None:
+            skip = start
+            size = end - start
+        else:
+            return None
+
+    return (skip, size)
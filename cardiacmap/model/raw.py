@@ -0,0 +1,145 @@
+import os
+from typing import Dict
+
+import numpy as np
+
+from cardiacmap.model.data import CardiacSignal
+from cardiacmap.model.sidecar import read_sidecar
+from cardiacmap.model.planner import large_file_check
+
+# Layout keys of a raw sidecar, besides span_X / span_Y. As in cascade files, each frame
+# is span_X rows of span_Y samples. span_T defaults to as many frames as the file holds.
+RAW_DEFAULTS = dict(dtype="<u2", offset=0, skip_bytes=0, framerate=500)
+
+
+def read_raw_header(filepath: str) -> Dict:
+    """Get the layout of a headerless raw file from its .json sidecar.
+
+    Args:
+        filepath (str): Input file path
+
+    Returns:
+        header: dict with span_T / span_X / span_Y, dtype, offset (bytes before the
+            first frame), skip_bytes (per-frame trailer) and framerate
+    """
+    sidecar = read_sidecar(filepath)
+    if sidecar is None:
+        raise ValueError(f"{os.path.basename(filepath)} has no sidecar describing its layout")
+
+    header = dict(RAW_DEFAULTS)
+    header.update(sidecar)
+    if "span_X" not in header or "span_Y" not in header:
+        raise ValueError("Raw sidecar must give the frame size as span_X and span_Y")
+    return header
+
+
+def map_raw_frames(filepath: str, header: Dict) -> np.memmap:
+    """Memory-map the frames of a raw file. Per-frame trailers are stepped over via the
+    frame stride, as for cascade files.
+
+    Args:
+        filepath (str): Input file path
+        header (dict): Layout from read_raw_header
+
+    Returns:
+        frames: read-only memmap view of size (frame, H, W)
+    """
+    span_X, span_Y = header["span_X"], header["span_Y"]
+    dt = np.dtype(header["dtype"])
+    if header["skip_bytes"] % dt.itemsize:
+        raise ValueError("skip_bytes must be a multiple of the sample size")
+    frame_words = span_X * span_Y + header["skip_bytes"] // dt.itemsize
+
+    available = (os.path.getsize(filepath) - header["offset"]) // (frame_words * dt.itemsize)
+    span_T = min(header.get("span_T") or available, available)
+
+    frames = np.memmap(
+        filepath, dtype=dt, mode="r", offset=header["offset"], shape=(span_T, frame_words)
+    )
+    return frames[:, : span_X * span_Y].reshape(span_T, span_X, span_Y)
+
+
+def read_raw_data(filepath: str, largeFilePopup):
+    """Load a headerless raw file through a memory map. Returns a 3D signal array.
+
+    Args:
+        filepath (str): Input file path
+        largeFilePopup (func): callback function to open popup window for larger-than-memory files
+
+    Returns:
+        metadata: dict of metadata
+        imarray: numpy array of size (frame, H, W)
+    """
+    header = read_raw_header(filepath)
+    frames = map_raw_frames(filepath, header)
+    span_T, span_X, span_Y = frames.shape
+
+    metadata = {"filename": os.path.basename(filepath), "framerate": header["framerate"]}
+    sigarray = None
+
+    trimFrames = large_file_check(
+        filepath, largeFilePopup, span_T, span_X, span_Y,
+        itemsize=frames.dtype.itemsize, mappable=True,
+    )
+    if trimFrames is not None:
+        sigarray = frames
+        if trimFrames[1] != 0:
+            sigarray = sigarray[trimFrames[0] : trimFrames[0] + trimFrames[1]]
+
+        metadata["span_T"] = len(sigarray)
+        metadata["span_X"] = span_X
+        metadata["span_Y"] = span_Y
+
+    return metadata, sigarray
+
+
+def iter_raw_chunks(filepath: str, chunk_frames: int, start: int = 0, end: int = None):
+    """Yield consecutive blocks of frames from a raw file, read through the memory map.
+
+    Args:
+        filepath (str): Input file path
+        chunk_frames (int): number of frames per block
+        start (int): first frame to read
+        end (int, optional): frame to stop at (exclusive). Defaults to the end of the file.
+
+    Yields:
+        chunk: array of size (chunk_frames, H, W); the last block may be shorter
+    """
+    frames = map_raw_frames(filepath, read_raw_header(filepath))
+
+    end = len(frames) if end is None else min(end, len(frames))
+    for i in range(start, end, chunk_frames):
+        yield frames[i : min(i + chunk_frames, end)]
+
+
+def load_raw_file(filepath, largeFilePopup, dual_mode=False) -> Dict[int, CardiacSignal]:
+    """Wrapper to load a headerless raw file to return a single or dual channel signal.
+
+    Args:
+        filepath (str): Path to file
+        largeFilePopup (func): callback function to open popup window for larger-than-memory files
+        dual_mode (bool, optional): Whether the input signal is dual mode (Voltage / Calcium). Defaults to False.
+
+    Returns:
+        signals: Dictionary of CardiacSignal
+    """
+    signals = {}
+
+    file_metadata, sigarray = read_raw_data(filepath, largeFilePopup)
+    if sigarray is not None:
+
+        if dual_mode:
+            odd_frames, even_frames = [sigarray[::2, :, :], sigarray[1::2, :, :]]
+            signals[0] = CardiacSignal(
+                signal=odd_frames, metadata=file_metadata, channel="Odd"
+            )
+            signals[1] = CardiacSignal(
+                signal=even_frames, metadata=file_metadata, channel="Even"
+            )
+            file_metadata["span_T"] = file_metadata["span_T"] // 2
+        else:
+            signals[0] = CardiacSignal(
+                signal=sigarray, metadata=file_metadata, channel="Single"
+            )
+
+    return signals
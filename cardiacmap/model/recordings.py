@@ -0,0 +1,87 @@
+import os
+import threading
+import weakref
+from typing import Dict, Hashable, Optional, Tuple
+
+from cardiacmap.model.data import CardiacSignal
+
+
+class RecordingRegistry:
+    """Process-wide registry of the recordings open in any window, so opening one again
+    shares its data rather than reading another copy. Signals handed out share
+    base_data and the base image with the open ones (see CardiacSignal.share); each
+    makes its own working copy on its first transform.
+
+    A recording stays registered while any signal over it is alive: the registry holds
+    weak references only, so closing the last window using it frees it.
+
+    Usage:
+        key = RECORDINGS.key(filepath, options)
+        signals = RECORDINGS.get(key)
+        if signals is None:
+            signals = RECORDINGS.register(key, load(filepath))
+    """
+
+    def __init__(self):
+        # reentrant, as garbage collection can run _release while the lock is held
+        self._lock = threading.RLock()
+        # key -> {channel index: weak references to the signals over it}
+        self._recordings: Dict[Tuple, Dict[int, list]] = {}
+
+    @staticmethod
+    def key(filepath: str, *options: Hashable) -> Tuple:
+        """Identifies a recording: the file, as last modified, and whatever else decides
+        what is read from it, e.g. load options. Editing the file gives a new key."""
+        stat = os.stat(filepath)
+        return (os.path.realpath(filepath), stat.st_mtime_ns, stat.st_size) + options
+
+    def get(self, key: Tuple) -> Optional[Dict[int, CardiacSignal]]:
+        """New signals sharing the data of the open recording `key`, by channel index,
+        or None if it isn't open"""
+        with self._lock:
+            channels = self._recordings.get(key)
+            if channels is None:
+                return None
+            open_signals = {}
+            for i, refs in channels.items():
+                signal = next((s for s in (ref() for ref in refs) if s is not None), None)
+                if signal is None:
+                    return None
+                open_signals[i] = signal
+
+        signals = {i: signal.share() for i, signal in open_signals.items()}
+        self._add(key, signals)
+        return signals
+
+    def register(self, key: Tuple, signals: Dict[int, CardiacSignal]) -> Dict[int, CardiacSignal]:
+        """Register freshly loaded `signals`, by channel index, as recording `key`"""
+        with self._lock:
+            self._recordings.pop(key, None)
+        self._add(key, signals)
+        return signals
+
+    def _add(self, key: Tuple, signals: Dict[int, CardiacSignal]):
+        with self._lock:
+            channels = self._recordings.setdefault(key, {})
+            for i, signal in signals.items():
+                channels.setdefault(i, []).append(
+                    weakref.ref(signal, lambda ref, key=key, i=i: self._release(key, i, ref))
+                )
+
+    def _release(self, key: Tuple, i: int, ref):
+        # a signal was garbage collected; the recording is dropped with its last signal
+        with self._lock:
+            channels = self._recordings.get(key)
+            if channels is None or ref not in channels.get(i, []):
+                return
+            channels[i].remove(ref)
+            if not channels[i]:
+                del self._recordings[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._recordings)
+
+
+# The registry the viewer opens recordings through
+RECORDINGS = RecordingRegistry()
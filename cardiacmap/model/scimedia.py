@@ -1,61 +1,167 @@
 import os
-import struct
 import numpy as np
-import skimage
 
 from cardiacmap.model.data import CardiacSignal
-from cardiacmap.viewer.components import large_file_check
+from cardiacmap.model.planner import large_file_check
+
+HEADER_SIZE = 972
+POOL_CHUNK_FRAMES = 256
+# SciMedia frames are 2x2 pooled on load
+POOL_FACTOR = 2
+
+
+def read_scimedia_header(file, read_background: bool = True):
+    """Parse the header and background image of an open SciMedia .gsd file. Leaves the
+    file positioned at the first frame.
+
+    Args:
+        file (BinaryIO): File opened in binary mode, positioned at the start
+        read_background (bool): also read the background image. Otherwise bg_img is
+            None and the file is left positioned after the fixed size header.
+
+    Returns:
+        header: dict with xPixels / yPixels / nFrames, the background image bg_img and
+            offset (byte offset of the first frame)
+    """
+    dt = np.dtype("int16").newbyteorder("<")
+
+    header = file.read(HEADER_SIZE)
+    (
+        xPixels,
+        yPixels,
+        xSkipPix,
+        ySkipPix,
+        xActPix,
+        yActPix,
+        nFrames,
+    ) = np.frombuffer(header, dtype=dt, count=7, offset=256).tolist()
+
+    bg_img = None
+    if read_background:
+        bg_img = np.frombuffer(file.read(xPixels * yPixels * 2), dtype=dt)
+        bg_img = bg_img.reshape(xPixels, yPixels)
+
+    return dict(
+        xPixels=xPixels,
+        yPixels=yPixels,
+        nFrames=nFrames,
+        bg_img=bg_img,
+        offset=HEADER_SIZE + xPixels * yPixels * 2,
+    )
 
 
-# TODO: To test and make robust
-def read_scimedia_data(filepath: str, largeFilePopup, update_progress=None):
+def map_scimedia_frames(filepath: str, header) -> np.memmap:
+    """Memory-map the raw int16 frames of a SciMedia .gsd file without reading them.
 
-    file = open(filepath, "rb")
+    Args:
+        filepath (str): Input file path
+        header (dict): Parsed header from read_scimedia_header
 
-    file.read(256)
+    Returns:
+        frames: read-only memmap of size (frame, H, W)
+    """
+    dt = np.dtype("int16").newbyteorder("<")
+    xPixels, yPixels = header["xPixels"], header["yPixels"]
 
-    xPixels = struct.unpack("<" + "h" * 1, file.read(2))[0]
-    yPixels = struct.unpack("<" + "h" * 1, file.read(2))[0]
-    xSkipPix = struct.unpack("<" + "h" * 1, file.read(2))[0]
-    ySkipPix = struct.unpack("<" + "h" * 1, file.read(2))[0]
-    xActPix = struct.unpack("<" + "h" * 1, file.read(2))[0]
-    yActPix = struct.unpack("<" + "h" * 1, file.read(2))[0]
-    nFrames = struct.unpack("<" + "h" * 1, file.read(2))[0]
+    # Clamp to the frames actually present, in case the recording was cut short
+    available = (os.path.getsize(filepath) - header["offset"]) // (xPixels * yPixels * 2)
+    nFrames = min(header["nFrames"], available)
 
-    print(nFrames)
-    file = open(filepath, "rb")
+    return np.memmap(
+        filepath, dtype=dt, mode="r", offset=header["offset"], shape=(nFrames, xPixels, yPixels)
+    )
 
-    file.read(972)
 
-    bg_img = struct.unpack(
-        "<" + "h" * xPixels * yPixels, file.read(xPixels * yPixels * 2)
-    )
-    bg_img = np.array(bg_img).reshape(xPixels, yPixels)
+def pooled_size(n: int, factor: int = POOL_FACTOR) -> int:
+    """Rows / columns left after pool_frames: a partial block at the edge is kept"""
+    return -(-n // factor)
+
+
+def pool_frames(
+    frames, out=None, chunk_frames=POOL_CHUNK_FRAMES, update_progress=None, factor=POOL_FACTOR
+):
+    """NxN mean-pool frames chunk by chunk, straight into a float32 output. Only one
+    chunk is ever converted to float at a time. Trailing rows / columns that don't fill
+    a block are padded with zeros, as skimage's block_reduce does.
+
+    Args:
+        frames (array): raw data of size (frame, H, W), typically a memmap
+        out (array, optional): preallocated float32 output of size (frame, H / N, W / N),
+            rounded up
+        chunk_frames (int): number of frames to pool at a time
+        update_progress (func, optional): progress callback, normalized to 1
+        factor (int): block size N
+
+    Returns:
+        out: float32 array of size (frame, H / N, W / N), rounded up
+    """
+    nFrames = len(frames)
+    h, w = pooled_size(frames.shape[1], factor), pooled_size(frames.shape[2], factor)
+    padded = (h * factor, w * factor) != frames.shape[1:]
+
+    if out is None:
+        out = np.empty((nFrames, h, w), dtype=np.float32)
+
+    for i in range(0, nFrames, chunk_frames):
+        j = min(i + chunk_frames, nFrames)
+        if padded:
+            chunk = np.zeros((j - i, h * factor, w * factor), dtype=np.float32)
+            chunk[:, : frames.shape[1], : frames.shape[2]] = frames[i:j]
+        else:
+            chunk = np.asarray(frames[i:j], dtype=np.float32)
+        np.sum(chunk.reshape(j - i, h, factor, w, factor), axis=(2, 4), out=out[i:j])
+        out[i:j] *= 1 / factor**2
+
+        if update_progress:
+            update_progress(j / nFrames)
+
+    return out
+
 
-    if update_progress:
-        update_progress(0.8)
+def read_scimedia_background(filepath: str) -> np.ndarray:
+    """The background image of a SciMedia .gsd file, pooled like its frames.
 
-    dt = np.dtype("int16")
-    dt = dt.newbyteorder("<")
+    Args:
+        filepath (str): Input file path
 
-    trimFrames = large_file_check(filepath, largeFilePopup, nFrames)
-    if trimFrames[1] != 0:
-        file.read(xPixels * yPixels * trimFrames[0] * 2) # skip
-        nFrames = trimFrames[1] # set new file length
+    Returns:
+        bg_img: float32 array of size (H / 2, W / 2)
+    """
+    with open(filepath, "rb") as file:
+        header = read_scimedia_header(file)
+    return pool_frames(header["bg_img"][np.newaxis])[0]
 
-    sig_array = np.frombuffer(
-        file.read(xPixels * yPixels * nFrames * 2), dtype=dt
-    ).reshape(nFrames, xPixels, yPixels)
-    pooled_array = skimage.measure.block_reduce(sig_array, (1, 2, 2), np.mean)
 
-    print(pooled_array.shape)
+# TODO: To test and make robust
+def read_scimedia_data(filepath: str, largeFilePopup, update_progress=None):
+
+    with open(filepath, "rb") as file:
+        header = read_scimedia_header(file)
+
+    nFrames = header["nFrames"]
+    print(nFrames)
+
+    pooled_array = None
+
+    # pooled float32 frames are resident, the raw frames stay mapped
+    trimFrames = large_file_check(
+        filepath, largeFilePopup, nFrames,
+        pooled_size(header["xPixels"]), pooled_size(header["yPixels"]), itemsize=4,
+    )
+    if trimFrames is not None:
+        sig_array = map_scimedia_frames(filepath, header)
+        if trimFrames[1] != 0:
+            sig_array = sig_array[trimFrames[0] : trimFrames[0] + trimFrames[1]]
 
-    file.close()
+        pooled_array = pool_frames(sig_array, update_progress=update_progress)
+        nFrames = len(pooled_array)
+
+        print(pooled_array.shape)
 
     metadata = dict(
         span_T=nFrames,
-        span_X=128,
-        span_Y=128,
+        span_X=pooled_size(header["xPixels"]),
+        span_Y=pooled_size(header["yPixels"]),
         framerate=500,
         filename=os.path.basename(filepath),
     )
@@ -63,6 +169,28 @@ def read_scimedia_data(filepath: str, largeFilePopup, update_progress=None):
     return metadata, pooled_array
 
 
+def iter_scimedia_chunks(filepath: str, chunk_frames: int, start: int = 0, end: int = None):
+    """Yield consecutive blocks of 2x2-pooled frames from a SciMedia .gsd file, read
+    through the memory map so only the requested frames are pulled from disk.
+
+    Args:
+        filepath (str): Input file path
+        chunk_frames (int): number of frames per block
+        start (int): first frame to read
+        end (int, optional): frame to stop at (exclusive). Defaults to the end of the file.
+
+    Yields:
+        chunk: float32 array of size (chunk_frames, H / 2, W / 2); the last block may be shorter
+    """
+    with open(filepath, "rb") as file:
+        header = read_scimedia_header(file)
+    frames = map_scimedia_frames(filepath, header)
+
+    end = len(frames) if end is None else min(end, len(frames))
+    for i in range(start, end, chunk_frames):
+        yield pool_frames(frames[i : min(i + chunk_frames, end)], chunk_frames=chunk_frames)
+
+
 def load_scimedia_data(filepath: str, largeFilePopup, update_progress=None):
 
     file_metadata, sigarray = read_scimedia_data(
@@ -71,8 +199,9 @@ def load_scimedia_data(filepath: str, largeFilePopup, update_progress=None):
 
     signals = {}
 
-    signals[0] = CardiacSignal(
-        signal=sigarray, metadata=file_metadata, channel="Single"
-    )
+    if sigarray is not None:
+        signals[0] = CardiacSignal(
+            signal=sigarray, metadata=file_metadata, channel="Single"
+        )
 
     return signals
@@ -0,0 +1,240 @@
+import os
+import struct
+import threading
+import weakref
+
+import numpy as np
+
+from cardiacmap.model.container import (
+    CHUNK_SHAPE,
+    MAGIC,
+    PREAMBLE,
+    SignalContainer,
+    _write_array,
+    encode_header,
+    signal_arrays,
+)
+from cardiacmap.model.data import CardiacSignal
+from cardiacmap.model.history import frame_union
+
+# Session files are chunked signal containers, so they open like any .signal file
+SESSION_SUFFIX = ".session.signal"
+
+# A session file is rewritten from scratch once chunks no longer referenced by its
+# header take up more than its live data plus this much
+COMPACT_SLACK_BYTES = 64 * 2**20
+
+
+def session_path(folder: str, signal: CardiacSignal, copy: int = 1) -> str:
+    """Session file of `signal` in `folder`. Further windows on the same recording save
+    to copy 2, 3, ..."""
+    suffix = "" if copy == 1 else f"_{copy}"
+    return os.path.join(os.path.normpath(folder), signal.signal_name + suffix + SESSION_SUFFIX)
+
+
+class SessionChanged(Exception):
+    """The signal's data changed while a snapshot of it was being written"""
+
+
+class SessionSnapshot:
+    """The signal as it is when the snapshot is taken: references to its data and state,
+    nothing copied. Take it on the thread that transforms the signal. Transforms bump
+    the signal's data version before and after writing to its data in place, so a
+    writer on another thread copies a chunk at a time and calls check() after each.
+    """
+
+    def __init__(self, signal: CardiacSignal):
+        self.signal = signal
+        self.version = signal._data_version
+        # frames changed since the previous snapshot
+        self.changed_frames = signal.take_changed_frames()
+        self.data = signal._baked_data()
+        self.metadata = signal.metadata
+        self.state = signal.get_state()
+        # lists the signal appends to are copied, e.g. the transform log
+        for attr in signal.STATE_ATTRS:
+            if isinstance(self.state[attr], list):
+                self.state[attr] = list(self.state[attr])
+        self.state["channel"] = signal.channel
+
+    def check(self):
+        if self.signal._data_version != self.version:
+            raise SessionChanged()
+
+
+class SessionWriter:
+    """Writes snapshots of a signal to a session file, each time only the chunks that
+    changed since the last write. Changed chunks and a new header are appended, then the
+    preamble is repointed at the header, so the file stays readable at every step and a
+    write that is interrupted leaves the previous session in place.
+
+    Writing to an existing session file carries on from the chunks already in it.
+    """
+
+    def __init__(self, filepath: str, compression="zlib", level: int = 1):
+        self.filepath = filepath
+        self.compression = compression
+        self.level = level
+        # array specs in the file's current header, None until it has been read
+        self.specs = None
+        self.header = None
+        # frames of the signal's data changed since the "data" array was last written;
+        # all of them until it has been
+        self.changed_frames = (0, None)
+        # cleared if the file cannot be replaced, e.g. on Windows while a signal
+        # restored from it still reads its data from it
+        self.can_compact = True
+
+    def _resume(self):
+        self.specs, self.header = {}, None
+        if not os.path.exists(self.filepath):
+            return
+        try:
+            with SignalContainer(self.filepath) as container:
+                self.specs = container.header["arrays"]
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            print("Starting a new session file,", self.filepath, "could not be read:", e)
+
+    def _live_bytes(self) -> int:
+        # bytes of the file its current header refers to
+        chunks = sum(nbytes for spec in self.specs.values() for _, nbytes in spec["chunks"])
+        return PREAMBLE.size + chunks + len(self.header or b"")
+
+    def write(self, snapshot: SessionSnapshot) -> bool:
+        """Write what changed in `snapshot` since the last write. Returns whether
+        anything was written. Raises SessionChanged, leaving the file as it was, if the
+        signal's data changes before the snapshot is written."""
+        if self.specs is None:
+            self._resume()
+
+        state = dict(snapshot.state)
+        arrays = signal_arrays(snapshot.data, state)
+        # kept until written, so frames changed before a failed write are written next
+        self.changed_frames = frame_union([self.changed_frames, snapshot.changed_frames])
+
+        rewrite = not self.specs or (
+            self.can_compact
+            and os.path.getsize(self.filepath) > 2 * self._live_bytes() + COMPACT_SLACK_BYTES
+        )
+        previous = {} if rewrite else self.specs
+        if rewrite:
+            os.makedirs(os.path.dirname(self.filepath) or ".", exist_ok=True)
+            path = self.filepath + ".part"
+            f = open(path, "w+b")
+            f.write(PREAMBLE.pack(MAGIC, 0, 0))
+        else:
+            path = self.filepath
+            f = open(path, "r+b")
+            f.seek(0, os.SEEK_END)
+        end = f.tell()
+
+        try:
+            specs = {}
+            for name, array in arrays.items():
+                chunk_shape = CHUNK_SHAPE if np.ndim(array) == 3 else np.shape(array)
+                specs[name] = _write_array(
+                    f,
+                    array,
+                    chunk_shape,
+                    self.compression,
+                    self.level,
+                    previous=previous.get(name),
+                    check=snapshot.check if name == "data" else None,
+                    # only the frames that changed are read again
+                    frames=self.changed_frames if name == "data" else (0, None),
+                )
+            snapshot.check()
+
+            header = encode_header(snapshot.metadata, state, specs)
+            if not rewrite and header == self.header:
+                f.close()
+                self.changed_frames = None
+                return False
+
+            header_offset = f.tell()
+            f.write(header)
+            f.flush()
+            os.fsync(f.fileno())
+            f.seek(0)
+            f.write(PREAMBLE.pack(MAGIC, header_offset, len(header)))
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            if rewrite:
+                f.close()
+                os.remove(path)
+            else:
+                # drop the chunks appended for this write
+                f.truncate(end)
+                f.close()
+            raise
+        f.close()
+
+        if rewrite:
+            try:
+                os.replace(path, self.filepath)
+            except OSError:
+                os.remove(path)
+                if self.specs:
+                    self.can_compact = False
+                raise
+        self.specs, self.header, self.changed_frames = specs, header, None
+        return True
+
+
+class Autosave:
+    """Saves a signal to its session file in `folder` in the background.
+
+    Usage, from the thread that transforms the signal (e.g. on a QTimer):
+        autosave = Autosave(signal, folder)
+        autosave.request()
+
+    Each save writes only what changed since the previous one (see SessionWriter).
+    Requests while a save is running are skipped, as are requests while the signal has
+    pending transforms: the saved data has to match the saved transform log, and running
+    them would hold up the calling thread. The next request after they have run saves.
+    """
+
+    # session file -> the Autosave writing to it
+    _claimed = weakref.WeakValueDictionary()
+    _claim_lock = threading.Lock()
+
+    def __init__(self, signal: CardiacSignal, folder: str):
+        self.signal = signal
+        with self._claim_lock:
+            # the first session file of the signal no other open signal saves to
+            copy = 1
+            while session_path(folder, signal, copy) in self._claimed:
+                copy += 1
+            self.writer = SessionWriter(session_path(folder, signal, copy))
+            self._claimed[self.writer.filepath] = self
+        self._thread = None
+
+    @property
+    def filepath(self) -> str:
+        return self.writer.filepath
+
+    def request(self) -> bool:
+        """Start saving the signal as it is now. Returns whether a save was started."""
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        if self.signal.pipeline:
+            return False
+        snapshot = SessionSnapshot(self.signal)
+        self._thread = threading.Thread(target=self._run, args=(snapshot,), daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self, snapshot: SessionSnapshot):
+        try:
+            if self.writer.write(snapshot):
+                print("Autosaved", self.writer.filepath)
+        except SessionChanged:
+            print("Autosave skipped, the data changed while it was being saved")
+        except OSError as e:
+            print("Autosave failed:", e)
+
+    def wait(self, timeout: float = None):
+        """Wait for a running save to finish"""
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,32 @@
+import json
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+SIDECAR_EXTENSION = ".json"
+
+
+def sidecar_path(filepath: str) -> str:
+    """Path of the .json sidecar kept next to a data file, e.g. rec.raw -> rec.json"""
+    return os.path.splitext(filepath)[0] + SIDECAR_EXTENSION
+
+
+def read_sidecar(filepath: str) -> Optional[Dict]:
+    """Read the sidecar of a data file. Returns None if there isn't one."""
+    try:
+        with open(sidecar_path(filepath), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _json_default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def write_sidecar(filepath: str, metadata: Dict):
+    with open(sidecar_path(filepath), "w") as f:
+        json.dump(metadata, f, indent=2, default=_json_default)
@@ -1,68 +1,316 @@
+import json
 import os
+import pathlib
+import sqlite3
+import threading
+from functools import lru_cache
 
 import numpy as np
 
 from cardiacmap.model.data import CardiacSignal
-from cardiacmap.viewer.components import large_file_check
+from cardiacmap.model.planner import large_file_check
 from typing import Dict
 
+SQL_CHUNK_FRAMES = 256
+# blocks of SQL_CHUNK_FRAMES frames an SQLFrames keeps decoded
+SQL_CACHE_BLOCKS = 8
+
+
+class SQLFrameStore:
+    """SQLite-backed recording store. Each frame is kept as a raw BLOB keyed by its
+    frame index, next to a key / value metadata table, so any frame range can be
+    fetched without reading the rest of the recording. A single connection is kept
+    open and reused for every query.
+
+    Frames are stored in the same (H, W) layout as the cascade loader returns, so
+    read_frames(...) can be handed straight to CardiacSignal.
+    """
+
+    def __init__(self, filepath: str, readonly: bool = True):
+        self.filepath = filepath
+        if readonly:
+            # as_uri percent-encodes "?", "#" and "%" and handles Windows drive paths
+            uri = pathlib.Path(filepath).resolve().as_uri() + "?mode=ro"
+            self.conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            self.conn = sqlite3.connect(filepath, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS frames (idx INTEGER PRIMARY KEY, data BLOB)"
+            )
+        self.metadata = self.read_metadata()
+
+    @classmethod
+    def create(cls, filepath: str, metadata: Dict, span_X: int, span_Y: int, dtype="uint16"):
+        """Create an empty store, replacing any existing file at filepath"""
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        store = cls(filepath, readonly=False)
+        store.write_metadata(
+            dict(metadata, span_T=0, span_X=span_X, span_Y=span_Y, dtype=np.dtype(dtype).str)
+        )
+        return store
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.metadata.get("span_T", 0)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            return self.read_frames(start, stop)[::step]
+        if key < 0:
+            key += len(self)
+        return self.read_frames(key, key + 1)[0]
+
+    @property
+    def shape(self):
+        return (len(self), self.metadata["span_X"], self.metadata["span_Y"])
+
+    @property
+    def dtype(self):
+        return np.dtype(self.metadata.get("dtype", "uint16"))
+
+    def close(self):
+        self.conn.close()
+
+    def read_metadata(self) -> Dict:
+        rows = self.conn.execute("SELECT key, value FROM metadata").fetchall()
+        return {k: json.loads(v) for k, v in rows}
+
+    def write_metadata(self, metadata: Dict):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)",
+            [(k, json.dumps(v)) for k, v in metadata.items()],
+        )
+        self.conn.commit()
+        self.metadata.update(metadata)
+
+    def read_frames(self, start: int = 0, end: int = None) -> np.ndarray:
+        """Fetch frames [start, end) into a single preallocated array.
+
+        Args:
+            start (int): first frame to read
+            end (int, optional): frame to stop at (exclusive). Defaults to the last frame.
+
+        Returns:
+            frames: array of size (end - start, H, W)
+        """
+        end = len(self) if end is None else min(end, len(self))
+        start = max(0, min(start, end))
+        span_X, span_Y = self.metadata["span_X"], self.metadata["span_Y"]
+
+        # frames missing from the table read as zeros
+        frames = np.zeros((end - start, span_X, span_Y), dtype=self.dtype)
+        rows = self.conn.execute(
+            "SELECT idx, data FROM frames WHERE idx >= ? AND idx < ? ORDER BY idx",
+            (start, end),
+        )
+        for idx, data in rows:
+            frames[idx - start] = np.frombuffer(data, dtype=self.dtype).reshape(span_X, span_Y)
+        return frames
+
+    def write_frames(self, start: int, frames: np.ndarray):
+        """Insert or overwrite frames starting at index `start`"""
+        frames = np.asarray(frames, dtype=self.dtype)
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO frames (idx, data) VALUES (?, ?)",
+            ((start + i, frame.tobytes()) for i, frame in enumerate(frames)),
+        )
+        self.conn.commit()
+        if start + len(frames) > len(self):
+            self.write_metadata({"span_T": start + len(frames)})
+
+
+class SQLFrames:
+    """Read-only (frame, H, W) array over a SQLFrameStore that fetches frames as they
+    are indexed, a block of SQL_CHUNK_FRAMES at a time, so a .sql recording can be
+    handed to CardiacSignal without reading it into memory, as raw files are memory
+    mapped. Slicing frames (e.g. one channel of a dual recording) or transposing the
+    frame axes gives another view of the same store.
+    """
+
+    def __init__(self, store: SQLFrameStore, frames: range = None, axes=(0, 1, 2), blocks=None):
+        self.store = store
+        self.frames = range(len(store)) if frames is None else frames
+        self.axes = tuple(axes)
+        self.dtype = store.dtype
+        self.shape = tuple(((len(self.frames),) + store.shape[1:])[a] for a in self.axes)
+        if blocks is None:
+            lock = threading.Lock()
+
+            def read_block(b):
+                # one connection is shared by every thread reading the recording
+                with lock:
+                    return store.read_frames(b * SQL_CHUNK_FRAMES, (b + 1) * SQL_CHUNK_FRAMES)
+
+            blocks = lru_cache(maxsize=SQL_CACHE_BLOCKS)(read_block)
+        self._blocks = blocks
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def ndim(self):
+        return 3
+
+    def __array__(self, dtype=None, copy=None):
+        data = self._read(self.frames).transpose(self.axes)
+        return data if dtype is None else data.astype(dtype)
+
+    def min(self):
+        return min(block.min() for block in self._frame_blocks())
+
+    def max(self):
+        return max(block.max() for block in self._frame_blocks())
+
+    def _frame_blocks(self):
+        for i in range(0, len(self), SQL_CHUNK_FRAMES):
+            yield self._read(self.frames[i : i + SQL_CHUNK_FRAMES])
+
+    def _read(self, frames: range) -> np.ndarray:
+        # frames of the store, in its (frame, H, W) layout
+        index = np.asarray(frames, dtype=np.intp)
+        out = np.empty((len(index),) + self.store.shape[1:], dtype=self.dtype)
+        blocks = index // SQL_CHUNK_FRAMES
+        for b in np.unique(blocks):
+            picked = blocks == b
+            out[picked] = self._blocks(int(b))[index[picked] - b * SQL_CHUNK_FRAMES]
+        return out
+
+    def transpose(self, *axes):
+        if len(axes) == 1:
+            axes = tuple(axes[0])
+        if axes[0] != 0:
+            return np.asarray(self).transpose(axes)
+        return SQLFrames(self.store, self.frames, [self.axes[a] for a in axes], self._blocks)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        first, rest = (key[0], key[1:]) if key else (slice(None), ())
+        if not isinstance(first, (slice, int, np.integer)):
+            return np.asarray(self)[key]
+
+        frames = self.frames[first]
+        if isinstance(frames, int):
+            return self._read(range(frames, frames + 1)).transpose(self.axes)[0][rest]
+        if all(isinstance(k, slice) and k == slice(None) for k in rest):
+            return SQLFrames(self.store, frames, self.axes, self._blocks)
+        return self._read(frames).transpose(self.axes)[(slice(None),) + rest]
+
+
+def write_sql_data(filepath: str, frames, metadata: Dict, chunk_frames: int = 256):
+    """Write a recording to a SQLite frame store, a chunk at a time.
 
-def read_sql_data(filepath: str, largeFilePopup) -> np.ndarray:
-    """Load raw data from SQLite .sql files. Returns a 3D signal array.
+    Args:
+        filepath (str): Output file path
+        frames (array): data of size (frame, H, W), e.g. a memmap from map_cascade_frames
+        metadata (dict): file metadata to keep with the frames
+        chunk_frames (int): number of frames inserted per transaction
+    """
+    metadata = {
+        k: v for k, v in metadata.items() if k not in ("span_T", "span_X", "span_Y")
+    }
+    with SQLFrameStore.create(
+        filepath, metadata, frames.shape[1], frames.shape[2], frames.dtype
+    ) as store:
+        for i in range(0, len(frames), chunk_frames):
+            store.write_frames(i, frames[i : i + chunk_frames])
+
+
+def read_sql_data(filepath: str, largeFilePopup, update_progress=None):
+    """Open raw data from SQLite .sql files. Returns a 3D signal array that reads
+    frames from the file as they are indexed.
     Args:
         filepath (str): Input file path
         largeFilePopup (func): callback function to open popup window for larger-than-memory files
+        update_progress (func, optional): progress callback, normalized to 1
 
     Returns:
         metadata: dict of metadata
-        imarray: numpy array of size (frame, H, W)
+        imarray: SQLFrames of size (frame, H, W)
     """
-    file = open(filepath, "rb")
     filename = os.path.basename(filepath)
 
-    metadata = {"filename": filename}
-    sigarray = None # data array
+    # kept open for the returned frames to read from
+    store = SQLFrameStore(filepath)
+    metadata = dict(store.metadata)
+    metadata["filename"] = filename
+    sigarray = None  # data array
 
-    span_T = None # number of frames, read from header
-    span_X = 128
-    span_Y = 128
+    span_T, span_X, span_Y = store.shape
 
     # trimFrames is a tuple
     # trimFrames[0] contains the number of frames to skip at the beginning of the file
     # trimFrames[1] contains the number of frames to read
-    trimFrames = large_file_check(filepath, largeFilePopup, span_T)
+    trimFrames = large_file_check(
+        filepath, largeFilePopup, span_T, span_X, span_Y,
+        itemsize=store.dtype.itemsize, mappable=True,
+    )
 
-    if trimFrames[1] == 0:
-        # read the entire file
-        pass
-    else:
-        # skip, then read
-        pass
+    if trimFrames is not None:
+        start, end = 0, span_T
+        if trimFrames[1] != 0:
+            # only the requested frame range is read from
+            start, end = trimFrames[0], min(trimFrames[0] + trimFrames[1], span_T)
 
+        sigarray = SQLFrames(store)[start:end]
+        span_T = len(sigarray)
+    else:
+        store.close()
 
+    if update_progress:
+        update_progress(1)
 
     metadata["span_T"] = span_T
     metadata["span_X"] = span_X
     metadata["span_Y"] = span_Y
 
-    file.close()
     return metadata, sigarray
 
 
-def load_sql_file(filepath, largeFilePopup, dual_mode=False) -> Dict[int, CardiacSignal]:
+def iter_sql_chunks(filepath: str, chunk_frames: int, start: int = 0, end: int = None):
+    """Yield consecutive blocks of frames from a SQLite frame store, one range query
+    per block over a single connection.
+
+    Args:
+        filepath (str): Input file path
+        chunk_frames (int): number of frames per block
+        start (int): first frame to read
+        end (int, optional): frame to stop at (exclusive). Defaults to the last frame.
+
+    Yields:
+        chunk: array of size (chunk_frames, H, W); the last block may be shorter
+    """
+    with SQLFrameStore(filepath) as store:
+        end = len(store) if end is None else min(end, len(store))
+        for i in range(start, end, chunk_frames):
+            yield store.read_frames(i, min(i + chunk_frames, end))
+
+
+def load_sql_file(filepath, largeFilePopup, dual_mode=False, update_progress=None) -> Dict[int, CardiacSignal]:
     """Wrapper to load a .sql file to return a single or dual channel signal.
 
     Args:
         filepath (str): Path ot file
         largeFilePopup (): _description_
         dual_mode (bool, optional): Whether the input signal is dual mode (Voltage / Calcium). Defaults to False.
+        update_progress (func, optional): progress callback, normalized to 1
 
     Returns:
         signals: Dictionary of CascadeSignal
     """
     signals = {}
 
-    file_metadata, sigarray = read_sql_data(filepath, largeFilePopup)
+    file_metadata, sigarray = read_sql_data(filepath, largeFilePopup, update_progress=update_progress)
     if sigarray is not None:
 
         if dual_mode:
@@ -79,4 +327,4 @@ def load_sql_file(filepath, largeFilePopup, dual_mode=False) -> Dict[int, Cardia
                 signal=sigarray, metadata=file_metadata, channel="Single"
             )
 
-    return signals
\ No newline at end of file
+    return signals
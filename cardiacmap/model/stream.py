@@ -0,0 +1,117 @@
+import os
+import queue
+import threading
+
+import numpy as np
+
+from cardiacmap.model.cascade import iter_cascade_chunks
+from cardiacmap.model.mkv import iter_mkv_chunks
+from cardiacmap.model.npy import iter_numpy_chunks
+from cardiacmap.model.raw import iter_raw_chunks
+from cardiacmap.model.scimedia import iter_scimedia_chunks
+from cardiacmap.model.sql import iter_sql_chunks
+from cardiacmap.model.tiff import iter_tiff_chunks
+
+DEFAULT_CHUNK_FRAMES = 256
+
+CHUNK_READERS = {
+    ".dat": iter_cascade_chunks,
+    ".gsd": iter_scimedia_chunks,
+    ".mkv": iter_mkv_chunks,
+    ".sql": iter_sql_chunks,
+    ".tif": iter_tiff_chunks,
+    ".tiff": iter_tiff_chunks,
+    ".raw": iter_raw_chunks,
+    ".bin": iter_raw_chunks,
+    ".npy": iter_numpy_chunks,
+    ".npz": iter_numpy_chunks,
+}
+
+
+def iter_frames(
+    filepath: str,
+    chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+    start: int = 0,
+    end: int = None,
+    read_ahead: bool = True,
+):
+    """Stream a recording from disk as fixed-size float32 blocks, so passes over a full
+    length recording only ever hold a couple of blocks in memory. Blocks are laid out
+    (t, y, x), matching CardiacSignal.transformed_data.
+
+    Args:
+        filepath (str): Input file path, any of CHUNK_READERS
+        chunk_frames (int): number of frames per block
+        start (int): first frame to read
+        end (int, optional): frame to stop at (exclusive). Defaults to the end of the file.
+        read_ahead (bool): read and convert the next block on a background thread while
+            the current one is being processed
+
+    Yields:
+        chunk: float32 array of size (chunk_frames, H, W); the last block may be shorter
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext not in CHUNK_READERS:
+        raise ValueError(f"Streaming is not supported for {ext} files")
+    if chunk_frames < 1:
+        raise ValueError("chunk_frames must be positive")
+
+    chunks = (
+        _to_float_frames(chunk)
+        for chunk in CHUNK_READERS[ext](filepath, chunk_frames, start, end)
+    )
+
+    if read_ahead:
+        yield from _read_ahead(chunks)
+    else:
+        yield from chunks
+
+
+def _to_float_frames(chunk):
+    # This is transposed to account go y-x instead of x-y
+    return np.ascontiguousarray(chunk.transpose(0, 2, 1), dtype=np.float32)
+
+
+def _read_ahead(chunks):
+    """Double buffer a chunk generator: a worker thread produces the next chunk while
+    the caller holds the current one. Exceptions raised by the worker are re-raised in
+    the caller, and closing the generator early stops the worker."""
+    buffer = queue.Queue(maxsize=1)
+    stop = threading.Event()
+    done = object()
+
+    def worker():
+        try:
+            for chunk in chunks:
+                while not stop.is_set():
+                    try:
+                        buffer.put(chunk, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            buffer.put(done)
+        except BaseException as e:
+            buffer.put(e)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # unblock the worker if it is waiting to hand over a chunk
+        while thread.is_alive():
+            try:
+                buffer.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        thread.join()
@@ -0,0 +1,322 @@
+import os
+import re
+import struct
+from typing import Dict, Tuple
+
+import numpy as np
+
+from cardiacmap.model.data import CardiacSignal
+from cardiacmap.model.planner import large_file_check
+
+# Baseline TIFF tags used to locate the pixel data of each page
+IMAGE_WIDTH = 256
+IMAGE_LENGTH = 257
+BITS_PER_SAMPLE = 258
+COMPRESSION = 259
+IMAGE_DESCRIPTION = 270
+STRIP_OFFSETS = 273
+SAMPLES_PER_PIXEL = 277
+STRIP_BYTE_COUNTS = 279
+SAMPLE_FORMAT = 339
+
+# tag type -> struct format
+TAG_TYPES = {1: "B", 2: "s", 3: "H", 4: "I", 7: "B", 8: "h", 9: "i", 11: "f", 12: "d", 16: "Q", 17: "q", 18: "Q"}
+
+SAMPLE_KINDS = {1: "u", 2: "i", 3: "f"}
+
+
+def _read_ifd(file, endian: str, bigtiff: bool, offset: int, tags=None) -> Tuple[Dict, int]:
+    """Read one image file directory. Returns {tag: values} for the requested tags (all
+    tags if None) and the offset of the next directory (0 for the last one)."""
+    count_fmt, entry_size, value_size, next_fmt = (
+        ("Q", 20, 8, "Q") if bigtiff else ("H", 12, 4, "I")
+    )
+    file.seek(offset)
+    (n_entries,) = struct.unpack(endian + count_fmt, file.read(struct.calcsize(count_fmt)))
+    entries = file.read(n_entries * entry_size)
+    (next_offset,) = struct.unpack(endian + next_fmt, file.read(struct.calcsize(next_fmt)))
+
+    values = {}
+    for i in range(n_entries):
+        entry = entries[i * entry_size : (i + 1) * entry_size]
+        tag, tag_type = struct.unpack(endian + "HH", entry[:4])
+        if (tags is not None and tag not in tags) or tag_type not in TAG_TYPES:
+            continue
+        (count,) = struct.unpack(endian + ("Q" if bigtiff else "I"), entry[4 : 4 + value_size])
+        fmt = TAG_TYPES[tag_type]
+        nbytes = count * struct.calcsize(fmt if fmt != "s" else "B")
+
+        data = entry[4 + value_size :]
+        if nbytes > value_size:
+            (value_offset,) = struct.unpack(endian + ("Q" if bigtiff else "I"), data)
+            position = file.tell()
+            file.seek(value_offset)
+            data = file.read(nbytes)
+            file.seek(position)
+
+        if fmt == "s":
+            values[tag] = data[:nbytes].split(b"\x00")[0].decode(errors="replace")
+        else:
+            values[tag] = struct.unpack(f"{endian}{count}{fmt}", data[:nbytes])
+
+    return values, next_offset
+
+
+def read_tiff_header(file) -> Dict:
+    """Walk the directories of an open multi-page TIFF file and locate each page's
+    pixel data. Only uncompressed, single-sample pages of identical size are supported.
+
+    Args:
+        file (BinaryIO): File opened in binary mode, positioned at the start
+
+    Returns:
+        header: dict with span_T / span_X (rows) / span_Y (columns), dtype, strips
+            (per page (offsets, byte counts)), offsets (per page start of the pixel data,
+            or None if some page is stored non-contiguously), metadata
+    """
+    byte_order = file.read(2)
+    if byte_order == b"II":
+        endian = "<"
+    elif byte_order == b"MM":
+        endian = ">"
+    else:
+        raise ValueError("Not a TIFF file")
+
+    (version,) = struct.unpack(endian + "H", file.read(2))
+    if version == 42:
+        bigtiff = False
+        (ifd_offset,) = struct.unpack(endian + "I", file.read(4))
+    elif version == 43:
+        bigtiff = True
+        file.read(4)
+        (ifd_offset,) = struct.unpack(endian + "Q", file.read(8))
+    else:
+        raise ValueError(f"Unknown TIFF version: {version}")
+
+    first, ifd_offset = _read_ifd(file, endian, bigtiff, ifd_offset)
+
+    if first.get(COMPRESSION, (1,))[0] != 1:
+        raise ValueError("Compressed TIFF stacks are not supported")
+    if first.get(SAMPLES_PER_PIXEL, (1,))[0] != 1:
+        raise ValueError("Only single channel (grayscale) TIFF stacks are supported")
+
+    span_X = first[IMAGE_LENGTH][0]
+    span_Y = first[IMAGE_WIDTH][0]
+    bits = first.get(BITS_PER_SAMPLE, (8,))[0]
+    sample_format = first.get(SAMPLE_FORMAT, (1,))[0]
+    if sample_format not in SAMPLE_KINDS:
+        raise ValueError(f"Unsupported TIFF SampleFormat: {sample_format}")
+    kind = SAMPLE_KINDS[sample_format]
+    dtype = np.dtype(f"{endian}{kind}{bits // 8}")
+    page_bytes = span_X * span_Y * dtype.itemsize
+
+    strips = [(first[STRIP_OFFSETS], first[STRIP_BYTE_COUNTS])]
+    page_tags = {IMAGE_WIDTH, IMAGE_LENGTH, STRIP_OFFSETS, STRIP_BYTE_COUNTS}
+    while ifd_offset:
+        page, ifd_offset = _read_ifd(file, endian, bigtiff, ifd_offset, page_tags)
+        if page[IMAGE_LENGTH][0] != span_X or page[IMAGE_WIDTH][0] != span_Y:
+            raise ValueError("TIFF stack pages differ in size")
+        strips.append((page[STRIP_OFFSETS], page[STRIP_BYTE_COUNTS]))
+
+    metadata = {}
+    description = first.get(IMAGE_DESCRIPTION, "")
+    if description.startswith("ImageJ"):
+        # ImageJ writes stacks over 4 GB as one directory followed by all pages back to back
+        images = re.search(r"images=(\d+)", description)
+        if images and len(strips) == 1 and len(strips[0][0]) == 1:
+            available = (os.fstat(file.fileno()).st_size - strips[0][0][0]) // page_bytes
+            n_pages = min(int(images.group(1)), available)
+            strips = [((strips[0][0][0] + i * page_bytes,), (page_bytes,)) for i in range(n_pages)]
+        interval = re.search(r"finterval=([0-9.eE+-]+)", description)
+        if interval and float(interval.group(1)) > 0:
+            metadata["framerate"] = 1 / float(interval.group(1))
+
+    # Pages can be memory-mapped if each page's strips are back to back
+    offsets = []
+    for strip_offsets, strip_counts in strips:
+        contiguous = sum(strip_counts) == page_bytes and all(
+            strip_offsets[i] + strip_counts[i] == strip_offsets[i + 1]
+            for i in range(len(strip_offsets) - 1)
+        )
+        if not contiguous:
+            offsets = None
+            break
+        offsets.append(strip_offsets[0])
+
+    return dict(
+        span_T=len(strips),
+        span_X=span_X,
+        span_Y=span_Y,
+        dtype=dtype,
+        strips=strips,
+        offsets=None if offsets is None else np.array(offsets, dtype=np.int64),
+        metadata=metadata,
+    )
+
+
+def map_tiff_frames(filepath: str, header: Dict):
+    """Memory-map the pages of a TIFF stack when they are evenly spaced in the file,
+    which is how stacks are usually written (each page followed by the next directory).
+    The gap between pages is stepped over via the frame stride.
+
+    Args:
+        filepath (str): Input file path
+        header (dict): Parsed header from read_tiff_header
+
+    Returns:
+        frames: read-only memmap view of size (frame, H, W), or None if the pages
+            can't be mapped
+    """
+    offsets, dtype = header["offsets"], header["dtype"]
+    span_T, span_X, span_Y = header["span_T"], header["span_X"], header["span_Y"]
+    page_words = span_X * span_Y
+    if offsets is None:
+        return None
+
+    if span_T > 1:
+        strides = np.diff(offsets)
+        stride = int(strides[0])
+        if np.any(strides != stride) or stride % dtype.itemsize or stride < page_words * dtype.itemsize:
+            return None
+        frame_words = stride // dtype.itemsize
+    else:
+        frame_words = page_words
+
+    # The last page need not be followed by a full stride
+    nbytes = (span_T - 1) * frame_words * dtype.itemsize + page_words * dtype.itemsize
+    if offsets[0] + nbytes > os.path.getsize(filepath):
+        return None
+    frames = np.memmap(filepath, dtype=dtype, mode="r", offset=int(offsets[0]), shape=(nbytes // dtype.itemsize,))
+    frames = np.lib.stride_tricks.as_strided(
+        frames,
+        shape=(span_T, span_X, span_Y),
+        strides=(frame_words * dtype.itemsize, span_Y * dtype.itemsize, dtype.itemsize),
+        writeable=False,
+    )
+    return frames
+
+
+def read_tiff_frames(filepath: str, header: Dict, start: int = 0, end: int = None) -> np.ndarray:
+    """Read pages [start, end) strip by strip into a new array. Used for stacks whose
+    pages can't be memory-mapped.
+
+    Returns:
+        frames: array of size (end - start, H, W)
+    """
+    end = header["span_T"] if end is None else min(end, header["span_T"])
+    start = max(0, min(start, end))
+    dtype = header["dtype"]
+    out = np.empty((end - start, header["span_X"], header["span_Y"]), dtype=dtype)
+
+    with open(filepath, "rb") as file:
+        for i in range(start, end):
+            page = out[i - start].reshape(-1).view(np.uint8)
+            position = 0
+            for offset, count in zip(*header["strips"][i]):
+                file.seek(offset)
+                count = min(count, len(page) - position)
+                page[position : position + count] = np.frombuffer(file.read(count), dtype=np.uint8)
+                position += count
+    return out
+
+
+def read_tiff_data(filepath: str, largeFilePopup):
+    """Load a multi-page TIFF stack. Returns a 3D signal array, memory-mapped when the
+    pages are stored contiguously and read page by page otherwise.
+
+    Args:
+        filepath (str): Input file path
+        largeFilePopup (func): callback function to open popup window for larger-than-memory files
+
+    Returns:
+        metadata: dict of metadata
+        imarray: numpy array of size (frame, H, W)
+    """
+    with open(filepath, "rb") as file:
+        header = read_tiff_header(file)
+
+    metadata = {"filename": os.path.basename(filepath), "framerate": 500}
+    metadata.update(header["metadata"])
+    sigarray = None
+
+    span_T, span_X, span_Y = header["span_T"], header["span_X"], header["span_Y"]
+    frames = map_tiff_frames(filepath, header)
+
+    trimFrames = large_file_check(
+        filepath, largeFilePopup, span_T, span_X, span_Y,
+        itemsize=header["dtype"].itemsize, mappable=frames is not None,
+    )
+    if trimFrames is not None:
+        start, end = 0, span_T
+        if trimFrames[1] != 0:
+            start, end = trimFrames[0], trimFrames[0] + trimFrames[1]
+
+        if frames is not None:
+            sigarray = frames[start:end]
+        else:
+            sigarray = read_tiff_frames(filepath, header, start, end)
+
+        metadata["span_T"] = len(sigarray)
+        metadata["span_X"] = span_X
+        metadata["span_Y"] = span_Y
+
+    return metadata, sigarray
+
+
+def iter_tiff_chunks(filepath: str, chunk_frames: int, start: int = 0, end: int = None):
+    """Yield consecutive blocks of pages from a TIFF stack, through the memory map if
+    the pages can be mapped.
+
+    Args:
+        filepath (str): Input file path
+        chunk_frames (int): number of frames per block
+        start (int): first frame to read
+        end (int, optional): frame to stop at (exclusive). Defaults to the last page.
+
+    Yields:
+        chunk: array of size (chunk_frames, H, W); the last block may be shorter
+    """
+    with open(filepath, "rb") as file:
+        header = read_tiff_header(file)
+    frames = map_tiff_frames(filepath, header)
+
+    end = header["span_T"] if end is None else min(end, header["span_T"])
+    for i in range(start, end, chunk_frames):
+        j = min(i + chunk_frames, end)
+        if frames is not None:
+            yield frames[i:j]
+        else:
+            yield read_tiff_frames(filepath, header, i, j)
+
+
+def load_tiff_file(filepath, largeFilePopup, dual_mode=False) -> Dict[int, CardiacSignal]:
+    """Wrapper to load a multi-page TIFF stack to return a single or dual channel signal.
+
+    Args:
+        filepath (str): Path to file
+        largeFilePopup (func): callback function to open popup window for larger-than-memory files
+        dual_mode (bool, optional): Whether the input signal is dual mode (Voltage / Calcium). Defaults to False.
+
+    Returns:
+        signals: Dictionary of CardiacSignal
+    """
+    signals = {}
+
+    file_metadata, sigarray = read_tiff_data(filepath, largeFilePopup)
+    if sigarray is not None:
+
+        if dual_mode:
+            odd_frames, even_frames = [sigarray[::2, :, :], sigarray[1::2, :, :]]
+            signals[0] = CardiacSignal(
+                signal=odd_frames, metadata=file_metadata, channel="Odd"
+            )
+            signals[1] = CardiacSignal(
+                signal=even_frames, metadata=file_metadata, channel="Even"
+            )
+            file_metadata["span_T"] = file_metadata["span_T"] // 2
+        else:
+            signals[0] = CardiacSignal(
+                signal=sigarray, metadata=file_metadata, channel="Single"
+            )
+
+    return signals
@@ -24,8 +24,10 @@ def GetThresholdIntersections(data, threshold, spacing, intervals=None, mask = N
             
     #executor = cf.ThreadPoolExecutor(4)
     first_slice = True
+    frame_shape = data.shape[1:]
     for data_slice in slices:
-        flat_swapped_arr = np.swapaxes(data_slice.reshape(data_slice.shape[0], -1), 0, 1)
+        # one row per pixel; no copy if data is a time-major view of pixel-major data
+        flat_swapped_arr = np.moveaxis(data_slice, 0, -1).reshape(-1, data_slice.shape[0])
         pixels =  np.arange(flat_swapped_arr.shape[0])
         intersections = []
         tOffsets = []
@@ -37,11 +39,11 @@ def GetThresholdIntersections(data, threshold, spacing, intervals=None, mask = N
             intersections.append(ints)
             apdFlags.append(apd)
         if first_slice:
-            tOffsets = np.array(tOffsets).reshape(128, 128)
+            tOffsets = np.array(tOffsets).reshape(frame_shape)
             first_slice = False
         apdArr, diArr = CalculateIntervals(intersections, apdFlags)
-        apdArr = np.swapaxes(apdArr, 1, 0).reshape(apdArr.shape[1], 128, 128)
-        diArr = np.swapaxes(diArr, 1, 0).reshape(diArr.shape[1], 128, 128)
+        apdArr = np.swapaxes(apdArr, 1, 0).reshape(apdArr.shape[1], *frame_shape)
+        diArr = np.swapaxes(diArr, 1, 0).reshape(diArr.shape[1], *frame_shape)
 
         apdArrs.append(apdArr)
         diArrs.append(diArr)
@@ -51,7 +53,8 @@ def GetThresholdIntersections(data, threshold, spacing, intervals=None, mask = N
 def GetThresholdIntersections1D(data, threshold, spacing = 0):
     #print(spacing)
     # remove points that lie directly on the line
-    threshData = data - threshold
+    # data may be the raw integer recording, so subtract in floating point
+    threshData = np.asarray(data, dtype=np.float32) - threshold
     mask = np.argwhere(threshData == 0)
     threshData[mask] = threshData[mask-1]
 
@@ -1,18 +1,20 @@
 import concurrent.futures as cf
 
 import numpy as np
-import numpy.ma as ma
-from scipy.ndimage import gaussian_filter, uniform_filter
+from scipy.ndimage import gaussian_filter, gaussian_filter1d, uniform_filter, uniform_filter1d
 from scipy.signal import butter, sosfilt
 
+from .transforms import ComputeDtype, _blocks, _output
 
-def TimeAverage(arr, sigma, radius, mask=None, mode="Uniform"):
+
+def TimeAverage(arr, sigma, radius, mask=None, mode="Uniform", out=None):
     """Function to apply a gaussian filter to a data array along Time Axis
     Args:
         arr (array): data, must be 3-dimensional with time on the first axis
         sigma (float): intensity of averaging, higher values -> more blur
         radius (int): radius of averaging
         mask (array): 2d array with same dimensions as arr[0]
+        out (array, optional): output, may be arr itself
 
     Returns:
         array: result of averaging along time axis
@@ -26,29 +28,77 @@ def TimeAverage(arr, sigma, radius, mask=None, mode="Uniform"):
     if np.array(mask).shape != np.array(arr[0]).shape:
         raise ValueError("mask must have same shape as a single frame")
     
-    # flatten x and y, and swap resulting axes to view data pixelwise
-    flat_swapped_arr = np.swapaxes(arr.reshape(arr.shape[0], -1), 0, 1)
-    
-    # select averaging mode
-    if mode == "Gaussian":
-        flat_swapped_data = gaussian_filter(flat_swapped_arr, sigma, radius=radius, axes=1)
-    elif mode == "Uniform":
-        flat_swapped_data = uniform_filter(flat_swapped_arr, size=radius, axes=1)
-        
-    # swap axes of result back, unflatten x and y
-    data = np.reshape(np.swapaxes(flat_swapped_data, 0, 1), (arr.shape))
-    
+    out = _output(arr, out)
+    dtype = ComputeDtype(out.dtype)
+
+    # filter a block of rows at a time, in place in a compute dtype copy of the block
+    for rows in _blocks(arr.shape, 1, dtype.itemsize):
+        block = np.array(arr[rows], dtype=dtype)
+        # select averaging mode
+        if mode == "Gaussian":
+            gaussian_filter(block, sigma, radius=radius, axes=(0,), output=block)
+        elif mode == "Uniform":
+            uniform_filter(block, size=radius, axes=(0,), output=block)
+        out[rows] = block
+
     #e = time.time()
     #print("Time Avg Runtime:", e-s)
-    return data
+    return out
+
+def TimeAverageTrace(trace, sigma, radius, mode="Uniform"):
+    """TimeAverage for a single pixel trace
+    Args:
+        trace (array): data, 1-dimensional
+        sigma (float): intensity of averaging, higher values -> more blur
+        radius (int): radius of averaging
 
-def SpatialAverage(arr, sigma, radius, mask=None, mode="Gaussian"):
+    Returns:
+        array: averaged trace
+    """
+    if sigma < 0:
+        raise ValueError("sigma must be non-negative")
+    if radius < 0:
+        raise ValueError("radius must be non-negative")
+
+    trace = np.asarray(trace, dtype=ComputeDtype(trace.dtype))
+    if mode == "Gaussian":
+        return gaussian_filter1d(trace, sigma, radius=radius)
+    elif mode == "Uniform":
+        return uniform_filter1d(trace, size=radius)
+
+def AverageReach(radius, mode):
+    """Number of neighbouring frames / pixels on each side an averaged value depends on"""
+    return radius if mode == "Gaussian" else radius // 2 + 1
+
+def SpatialAverageAt(arr, sigma, radius, y, x, mask=None, mode="Gaussian"):
+    """SpatialAverage for a single pixel, computed from just the kernel footprint
+    around (y, x) rather than whole frames
+    Args:
+        arr (array): data, must be 3-dimensional with time on the first axis
+        sigma (float): intensity of averaging, higher values -> more blur
+        radius (int): radius of averaging
+        y, x (int): pixel position
+        mask (array): 2d array with same dimensions as arr[0]
+
+    Returns:
+        array: averaged trace of pixel (y, x)
+    """
+    h = AverageReach(radius, mode)
+    y0, x0 = max(0, y - h), max(0, x - h)
+    ys, xs = slice(y0, y + h + 1), slice(x0, x + h + 1)
+    # the footprint is clipped to the frame, so edge pixels see the same boundary
+    footprint = np.asarray(arr[:, ys, xs])
+    averaged = SpatialAverage(footprint, sigma, radius, np.asarray(mask)[ys, xs], mode)
+    return averaged[:, y - y0, x - x0]
+
+def SpatialAverage(arr, sigma, radius, mask=None, mode="Gaussian", out=None):
     """Function to apply a gaussian filter to a data array along Spatial Axes
     Args:
         arr (array): data, must be 3-dimensional with time on the first axis
         sigma (float): intensity of averaging, higher values -> more blur
         radius (int): radius of averaging
         mask (array): 2d array with same dimensions as arr[0]
+        out (array, optional): output, may be arr itself
 
     Returns:
         array: result of averaging along spatial axes
@@ -67,42 +117,63 @@ def SpatialAverage(arr, sigma, radius, mask=None, mode="Gaussian"):
     if np.array(mask).shape != np.array(arr[0]).shape:
         raise IndexError("mask must have same shape as a single frame")
     
+    out = _output(arr, out)
+    dtype = ComputeDtype(out.dtype)
+    mask = np.asarray(mask)
+
     # select averaging mode
+    def average(block, axes):
+        if mode == "Gaussian":
+            return gaussian_filter(block, newSigma, radius=radius, axes=axes, output=block)
+        elif mode == "Uniform":
+            return uniform_filter(block, size=radius, axes=axes, output=block)
 
-    if mode == "Gaussian":
-        maskedData = gaussian_filter(arr * mask, newSigma, radius=radius, axes=(1, 2))
-        maskWeights = gaussian_filter(mask.astype(np.float64), newSigma, radius=radius, axes=(0, 1))
-    elif mode == "Uniform":
-        maskedData = uniform_filter(arr * mask, size=radius, axes=(1, 2))
-        maskWeights = uniform_filter(mask.astype(np.float64), newSigma, size=radius, axes=(0, 1))
+    # normalize data by relative mask weights, and zero pixels outside the mask
+    maskWeights = average(mask.astype(np.float64), (0, 1))
+    scale = np.zeros(mask.shape, dtype=dtype)
+    np.divide(mask, maskWeights, out=scale, where=maskWeights != 0)
 
-    # normalize data by relative mask weights
-    data = maskedData / ma.array(maskWeights, mask = maskWeights==0)
+    # average a block of frames at a time, in place in a compute dtype copy of the block
+    mask = mask.astype(dtype)
+    for frames in _blocks(arr.shape, 0, dtype.itemsize):
+        block = np.multiply(arr[frames], mask, dtype=dtype)
+        average(block, (1, 2))
+        np.multiply(block, scale, out=out[frames])
 
-    return ma.getdata(data) * mask
+    return out
 
-def ButterworthFilter(arr, order, low, high, ms=2, mask = None):
+def ButterworthFilter(arr, order, low, high, ms=2, mask = None, out = None):
     """ Function to perform high-pass, low-pass, or band-pass butterworth filter along the time axis
+    Works along the first axis, so it takes a single pixel trace as well as (t, y, x) data.
     Args:
         Order: order of the filter
         Low: lowest frequency allowed by the band-pass filter. If High = 0, then used for high-pass filter
         High: highest frequency allowed by the band-pass filter. If Low = 0, then used for low-pass filter
+        out (array, optional): output, may be arr itself
     """
     fs = int(1000 / ms)
     if low != 0  and high != 0:
         sos = butter(order, [low, high], btype="bandpass", fs=fs, output="sos")
         print("Bandpass: ", low, "-", high, "Hz")
     elif low != 0:
-        sos, a = butter(order, low, btype="highpass", fs=fs, output="sos")
+        sos = butter(order, low, btype="highpass", fs=fs, output="sos")
         print("Highpass: ", low, "Hz")
     elif high != 0:
         sos = butter(order, high, btype="lowpass", fs=fs, output="sos")
         print("Lowpass: ", high, "Hz")
     else:
         print("Error: Invalid Arguments; either High or Low must be non-zero")
+        if out is not None and out is not arr:
+            out[...] = arr
+            return out
         return arr
 
-    output = sosfilt(sos, arr, axis = 0)
+    out = _output(arr, out)
+    dtype = ComputeDtype(out.dtype)
 
-    arr = output
-    return arr
\ No newline at end of file
+    # filter in the compute dtype (sosfilt follows the dtype of sos), a block of rows
+    # at a time
+    sos = sos.astype(dtype)
+    for rows in _blocks(np.shape(arr), 1, dtype.itemsize):
+        out[rows] = sosfilt(sos, np.asarray(arr[rows], dtype=dtype), axis = 0)
+    return out
\ No newline at end of file
@@ -3,6 +3,8 @@ import concurrent.futures as cf
 import numpy as np
 from scipy.ndimage import minimum_filter
 
+from .transforms import ComputeDtype
+
 # NB: The multithread here might not work well / race condition? 
 # Would be better to use .map and then combine them etc.
 def RemoveBaselineDrift(data, mask, threads, params, peaks=False, update_progress=None):
@@ -19,6 +21,8 @@ def RemoveBaselineDrift(data, mask, threads, params, peaks=False, update_progres
     tLen = len(data[0][0])
     t = np.arange(tLen)
     resData = [0 for j in range(xLen * yLen)]
+    # traces are processed in at least float32 (e.g. float16 working data)
+    dtype = ComputeDtype(data.dtype)
 
     if update_progress:
         total = xLen * yLen
@@ -37,7 +41,7 @@ def RemoveBaselineDrift(data, mask, threads, params, peaks=False, update_progres
             if mask[y, x] != 0:
                 if update_progress:
                     update_progress(index / total)
-                d = data[y][x]
+                d = np.asarray(data[y][x], dtype=dtype)
                 executor.submit(func, t, d, params, resData, index)
             else:
                 resData[index] = data[y][x]
@@ -47,6 +51,19 @@ def RemoveBaselineDrift(data, mask, threads, params, peaks=False, update_progres
     # reshape results array, then convert to int from float
     return np.array(resData).reshape(yLen, xLen, tLen)
 
+def RemoveBaselineTrace(data, params, peaks=False):
+    """RemoveBaselineDrift for a single pixel trace
+    Args:
+        data (array): trace to process
+        params (dict): find_peaks params
+        peaks (bool): find peaks (and normalize) or valleys (and subtract)
+    """
+    output = [None]
+    data = np.asarray(data, dtype=ComputeDtype(data.dtype))
+    func = NormalizeAmplitude1D if peaks else RemoveBaseline1D
+    func(np.arange(len(data)), data, params, output, 0)
+    return output[0]
+
 def NormalizeAmplitude1D(t, data, params, output, outIdx):
     peaks = FindPeaks(t, -data, params)
     if len(peaks) == 0:
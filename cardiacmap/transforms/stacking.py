@@ -9,11 +9,12 @@ def Stacking(data, derivative, numPeriods, distance, offset, alternans, mask=Non
     derivative = np.moveaxis(derivative, 0, -1)
     data = np.moveaxis(data, 0, -1)
 
-    results = [[] for j in range(len(data[0]) * len(data))]
+    yLen, xLen = len(data), len(data[0])
+    results = [[] for j in range(xLen * yLen)]
     longestRes = 0
     # stack each pixel
-    for y in range(len(data)):
-        for x in range(len(data[0])):
+    for y in range(yLen):
+        for x in range(xLen):
             if mask[y][x] == 0:
                 result = np.ones(2)
             else:
@@ -25,11 +26,12 @@ def Stacking(data, derivative, numPeriods, distance, offset, alternans, mask=Non
             if len(result) > longestRes:
                 longestRes = len(result)
             # display progress
-            progress = (y * 128 + x) / (128 * 128)
-            if (y * 128 + x) % 1000 == 0:
+            index = y * xLen + x
+            progress = index / (xLen * yLen)
+            if index % 1000 == 0:
                 if update_progress: update_progress(progress)
                 print("Stacking:", int(progress * 100), "%")
-            results[y * len(data) + x] = result
+            results[index] = result
 
     return results, longestRes
 
@@ -1,17 +1,44 @@
 import numpy as np
-import numpy.ma as ma
 
+# Transforms work through their data a block of about this many bytes at a time, so
+# their temporaries stay small next to the data itself
+CHUNK_BYTES = 16 * 2**20
 
-def InvertSignal(arr):
+
+def ComputeDtype(dtype):
+    """dtype transforms compute in for data stored as `dtype`: at least float32, so
+    float16 data is computed in float32 and float64 data in float64"""
+    return np.promote_types(dtype, np.float32)
+
+
+def _output(arr, out):
+    # preallocated output, or a new one in the compute dtype of arr
+    if out is None:
+        out = np.empty(np.shape(arr), dtype=ComputeDtype(arr.dtype))
+    return out
+
+
+def _blocks(shape, axis, itemsize):
+    # index tuples splitting an array of `shape` along `axis` into blocks of about
+    # CHUNK_BYTES, at `itemsize` bytes per element
+    if len(shape) <= axis:
+        yield (Ellipsis,)
+        return
+    step = max(1, CHUNK_BYTES // max(1, itemsize * int(np.prod(shape)) // max(1, shape[axis])))
+    for i in range(0, shape[axis], step):
+        yield (slice(None),) * axis + (slice(i, i + step),)
+
+
+def InvertSignal(arr, out=None):
     """Function to invert array values
     Args:
         arr (array): data
+        out (array, optional): output, may be arr itself
     Returns:
         newArr: Inverted signal where max becomes min etc.
     """
-
-    newArr = np.multiply(arr, -1) + np.max(arr)
-    return newArr
+    out = _output(arr, out)
+    return np.subtract(np.max(arr), arr, out=out, dtype=ComputeDtype(out.dtype))
 
 
 def TrimSignal(arr, trimStart, trimEnd):
@@ -31,27 +58,57 @@ def TrimSignal(arr, trimStart, trimEnd):
     newArr = np.delete(arr, trimIndices, axis=0)
     return newArr
 
-def NormalizeData(data: np.ndarray):
-    d = (data - data.min(axis=0))
-    dMa = ma.array(d, mask=d==0)
-    normalMa = dMa / dMa.max(axis=0)
-    return ma.getdata(normalMa)
+def _normalize(data, lo, span, out):
+    # (data - lo) / span a block of frames at a time; flat data (span 0) is left at 0
+    dtype = ComputeDtype(out.dtype)
+    span = np.where(span > 0, span, np.inf).astype(dtype)
+    for frames in _blocks(np.shape(data), 0, dtype.itemsize):
+        block = np.subtract(data[frames], lo, dtype=dtype)
+        np.divide(block, span, out=out[frames])
+    return out
+
+def NormalizeData(data: np.ndarray, out=None):
+    """Scale each pixel (along the first axis) to [0, 1]
+    Args:
+        data (array): data, time on the first axis
+        out (array, optional): output, may be data itself
+    """
+    data = np.asarray(data)
+    out = _output(data, out)
+    lo = data.min(axis=0).astype(ComputeDtype(out.dtype))
+    return _normalize(data, lo, data.max(axis=0) - lo, out)
 
-def NormalizeDataGlobal(data: np.ndarray):
-    d = (data - data.min())
-    return d / d.max()
+def NormalizeDataGlobal(data: np.ndarray, out=None):
+    """Scale all of data to [0, 1]
+    Args:
+        data (array): data
+        out (array, optional): output, may be data itself
+    """
+    data = np.asarray(data)
+    out = _output(data, out)
+    lo = ComputeDtype(out.dtype).type(data.min())
+    return _normalize(data, lo, data.max() - lo, out)
 
-def FFT(signal):
+def FFT(signal, out=None):
     """
     perform a fast fourier transform on a video signal
     @:arg:
     signal: np array with image data
+    out: optional output, of size (len(signal) // 2, ...)
     :return: 2D np array containing the dominant frequency value for each pixel
     """
-    fft = np.fft.fft(signal, axis=0)
-    fft_frames = fft.real ** 2 + fft.imag ** 2
-    fft_frames = np.abs(fft_frames)
-    fft_frames[0, ...] = 0  # Remove zero frequency component
-    fft_frames = fft_frames[0:int(len(fft_frames)/2), ...] # cut in half
-    
-    return NormalizeData(fft_frames)
+    half = len(signal) // 2 # cut in half
+    if out is None:
+        out = np.empty((half,) + np.shape(signal)[1:], dtype=ComputeDtype(signal.dtype))
+    dtype = ComputeDtype(out.dtype)
+
+    # transformed a block of pixels at a time; the spectrum is real input's, so rfft
+    # gives the same first half
+    for pixels in _blocks(np.shape(signal), 1, 4 * dtype.itemsize):
+        fft = np.fft.rfft(np.asarray(signal[pixels], dtype=dtype), axis=0)[:half]
+        fft_frames = np.square(fft.real)
+        fft_frames += np.square(fft.imag)
+        fft_frames[0, ...] = 0  # Remove zero frequency component
+        out[pixels] = fft_frames
+
+    return NormalizeData(out, out=out)
@@ -1,5 +1,4 @@
 from typing import List, Optional
-import psutil
 import os
 import pyqtgraph as pg
 from pyqtgraph.parametertree import Parameter, ParameterTree
@@ -7,6 +6,7 @@ from PySide6.QtCore import Qt
 from PySide6.QtGui import QAction
 from PySide6.QtWidgets import (
     QApplication,
+    QComboBox,
     QDialog,
     QDockWidget,
     QGroupBox,
@@ -27,9 +27,11 @@ from PySide6.QtWidgets import (
     QWidget,
     QWidgetAction,
     QDialogButtonBox,
-    QMessageBox
+    QMessageBox,
+    QProgressBar,
 )
 
+
 SPINBOX_STYLE = """SpinBox
             {
                 border: 1px solid;
@@ -101,7 +103,7 @@ PARAMETER_BUTTON_STYLE = """
 class ParameterButton(QToolButton):
 
     def __init__(
-        self, label, params: Parameter, actions: Optional[List[QAction]] = None
+        self, label, params: Parameter, actions: Optional[List[QAction]] = None, preview = None
     ):
 
         super().__init__()
@@ -111,6 +113,13 @@ class ParameterButton(QToolButton):
         tree_widget = ParameterTree()
         tree_widget.setParameters(params, showTop=False)
 
+        # connect a callback for previewing the parameters while the menu is open
+        if preview is not None:
+            for param in params:
+                param.sigValueChanged.connect(lambda: preview(show = menu.isVisible()))
+            menu.aboutToShow.connect(lambda: preview(show = True))
+            menu.aboutToHide.connect(lambda: preview(show = False))
+
         widgetaction = QWidgetAction(self)
         widgetaction.setDefaultWidget(tree_widget)
 
@@ -270,37 +279,116 @@ class FrameInputDialog(QDialog):
     def getValues(self):
         return self.start, self.end
 
-def large_file_check(filepath, _callback, fileLen):
-    """Helper method to check a Cascade file against available RAM to avoid OOM error
-    Args:
-        filepath(str): Input file path
-    Returns:
-        tuple: (skip_frames, read_frames) or (0, 0) if file is small enough to handle
-    """
-    USAGE_THRESHOLD = 0.5
-    freeMem = psutil.virtual_memory()[1]
-    estDataSize = (
-        os.path.getsize(filepath) * 6
-    )  # estimate conversion to float16 and 3 data sets (raw, transformed, previous)
-    # THIS IS A VERY ROUGH ESTIMATE PROBABLY NEEDS FURTHER INVESTIGATION
-
-    (skip, size) = (0, 0)
-
-    usePercentage = estDataSize / freeMem
-
-    # use 50% threshold to leave room for apd, di, fft, etc.
-    if usePercentage > USAGE_THRESHOLD:
-        maxFrames = int(
-            (freeMem * 0.5) / 1040000
-        )  # AGAIN, VERY ROUGH ESTIMATE BASED ON 5k FRAMES @ 650MB
-        start, end = _callback(fileLen, maxFrames)  # pauses execution until popup is closed
-
-        print(start, end)
-
-        if start is not None and end is not None:
-            skip = start
-            size = end - start
-        else:
-            return None
-
-    return (skip, size)
\ No newline at end of file
+RAW_DTYPES = {
+    "uint16 (little endian)": "<u2",
+    "uint16 (big endian)": ">u2",
+    "int16 (little endian)": "<i2",
+    "uint8": "u1",
+    "float32 (little endian)": "<f4",
+}
+
+
+def RawLayoutPopUp(filename):
+    """Ask for the layout of a headerless raw file. Returns a raw sidecar dict, or None
+    if the dialog was cancelled."""
+    dialog = RawLayoutDialog(filename)
+    if dialog.exec() == QDialog.Accepted:
+        return dialog.getValues()
+    else:
+        return None
+
+
+class RawLayoutDialog(QDialog):
+    def __init__(self, filename, parent=None):
+        super(RawLayoutDialog, self).__init__(parent)
+
+        self.setWindowTitle("Raw File Layout")
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"Describe the layout of {filename}.\nIt is saved next to the file for next time."))
+
+        self.rowsInput = Spinbox(1, 65536, 128, min_width=100, max_width=100)
+        self.colsInput = Spinbox(1, 65536, 128, min_width=100, max_width=100)
+        self.offsetInput = Spinbox(0, 2**31, 0, min_width=100, max_width=100)
+        self.skipInput = Spinbox(0, 2**20, 0, min_width=100, max_width=100)
+        self.framerateInput = Spinbox(1, 100000, 500, min_width=100, max_width=100)
+        self.dtypeInput = QComboBox()
+        self.dtypeInput.addItems(list(RAW_DTYPES))
+
+        for label, widget in [
+            ("Rows per frame:", self.rowsInput),
+            ("Columns per frame:", self.colsInput),
+            ("Sample type:", self.dtypeInput),
+            ("Header bytes:", self.offsetInput),
+            ("Bytes after each frame:", self.skipInput),
+            ("Frame rate:", self.framerateInput),
+        ]:
+            layout.addWidget(QLabel(label))
+            layout.addWidget(widget)
+
+        self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, self)
+        self.buttons.accepted.connect(self.accept)
+        self.buttons.rejected.connect(self.reject)
+        layout.addWidget(self.buttons)
+
+    def getValues(self):
+        return dict(
+            span_X=int(self.rowsInput.value()),
+            span_Y=int(self.colsInput.value()),
+            dtype=RAW_DTYPES[self.dtypeInput.currentText()],
+            offset=int(self.offsetInput.value()),
+            skip_bytes=int(self.skipInput.value()),
+            framerate=float(self.framerateInput.value()),
+        )
+
+
+class LoadingPanel(QWidget):
+    """Placeholder shown in a viewer while its file loads in the background. Shows the
+    header metadata and a scrubbable preview of the first frames as soon as they are
+    read, with load progress and a cancel button."""
+
+    def __init__(self, filename, on_cancel, parent=None):
+        super().__init__(parent)
+
+        layout = QVBoxLayout()
+
+        self.title = QLabel(f"Loading {filename}...")
+        self.title.setStyleSheet("QLabel {font-size:20px; }")
+        self.info = QLabel("")
+
+        self.preview = pg.ImageView()
+        self.preview.ui.roiBtn.hide()
+        self.preview.ui.menuBtn.hide()
+        self.preview.setVisible(False)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(on_cancel)
+
+        progress_layout = QHBoxLayout()
+        progress_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.cancel_button)
+
+        layout.addWidget(self.title)
+        layout.addWidget(self.info)
+        layout.addWidget(self.preview, stretch=1)
+        layout.addLayout(progress_layout)
+        self.setLayout(layout)
+
+    def set_preview(self, metadata, frames):
+        info = [f"{k}: {metadata[k]}" for k in ("span_T", "span_X", "span_Y", "framerate", "datetime") if metadata.get(k)]
+        if metadata.get("dual"):
+            info.append("looks like a dual channel recording")
+        self.info.setText("    ".join(info))
+        if frames is not None and len(frames):
+            self.preview.setImage(frames, autoLevels=True)
+            self.preview.setVisible(True)
+
+    def set_progress(self, value):
+        self.progress_bar.setValue(int(value * 100))
+
+    def set_cancelling(self):
+        self.title.setText(self.title.text().replace("Loading", "Canceling"))
+        self.cancel_button.setDisabled(True)
@@ -23,7 +23,6 @@ QTOOLBAR_STYLE = """
             """
 
 VIEWPORT_MARGIN = 2
-IMAGE_SIZE = 128
 
 class ImportExportDirectories(object):
     def __new__(cls):
@@ -55,6 +54,7 @@ class ExportAPDsWindow(QMainWindow):
         self.setWindowTitle("Export APD Data")
 
         self.parent = parent
+        self.frame_shape = apdData.shape[:2]
         self.apds = apdData.reshape((-1, apdData.shape[2]))
         self.dis = diData.reshape((-1, diData.shape[2]))
         self.tOffsets = tOffsets.reshape((-1))
@@ -107,7 +107,7 @@ class ExportAPDsWindow(QMainWindow):
         if output is None:
             return
 
-        output = output.reshape((128,128, output.shape[1]))
+        output = output.reshape((*self.frame_shape, output.shape[1]))
 
         dirs = ImportExportDirectories() # get export directory
         file_path, _ = QFileDialog.getSaveFileName(
@@ -127,12 +127,12 @@ class ExportAPDsWindow(QMainWindow):
                 
     def getSelectedData(self):
         if self.APD_box.isChecked():
-            output = np.zeros((16384, self.apds.shape[1] + self.dis.shape[1] + 1))
+            output = np.zeros((len(self.apds), self.apds.shape[1] + self.dis.shape[1] + 1))
             output[:, 1::2] = self.dis
             output[:, 2::2] = self.apds
             output[:, 0] = self.tOffsets
             if self.Mean_box.isChecked():
-                output2 = np.zeros((16384, 5))
+                output2 = np.zeros((len(self.apds), 5))
                 output2[:, 0] = np.mean(self.dis, axis=1)
                 output2[:, 1] = np.mean(self.apds, axis=1)
                 output2[:, 2] = np.std(self.dis, axis=1)
@@ -141,7 +141,7 @@ class ExportAPDsWindow(QMainWindow):
                 output = np.hstack((output2, output))
 
         elif self.Mean_box.isChecked():
-            output = np.zeros((16384, 5))
+            output = np.zeros((len(self.apds), 5))
             output[:, 0] = np.mean(self.dis, axis=1)
             output[:, 1] = np.mean(self.apds, axis=1)
             output[:, 2] = np.std(self.dis, axis=1)
@@ -179,9 +179,10 @@ class ExportVideoWindow(QMainWindow):
         self.image_view.view.enableAutoRange(enable=True)
         self.image_view.view.setMouseEnabled(False, False)
 
+        height, width = self.mask.shape
         self.image_view.view.setRange(
-            xRange=(-VIEWPORT_MARGIN, IMAGE_SIZE + VIEWPORT_MARGIN),
-            yRange=(-VIEWPORT_MARGIN, IMAGE_SIZE + VIEWPORT_MARGIN),
+            xRange=(-VIEWPORT_MARGIN, height + VIEWPORT_MARGIN),
+            yRange=(-VIEWPORT_MARGIN, width + VIEWPORT_MARGIN),
         )
 
         # Hide UI stuff not needed
@@ -308,9 +309,10 @@ class ExportVideoWindow(QMainWindow):
         self.options_widget.setLayout(layout)
 
     def update_keyframe(self):
-        output = np.zeros((128,128, 3))
         i = self.start_time.value()
         data = self.parent.signal.transformed_data[int(i // self.ms)] * self.mask
+        dx, dy = data.shape
+        output = np.zeros((dx, dy, 3))
         intData = data * 511
         intData = intData.astype(np.uint16)
         intData = np.swapaxes(intData, 0, 1) # swap xs and ys (OpenCV)
@@ -321,10 +323,10 @@ class ExportVideoWindow(QMainWindow):
             scaledH = int(h * self.yScale.value())
             scaledW = int(w * self.xScale.value())
             # resize output
-            if scaledW < 128:
-                scaledW = 128
-            if scaledH < 128:
-                scaledH = 128
+            if scaledW < dx:
+                scaledW = dx
+            if scaledH < dy:
+                scaledH = dy
             output = np.zeros((scaledW,scaledH, 3))
 
             # apply transformations
@@ -337,14 +339,14 @@ class ExportVideoWindow(QMainWindow):
             output[0: len(img[0]), 0: len(img), :] = img.swapaxes(0,1)[:, :, :]
 
             # use shift values
-            tooWide = (int(self.xShift.value()) + 128 > scaledW)
-            tooTall = (int(self.yShift.value()) + 128 > scaledH)
+            tooWide = (int(self.xShift.value()) + dx > scaledW)
+            tooTall = (int(self.yShift.value()) + dy > scaledH)
             if tooWide:
-                xs = int(scaledW - 128)
+                xs = int(scaledW - dx)
             else:
                 xs = int(self.xShift.value())
             if tooTall:
-                ys = int(scaledH - 128)
+                ys = int(scaledH - dy)
             else:
                 ys = int(self.yShift.value())
 
@@ -356,11 +358,11 @@ class ExportVideoWindow(QMainWindow):
             # ignore shift values
             xs = ys = 0
 
-        output[xs: xs+128, ys: ys+128] = intData.swapaxes(0,1)
+        output[xs: xs+dx, ys: ys+dy] = intData.swapaxes(0,1)
         self.image_item.setImage(output)
 
     def generate_overlay_video(self, data):
-        output = np.zeros((128,128, 3))
+        dx, dy = data.shape[1:]
         intData = data * 511
         intData = intData.astype(np.uint16)
         intData = np.swapaxes(intData, 1, 2) # swap xs and ys (OpenCV)
@@ -370,10 +372,10 @@ class ExportVideoWindow(QMainWindow):
         scaledH = int(h * self.yScale.value())
         scaledW = int(w * self.xScale.value())
         # resize output
-        if scaledW < 128:
-            scaledW = 128
-        if scaledH < 128:
-            scaledH = 128
+        if scaledW < dx:
+            scaledW = dx
+        if scaledH < dy:
+            scaledH = dy
         output = np.zeros((len(intData), scaledW,scaledH, 3))
 
         # transform overlay
@@ -386,14 +388,14 @@ class ExportVideoWindow(QMainWindow):
         output[:, 0: len(img[0]), 0: len(img), :] = img.swapaxes(0,1)[:, :, :]
 
         # use shift values
-        tooWide = (int(self.xShift.value()) + 128 > scaledW)
-        tooTall = (int(self.yShift.value()) + 128 > scaledH)
+        tooWide = (int(self.xShift.value()) + dx > scaledW)
+        tooTall = (int(self.yShift.value()) + dy > scaledH)
         if tooWide:
-            xs = int(scaledW - 128)
+            xs = int(scaledW - dx)
         else:
             xs = int(self.xShift.value())
         if tooTall:
-            ys = int(scaledH - 128)
+            ys = int(scaledH - dy)
         else:
             ys = int(self.yShift.value())
 
@@ -401,7 +403,7 @@ class ExportVideoWindow(QMainWindow):
             # hide data below threshold
             transparent = np.argwhere(data[i] < self.overlay_threshold.value())
             intData[i, transparent[:, 1], transparent[:, 0], :] = img[ys + transparent[:, 1], xs + transparent[:, 0], :]
-            output[i, xs: xs+128, ys: ys+128] = intData[i].swapaxes(0,1)
+            output[i, xs: xs+dx, ys: ys+dy] = intData[i].swapaxes(0,1)
 
         return output
         
@@ -462,8 +464,9 @@ class ExportVideoWindow(QMainWindow):
         self.overlay = cv2.imread(file_path)[...,::-1] #BGR to RGB
         self.update_keyframe()
         self.image_view.view.autoRange()
-        self.xShift.setValue(self.overlay.shape[1]//2 - 64)
-        self.yShift.setValue(self.overlay.shape[0]//2 - 64)
+        dx, dy = self.mask.shape
+        self.xShift.setValue(self.overlay.shape[1]//2 - dx//2)
+        self.yShift.setValue(self.overlay.shape[0]//2 - dy//2)
         self.options_3.show()
         self.options_4.show()
 
@@ -0,0 +1,269 @@
+import os
+import threading
+from typing import Dict
+
+import numpy as np
+import scipy.io
+from PySide6 import QtCore
+from PySide6.QtCore import Signal
+
+from cardiacmap.model.cascade import load_cascade_file
+from cardiacmap.model.container import load_signal
+from cardiacmap.model.data import CardiacSignal
+from cardiacmap.model.index import RECORDING_EXTENSIONS, read_recording_info
+from cardiacmap.model.load_options import LoadOptions, load_reduced_file
+from cardiacmap.model.mkv import load_mkv_file, read_mkv_info
+from cardiacmap.model.npy import load_numpy_file, map_numpy_frames
+from cardiacmap.model.raw import load_raw_file, map_raw_frames, read_raw_header
+from cardiacmap.model.recordings import RECORDINGS
+from cardiacmap.model.sidecar import read_sidecar
+from cardiacmap.model.scimedia import load_scimedia_data
+from cardiacmap.model.sql import SQLFrameStore, load_sql_file
+from cardiacmap.model.stream import CHUNK_READERS, iter_frames
+from cardiacmap.model.tiff import load_tiff_file, read_tiff_header
+from cardiacmap.viewer.components import LargeFilePopUp
+
+PREVIEW_FRAMES = 64
+
+
+class LoadCancelled(Exception):
+    """Raised inside a loader when the user cancels it"""
+
+
+def read_file_metadata(filepath: str) -> Dict:
+    """Read what can be had from a recording's header without touching the frames"""
+    ext = os.path.splitext(filepath)[1].lower()
+    metadata = {"filename": os.path.basename(filepath)}
+
+    if ext in RECORDING_EXTENSIONS:
+        metadata.update(read_recording_info(filepath))
+    elif ext == ".sql":
+        with SQLFrameStore(filepath) as store:
+            metadata.update(store.metadata)
+    elif ext in (".tif", ".tiff"):
+        with open(filepath, "rb") as file:
+            header = read_tiff_header(file)
+        metadata.update(header["metadata"])
+        metadata.update(span_T=header["span_T"], span_X=header["span_X"], span_Y=header["span_Y"])
+    elif ext in (".raw", ".bin"):
+        header = read_raw_header(filepath)
+        span_T, span_X, span_Y = map_raw_frames(filepath, header).shape
+        metadata.update(framerate=header["framerate"], span_T=span_T, span_X=span_X, span_Y=span_Y)
+    elif ext in (".npy", ".npz"):
+        sidecar = read_sidecar(filepath) or {}
+        metadata.update(sidecar)
+        span_T, span_X, span_Y = map_numpy_frames(filepath, sidecar).shape
+        metadata.update(span_T=span_T, span_X=span_X, span_Y=span_Y)
+    elif ext == ".mkv":
+        metadata.update(read_mkv_info(filepath) or {})
+
+    return metadata
+
+
+def read_preview_frames(filepath: str, n_frames: int = PREVIEW_FRAMES):
+    """Read the first frames of a recording as float32 (t, y, x), or None if the file
+    type can't be streamed"""
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext not in CHUNK_READERS:
+        return None
+    frames = iter_frames(filepath, n_frames, end=n_frames, read_ahead=False)
+    try:
+        return next(frames, None)
+    finally:
+        frames.close()
+
+
+def load_signals(
+    filepath: str,
+    calcium_mode: bool,
+    largeFilePopup=LargeFilePopUp,
+    update_progress=None,
+    options: LoadOptions = None,
+) -> Dict[int, CardiacSignal]:
+    """Load any supported file into a dictionary of CardiacSignal, by file extension.
+
+    Args:
+        filepath (str): Path to file
+        calcium_mode (bool): Whether the recording is dual mode (Voltage / Calcium)
+        largeFilePopup (func): callback function to open popup window for larger-than-memory files
+        update_progress (func, optional): progress callback, normalized to 1
+        options (LoadOptions, optional): calibration, binning, ROI and decimation to
+            apply while the file is streamed in. Only streamable files support them.
+
+    Returns:
+        signals: Dictionary of CardiacSignal
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+
+    # A recording open in another window is shared rather than read again, if the same
+    # frames of it are asked for. Saved signals carry their own mask and analysis, so
+    # they are always loaded.
+    key = None
+    if ext != ".signal":
+        key = RECORDINGS.key(filepath, calcium_mode, options)
+        largeFilePopup = _FrameRangePrompt(largeFilePopup, _FRAME_RANGE_PROMPTS.get(key))
+        signals = RECORDINGS.get(key + (largeFilePopup.answer,))
+        if signals is not None:
+            print("Sharing the data of", filepath, "with the windows it is open in")
+            if update_progress:
+                update_progress(1)
+            return signals
+
+    if options is not None and not options.is_default and ext in CHUNK_READERS:
+        signals = load_reduced_file(
+            filepath,
+            read_file_metadata(filepath),
+            options,
+            largeFilePopup,
+            # as when loaded whole, SciMedia and video files are single channel
+            dual_mode=calcium_mode and ext not in (".gsd", ".mkv"),
+            update_progress=update_progress,
+        )
+    elif ext == ".dat":
+        signals = load_cascade_file(filepath, largeFilePopup, dual_mode=calcium_mode)
+    elif ext == ".gsd":
+        signals = load_scimedia_data(filepath, largeFilePopup, update_progress=update_progress)
+    elif ext == ".sql":
+        signals = load_sql_file(
+            filepath, largeFilePopup, dual_mode=calcium_mode, update_progress=update_progress
+        )
+    elif ext == ".mkv":
+        signals = load_mkv_file(filepath, update_progress=update_progress)
+    elif ext in (".tif", ".tiff"):
+        signals = load_tiff_file(filepath, largeFilePopup, dual_mode=calcium_mode)
+    elif ext in (".raw", ".bin"):
+        signals = load_raw_file(filepath, largeFilePopup, dual_mode=calcium_mode)
+    elif ext in (".npy", ".npz"):
+        signals = load_numpy_file(filepath, largeFilePopup, dual_mode=calcium_mode)
+    elif ext == ".mat":
+        data = scipy.io.loadmat(filepath)["data"]
+        data = np.transpose(data, axes=(0, 2, 1))
+        emptyMetadata = {"span_T": 0, "span_X": 0, "span_Y": 0,
+                         "file_metadata": 0, "datetime": 0, "framerate": 0,
+                         "filename": os.path.basename(filepath)}
+        signals = {0: CardiacSignal(signal=data, metadata=emptyMetadata, channel="Single")}
+    elif ext == ".signal":
+        # the saved data is mapped rather than decoded up front
+        signals = {0: load_signal(filepath, lazy=True)}
+    else:
+        raise ValueError(f"Unsupported file type: {ext}")
+
+    if update_progress:
+        update_progress(1)
+    if key is None:
+        return signals
+    if largeFilePopup.args is not None:
+        _FRAME_RANGE_PROMPTS[key] = largeFilePopup.args
+    return RECORDINGS.register(key + (largeFilePopup.answer,), signals)
+
+
+# (tLen, maxFrames) the large file popup was shown with for a recording, by registry key,
+# so opening it again asks first and only shares the data if the same frames are chosen
+_FRAME_RANGE_PROMPTS = {}
+
+
+class _FrameRangePrompt:
+    """Large file popup that remembers the question it was asked and its answer. Given
+    `args`, it asks that question up front; the loader asking it again gets the same
+    answer without another popup."""
+
+    def __init__(self, popup, args=None):
+        self.popup = popup
+        self.args = None
+        self.answer = None
+        if args is not None:
+            self(*args)
+
+    def __call__(self, tLen, maxFrames):
+        if self.args != (tLen, maxFrames):
+            answer = self.popup(tLen, maxFrames)
+            self.args = (tLen, maxFrames)
+            self.answer = tuple(answer) if isinstance(answer, list) else answer
+        return self.answer
+
+
+class FileLoader(QtCore.QObject):
+    """Loads a file on a QThreadPool worker so the GUI stays responsive. Results are
+    delivered through Qt signals, which are queued onto the GUI thread:
+
+        preview(metadata, frames): header metadata and the first frames (frames may be None)
+        progress(value): load progress, normalized to 1
+        finished(signals): dictionary of CardiacSignal
+        failed(message), cancelled()
+
+    The large file popup can only be shown on the GUI thread, so the worker asks for it
+    through a signal and waits for the answer. Several loaders can run at once.
+    """
+
+    preview = Signal(object, object)
+    progress = Signal(float)
+    finished = Signal(object)
+    failed = Signal(str)
+    cancelled = Signal()
+    _popup_requested = Signal(int, int)
+
+    def __init__(self, filepath: str, calcium_mode: bool, options: LoadOptions = None, parent=None):
+        super().__init__(parent)
+        self.filepath = filepath
+        self.calcium_mode = calcium_mode
+        self.options = options
+
+        self._cancel = threading.Event()
+        self._popup_done = threading.Event()
+        self._popup_result = (None, None)
+        self._popup_requested.connect(self._show_popup)
+
+    def start(self):
+        QtCore.QThreadPool.globalInstance().start(self._run)
+
+    def cancel(self):
+        self._cancel.set()
+        # release a worker waiting on a popup that will not be answered
+        self._popup_done.set()
+
+    def _check_cancelled(self):
+        if self._cancel.is_set():
+            raise LoadCancelled()
+
+    def _update_progress(self, value):
+        self._check_cancelled()
+        self.progress.emit(float(value))
+
+    def _show_popup(self, tLen, maxFrames):
+        if not self._cancel.is_set():
+            self._popup_result = LargeFilePopUp(tLen, maxFrames)
+        self._popup_done.set()
+
+    def _large_file_popup(self, tLen, maxFrames):
+        """Runs on the worker: show the popup on the GUI thread and wait for the answer"""
+        self._popup_done.clear()
+        self._popup_requested.emit(tLen, maxFrames)
+        self._popup_done.wait()
+        self._check_cancelled()
+        return self._popup_result
+
+    def _run(self):
+        try:
+            metadata = read_file_metadata(self.filepath)
+            self._check_cancelled()
+            self.preview.emit(metadata, read_preview_frames(self.filepath))
+            self._check_cancelled()
+
+            signals = load_signals(
+                self.filepath,
+                self.calcium_mode,
+                largeFilePopup=self._large_file_popup,
+                update_progress=self._update_progress,
+                options=self.options,
+            )
+            self._check_cancelled()
+        except LoadCancelled:
+            print("Loading canceled:", self.filepath)
+            self.cancelled.emit()
+            return
+        except Exception as e:
+            print("Error loading", self.filepath, ":", e)
+            self.failed.emit(str(e))
+            return
+
+        self.finished.emit(signals)
@@ -20,8 +20,6 @@ from skimage.transform import resize
 from cardiacmap.model.cascade import load_cascade_file
 from cardiacmap.viewer.components import Spinbox
 
-IMAGE_SIZE = 128
-
 
 class AnnotateView(QtWidgets.QWidget):
 
@@ -67,7 +65,8 @@ class AnnotateView(QtWidgets.QWidget):
         self.img_view.view.enableAutoRange(enable=False)
         self.img_view.view.showAxes(False)
         self.img_view.view.setMouseEnabled(False, False)
-        self.img_view.view.setRange(xRange=(-2, 128), yRange=(-2, 128))
+        height, width = self.parent.signal.frame_shape
+        self.img_view.view.setRange(xRange=(-2, height), yRange=(-2, width))
 
         self.img_view.ui.roiBtn.hide()
         self.img_view.ui.menuBtn.hide()
@@ -172,7 +171,7 @@ class AnnotateView(QtWidgets.QWidget):
             self.parent.signal.reset_image()
             self.image_data = self.parent.signal.image_data[0, :, :]
 
-            mask = np.ones((IMAGE_SIZE, IMAGE_SIZE))
+            mask = np.ones(self.parent.signal.frame_shape)
             self.parent.signal.apply_mask(mask)
             self.parent.update_signal_plot()
             self.parent.position_tab.update_data()
@@ -187,8 +186,9 @@ class AnnotateView(QtWidgets.QWidget):
         if self.roi is None:
             return
 
-        mask = self.get_roi_mask((IMAGE_SIZE, IMAGE_SIZE))
-        self.parent.signal.apply_mask(mask)
+        mask = self.get_roi_mask(self.parent.signal.frame_shape)
+        compact = self.parent.settings.child("Mask").child("Store Masked Pixels Only").value()
+        self.parent.signal.apply_mask(mask, compact=compact)
         self.parent.update_signal_plot()
         self.parent.position_tab.update_data()
         self.masked_image_data = self.image_data * self.parent.signal.mask
@@ -21,7 +21,7 @@ from cardiacmap.viewer.panels import SignalPanel
 from cardiacmap.viewer.panels.apds import ScatterPanel, ScatterPlotView, SpatialPlotView
 from cardiacmap.viewer.components import Spinbox
 from cardiacmap.viewer.utils import loading_popup
-from cardiacmap.transforms.apd import GetThresholdIntersections, GetThresholdIntersections1D
+from cardiacmap.transforms.apd import GetThresholdIntersections1D
 
 from cardiacmap.viewer.export import ExportAPDsWindow
 
@@ -59,9 +59,6 @@ SPINBOX_STYLE = """QSpinBox
                 right: 0px;
             }"""
 
-IMAGE_SIZE = 128
-
-
 class DraggablePlot(pg.PlotItem):
 
     # Draggable PlotItem that takes in a callback function.
@@ -116,8 +113,9 @@ class APDPositionView(QWidget):
         #self.image_view.view.enableAutoRange(enable=True)
         self.image_view.view.setMouseEnabled(False, False)
 
+        height, width = self.image_data.shape
         self.image_view.view.setRange(
-            xRange=(-2, IMAGE_SIZE + 2), yRange=(-2, IMAGE_SIZE + 2)
+            xRange=(-2, height + 2), yRange=(-2, width + 2)
         )
 
         # Hide UI stuff not needed
@@ -137,7 +135,7 @@ class APDPositionView(QWidget):
         # Draggable Red Dot
         # Add posiiton marker
         self.position_marker = pg.ScatterPlotItem(
-            pos=[[64, 64]], size=5, pen=pg.mkPen("r"), brush=pg.mkBrush("r")
+            pos=[[self.parent.x, self.parent.y]], size=5, pen=pg.mkPen("r"), brush=pg.mkBrush("r")
         )
 
         self.image_view.getView().addItem(self.position_marker)
@@ -150,11 +148,12 @@ class APDPositionView(QWidget):
         self.show_marker.stateChanged.connect(self.toggle_marker)
         
         self.px_bar = QToolBar()
+        height, width = self.image_data.shape
         self.x_box = Spinbox(
-            min=0, max=127, val=64, min_width=50, max_width=50, step=1
+            min=0, max=height - 1, val=self.parent.x, min_width=50, max_width=50, step=1
         )
         self.y_box = Spinbox(
-            min=0, max=127, val=64, min_width=50, max_width=50, step=1
+            min=0, max=width - 1, val=self.parent.y, min_width=50, max_width=50, step=1
         )
             
         self.x_box.valueChanged.connect(self.update_position_boxes)
@@ -167,8 +166,9 @@ class APDPositionView(QWidget):
 
     def update_position(self, x, y):
 
-        y = np.clip(y, 0, IMAGE_SIZE - 1)
-        x = np.clip(x, 0, IMAGE_SIZE - 1)
+        height, width = self.image_data.shape
+        y = np.clip(y, 0, width - 1)
+        x = np.clip(x, 0, height - 1)
 
         self.update_marker(x, y)
         self.parent.x = x
@@ -227,6 +227,7 @@ class APDWindow(QMainWindow):
         
         self.img_data = parent.signal.transformed_data[0] * self.mask
         self.ts = None
+        self.x, self.y = parent.signal.center
         
         self.setWindowTitle("APDs")
         
@@ -295,8 +296,6 @@ class APDWindow(QMainWindow):
         layout.addWidget(self.splitter)
 
         self.setCentralWidget(self.splitter)
-        self.x = 64
-        self.y = 64
         
         self.calculate_apds()
 
@@ -548,7 +547,7 @@ class APDWindow(QMainWindow):
         print("APDs/DIs:", "\nThreshold:", threshold, "\n:", spacing)
         
         self.line_idxs = [int(x.getPos()[0]//self.ms) for x in self.lines]
-        self.apds, self.dis, self.tOffsets = GetThresholdIntersections(self.parent.signal.transformed_data, threshold, spacing, intervals = self.line_idxs)
+        self.apds, self.dis, self.tOffsets = self.parent.signal.perform_apd(threshold, spacing, intervals = self.line_idxs)
         e = time.time()
         print("Runtime:", e-s)
         self.data = [self.apds, self.dis]
@@ -639,7 +638,7 @@ class APDSubWindow(QMainWindow):
         self.settings = parent.settings
         self.intervals = intervals
         
-        self.x1 = self.y1 = self.x2 = self.y2 = 64
+        self.x1, self.y1 = self.x2, self.y2 = parent.parent.signal.center
 
         self.image_tabs = QTabWidget()
         self.image_tabs.setMinimumWidth(300)
@@ -792,7 +791,8 @@ class SaveAPDView(QWidget):
         self.img_view.view.enableAutoRange(enable=False)
         self.img_view.view.showAxes(False)
         self.img_view.view.setMouseEnabled(False, False)
-        self.img_view.view.setRange(xRange=(-2, 128), yRange=(-2, 128))
+        height, width = self.parent.img_data.shape
+        self.img_view.view.setRange(xRange=(-2, height), yRange=(-2, width))
 
         self.img_view.ui.roiBtn.hide()
         self.img_view.ui.menuBtn.hide()
@@ -867,12 +867,13 @@ class SaveAPDView(QWidget):
         self.drawing = False
 
         #print(self.drawing)
+        frame_shape = self.parent.img_data.shape
         if self.roi is None and self.coords is None:
-            mask = np.ones((128, 128))
+            mask = np.ones(frame_shape)
         elif self.roi is not None:
-            mask = self.get_roi_mask((IMAGE_SIZE, IMAGE_SIZE))
+            mask = self.get_roi_mask(frame_shape)
         elif self.coords is not None:
-            mask = np.zeros((128, 128), dtype=np.uint8)
+            mask = np.zeros(frame_shape, dtype=np.uint8)
             mask[self.coords[:, 0], self.coords[:, 1]] = 1
             
         APDdata = []
@@ -906,7 +907,7 @@ class SaveAPDView(QWidget):
         # read coords
         self.coords = np.loadtxt(file_path, delimiter=',', dtype=np.int16)
         
-        mask = np.zeros((128, 128))
+        mask = np.zeros(self.parent.img_data.shape)
         mask[self.coords[:, 0], self.coords[:, 1]] = 1
         
         # update image
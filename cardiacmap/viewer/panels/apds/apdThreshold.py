@@ -18,7 +18,6 @@ QTOOLBAR_STYLE = """
             """
 
 VIEWPORT_MARGIN = 2
-IMAGE_SIZE = 128
 
 def threshold(sig: np.ndarray, threshold: float):
     output = np.zeros(sig.shape)
@@ -40,7 +39,8 @@ class APDThresholdWindow(QMainWindow):
 
         img_layout = QVBoxLayout()
 
-        self.x, self.y = 64, 64
+        height, width = self.mask.shape
+        self.x, self.y = height // 2, width // 2
 
         self.image_view = pg.ImageView()
         self.image_view.setImage(self.data[imgIdx])
@@ -48,8 +48,8 @@ class APDThresholdWindow(QMainWindow):
         self.image_view.view.setMouseEnabled(False, False)
 
         self.image_view.view.setRange(
-            xRange=(-VIEWPORT_MARGIN, IMAGE_SIZE + VIEWPORT_MARGIN),
-            yRange=(-VIEWPORT_MARGIN, IMAGE_SIZE + VIEWPORT_MARGIN),
+            xRange=(-VIEWPORT_MARGIN, height + VIEWPORT_MARGIN),
+            yRange=(-VIEWPORT_MARGIN, width + VIEWPORT_MARGIN),
         )
         self.output_view = pg.ImageView(levelMode='rgba')
         self.output_view.setImage(self.data[imgIdx])
@@ -57,8 +57,8 @@ class APDThresholdWindow(QMainWindow):
 
 
         self.output_view.view.setRange(
-            xRange=(-VIEWPORT_MARGIN, IMAGE_SIZE + VIEWPORT_MARGIN),
-            yRange=(-VIEWPORT_MARGIN, IMAGE_SIZE + VIEWPORT_MARGIN),
+            xRange=(-VIEWPORT_MARGIN, height + VIEWPORT_MARGIN),
+            yRange=(-VIEWPORT_MARGIN, width + VIEWPORT_MARGIN),
         )
 
         self.image_views = QHBoxLayout()
@@ -197,7 +197,7 @@ class APDThresholdWindow(QMainWindow):
         outputImage = np.take(lut, outputImage, axis=0)
 
         # color contours
-        contour_image = np.zeros((128,128))
+        contour_image = np.zeros(self.mask.shape)
         for i in range(int(self.num_thresholds.value())):
             contours = c[i]
             for contour in contours:
@@ -42,8 +42,6 @@ SPINBOX_STYLE = """QSpinBox
                 bottom: -5px;
                 right: 0px;
             }"""
-            
-IMAGE_SIZE = 128
 
 
 class ScatterDragPlot(pg.PlotItem):
@@ -137,7 +135,8 @@ class ScatterPanel(QWidget):
         leftAxis.setLabel(text="Action Potential Duration (ms)")
         bottomAxis.setLabel(text="Diastolic Interval (ms)")
 
-        self.update_plot(0, 64, 64, False, False)
+        height, width = self.parent.mask.shape
+        self.update_plot(0, height // 2, width // 2, False, False)
 
     def update_plot(self, interval, x, y, show_err = None, alternans = None):
         #print(interval, x, y)
@@ -273,8 +272,9 @@ class ScatterPlotView(QWidget):
         self.image_view.view.enableAutoRange(enable=True)
         self.image_view.view.setMouseEnabled(False, False)
 
+        height, width = self.parent.mask.shape
         self.image_view.view.setRange(
-            xRange=(-2, IMAGE_SIZE + 2), yRange=(-2, IMAGE_SIZE + 2)
+            xRange=(-2, height + 2), yRange=(-2, width + 2)
         )
 
         # Hide UI stuff not needed
@@ -285,11 +285,11 @@ class ScatterPlotView(QWidget):
         self.image_view.view.invertY(True)
 
         # Draggable red dot
+        self.x, self.y = height // 2, width // 2
         self.marker = pg.ScatterPlotItem(
-            pos=[[64, 64]], size=5, pen=pg.mkPen("r"), brush=pg.mkBrush("r")
+            pos=[[self.x, self.y]], size=5, pen=pg.mkPen("r"), brush=pg.mkBrush("r")
         )
         self.image_view.getView().addItem(self.marker)
-        self.x = self.y = 64
 
         return self.image_view
 
@@ -320,11 +320,12 @@ class ScatterPlotView(QWidget):
         self.toolbar.addWidget(self.alternans)
         
         self.px_bar = QToolBar()
+        height, width = self.parent.mask.shape
         self.x_box = Spinbox(
-            min=0, max=127, val=64, min_width=50, max_width=50, step=1
+            min=0, max=height - 1, val=self.x, min_width=50, max_width=50, step=1
         )
         self.y_box = Spinbox(
-            min=0, max=127, val=64, min_width=50, max_width=50, step=1
+            min=0, max=width - 1, val=self.y, min_width=50, max_width=50, step=1
         )
             
         self.x_box.valueChanged.connect(self.update_position_boxes)
@@ -345,8 +346,9 @@ class ScatterPlotView(QWidget):
         self.parent.update_tab_title(self.intervalIdx.value()-1)
 
     def update_marker(self, x, y):
-        self.y = np.clip(y, 0, IMAGE_SIZE - 1)
-        self.x = np.clip(x, 0, IMAGE_SIZE - 1)
+        height, width = self.parent.mask.shape
+        self.y = np.clip(y, 0, width - 1)
+        self.x = np.clip(x, 0, height - 1)
 
         self.marker.setData(pos=[[self.x, self.y]])
         self.update_scatter()
@@ -46,7 +46,6 @@ SPINBOX_STYLE = """QSpinBox
                 right: 0px;
             }"""
 
-IMAGE_SIZE = 128
 
 class SpatialDragPlot(pg.PlotItem):
     # Position Plot used by APD/DI v.s. Space Plots
@@ -131,8 +130,9 @@ class SpatialPlotView(QWidget):
         self.setLayout(layout)
 
         self.spatial_coords = None
-        self.x1 = self.y1 = 32
-        self.x2 = self.y2 = 64
+        height, width = self.mask.shape
+        self.x1, self.y1 = height // 4, width // 4
+        self.x2, self.y2 = height // 2, width // 2
 
         self.update_data()
         # self.position_callback = position_callback
@@ -150,8 +150,9 @@ class SpatialPlotView(QWidget):
         self.image_view.imageItem.setColorMap(self.normal_cm)
         self.image_view.ui.histogram.item.sigLookupTableChanged.connect(self.on_lut_change)
 
+        height, width = self.mask.shape
         self.image_view.view.setRange(
-            xRange=(-2, IMAGE_SIZE + 2), yRange=(-2, IMAGE_SIZE + 2)
+            xRange=(-2, height + 2), yRange=(-2, width + 2)
         )
 
         # Hide UI stuff not needed
@@ -166,13 +167,13 @@ class SpatialPlotView(QWidget):
 
         # Draggable red dots
         self.startPoint = pg.ScatterPlotItem(
-            pos=[[32, 32]], size=5, pen=pg.mkPen("r"), brush=pg.mkBrush("r")
+            pos=[[height // 4, width // 4]], size=5, pen=pg.mkPen("r"), brush=pg.mkBrush("r")
         )
         self.endPoint = pg.ScatterPlotItem(
-            pos=[[64, 64]], size=5, pen=pg.mkPen("b"), brush=pg.mkBrush("b")
+            pos=[[height // 2, width // 2]], size=5, pen=pg.mkPen("b"), brush=pg.mkBrush("b")
         )
 
-        self.line = pg.PlotCurveItem(x=[32, 64], y=[32, 64])
+        self.line = pg.PlotCurveItem(x=[height // 4, height // 2], y=[width // 4, width // 2])
         self.line_visable = True
 
         self.image_view.getView().addItem(self.startPoint)
@@ -341,8 +342,9 @@ class SpatialPlotView(QWidget):
         self.update_data()
 
     def line_start(self, x, y):
-        y = np.clip(y, 0, IMAGE_SIZE)
-        x = np.clip(x, 0, IMAGE_SIZE)
+        height, width = self.mask.shape
+        y = np.clip(y, 0, width)
+        x = np.clip(x, 0, height)
         self.x1 = x
         self.y1 = y
         self.startPoint.setData(pos=[[x, y]])
@@ -350,8 +352,9 @@ class SpatialPlotView(QWidget):
         # print("Start", self.x1, self.y1)
 
     def line_end(self, x, y):
-        y = np.clip(y, 0, IMAGE_SIZE)
-        x = np.clip(x, 0, IMAGE_SIZE)
+        height, width = self.mask.shape
+        y = np.clip(y, 0, width)
+        x = np.clip(x, 0, height)
         self.x2 = x
         self.y2 = y
         self.endPoint.setData(pos=[[x, y]])
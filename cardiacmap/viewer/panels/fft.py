@@ -65,9 +65,6 @@ SPINBOX_STYLE = """QSpinBox
                 right: 0px;
             }"""
 
-IMAGE_SIZE = 128
-
-
 class DraggablePlot(pg.PlotItem):
 
     # Draggable PlotItem that takes in a callback function.
@@ -122,8 +119,9 @@ class FFTPositionView(QWidget):
         #self.image_view.view.enableAutoRange(enable=True)
         self.image_view.view.setMouseEnabled(False, False)
 
+        height, width = self.image_data.shape
         self.image_view.view.setRange(
-            xRange=(-2, IMAGE_SIZE + 2), yRange=(-2, IMAGE_SIZE + 2)
+            xRange=(-2, height + 2), yRange=(-2, width + 2)
         )
 
         # Hide UI stuff not needed
@@ -143,7 +141,7 @@ class FFTPositionView(QWidget):
         # Draggable Red Dot
         # Add posiiton marker
         self.position_marker = pg.ScatterPlotItem(
-            pos=[[64, 64]], size=5, pen=pg.mkPen("r"), brush=pg.mkBrush("r")
+            pos=[[self.parent.x, self.parent.y]], size=5, pen=pg.mkPen("r"), brush=pg.mkBrush("r")
         )
 
         self.image_view.getView().addItem(self.position_marker)
@@ -156,11 +154,12 @@ class FFTPositionView(QWidget):
         self.show_marker.stateChanged.connect(self.toggle_marker)
         
         self.px_bar = QToolBar()
+        height, width = self.image_data.shape
         self.x_box = Spinbox(
-            min=0, max=127, val=64, min_width=50, max_width=50, step=1
+            min=0, max=height - 1, val=self.parent.x, min_width=50, max_width=50, step=1
         )
         self.y_box = Spinbox(
-            min=0, max=127, val=64, min_width=50, max_width=50, step=1
+            min=0, max=width - 1, val=self.parent.y, min_width=50, max_width=50, step=1
         )
             
         self.x_box.valueChanged.connect(self.update_position_boxes)
@@ -180,8 +179,9 @@ class FFTPositionView(QWidget):
 
     def update_position(self, x, y):
 
-        y = np.clip(y, 0, IMAGE_SIZE - 1)
-        x = np.clip(x, 0, IMAGE_SIZE - 1)
+        height, width = self.image_data.shape
+        y = np.clip(y, 0, width - 1)
+        x = np.clip(x, 0, height - 1)
 
         self.update_marker(x, y)
         self.parent.x = x
@@ -240,6 +240,7 @@ class FFTWindow(QMainWindow):
         
         self.img_data = [parent.signal.transformed_data[0] * self.mask]
         self.img_index = 0
+        self.x, self.y = parent.signal.center
         
         self.setWindowTitle("FFT")
         
@@ -301,8 +302,6 @@ class FFTWindow(QMainWindow):
 
         self.setCentralWidget(self.splitter)
 
-        self.x = 64
-        self.y = 64
         self.update_signal_plot()
 
     def update_signal_plot(self):
@@ -34,7 +34,6 @@ QTOOLBAR_STYLE = """
             """
 
 VIEWPORT_MARGIN = 2
-IMAGE_SIZE = 128
 
 
 def fill_contours(arr):
@@ -197,7 +196,7 @@ def _calculate_isochrone(
             contour_points = find_contours(sig[idx], level=t)
 
             # Generate empty slice of where contours would be
-            c = np.zeros((128, 128))
+            c = np.zeros(sig.shape[1:])
 
             for contour_line in contour_points:
 
@@ -217,7 +216,8 @@ def _calculate_isochrone(
                 # Alternate version: Single points only
                 for point in _countour_line:
                     x, y = point
-                    point_diff = sig[idx, x, y] - sig[prev_idx, x, y]
+                    # in float: the data may still be the recording's unsigned integers
+                    point_diff = float(sig[idx, x, y]) - float(sig[prev_idx, x, y])
                     is_upstroke = True if point_diff >= 0 else False
                     if (is_upstroke and upstroke) or (not is_upstroke and downstroke):
                         c[x, y] = 1
@@ -297,12 +297,13 @@ class IsochroneWindow(QMainWindow):
         img_layout = QVBoxLayout()
         central_layout = QHBoxLayout()
 
-        self.x, self.y = 64, 64
+        self.x, self.y = self.signal.center
+        height, width = self.signal.frame_shape
 
         self.video_tab = PositionView(self)
         self.video_tab.data_bar.hide()
         self.video_tab.image_view.setImage(
-            np.zeros((128, 128)), autoLevels=True, autoRange=True
+            np.zeros(self.signal.frame_shape), autoLevels=True, autoRange=True
         )
         self.video_tab.framerate.setValue(10)
         self.video_tab.skiprate.setValue(1)
@@ -313,7 +314,7 @@ class IsochroneWindow(QMainWindow):
         self.image_tab.view.setMouseEnabled(False, False)
 
         self.pos_marker_input = pg.ScatterPlotItem(
-            pos=[[64, 64]],
+            pos=[[self.x, self.y]],
             size=5,
             pen=pg.mkPen("r"),
             brush=pg.mkBrush("r"),
@@ -321,17 +322,17 @@ class IsochroneWindow(QMainWindow):
         self.image_tab.getView().addItem(self.pos_marker_input)
 
         self.image_tab.view.setRange(
-            xRange=(-VIEWPORT_MARGIN, IMAGE_SIZE + VIEWPORT_MARGIN),
-            yRange=(-VIEWPORT_MARGIN, IMAGE_SIZE + VIEWPORT_MARGIN),
+            xRange=(-VIEWPORT_MARGIN, height + VIEWPORT_MARGIN),
+            yRange=(-VIEWPORT_MARGIN, width + VIEWPORT_MARGIN),
         )
 
-        self.output_item = pg.ImageItem(np.zeros((128,128)))
+        self.output_item = pg.ImageItem(np.zeros(self.signal.frame_shape))
         self.output_plot = DraggablePlot(self.update_position)
         self.output_tab = pg.ImageView(view=self.output_plot, imageItem=self.output_item)
         self.output_tab.view.setMouseEnabled(False, False)
 
         self.pos_marker_output = pg.ScatterPlotItem(
-            pos=[[64, 64]],
+            pos=[[self.x, self.y]],
             size=5,
             pen=pg.mkPen("r"),
             brush=pg.mkBrush("r"),
@@ -339,8 +340,8 @@ class IsochroneWindow(QMainWindow):
         self.output_tab.getView().addItem(self.pos_marker_output)
 
         self.output_tab.view.setRange(
-            xRange=(-VIEWPORT_MARGIN, IMAGE_SIZE + VIEWPORT_MARGIN),
-            yRange=(-VIEWPORT_MARGIN, IMAGE_SIZE + VIEWPORT_MARGIN),
+            xRange=(-VIEWPORT_MARGIN, height + VIEWPORT_MARGIN),
+            yRange=(-VIEWPORT_MARGIN, width + VIEWPORT_MARGIN),
         )
 
         self.image_tabs = QTabWidget()
@@ -507,8 +508,9 @@ class IsochroneWindow(QMainWindow):
         self.options_widget.setLayout(layout)
 
     def update_position(self, x, y):
-        y = np.clip(y, 0, IMAGE_SIZE - 1)
-        x = np.clip(x, 0, IMAGE_SIZE - 1)
+        height, width = self.signal.frame_shape
+        y = np.clip(y, 0, width - 1)
+        x = np.clip(x, 0, height - 1)
         self.update_marker(x, y)
         self.x = x
         self.y = y
@@ -607,7 +609,7 @@ class IsochroneWindow(QMainWindow):
             lines = dilate(lines, np.ones((thickness, thickness)))
 
         filledContours = self.color_contour(isochrone)
-        filledWithLines = np.zeros((128, 128, 3))
+        filledWithLines = np.zeros((*self.signal.frame_shape, 3))
         filledWithLines[lines == 0] = filledContours[lines == 0]
         filledWithLines[lines != 0] = self.color_button.color().getRgb()[:3]
 
@@ -620,7 +622,7 @@ class IsochroneWindow(QMainWindow):
         start_frame = int(self.start_frame.value() / self.ms)
 
         self.contour_data = deepcopy(self.signal.transformed_data[start_frame: start_frame + cycles])
-        video_output = np.zeros((len(self.contour_data), 128, 128, 3))
+        video_output = np.zeros((*self.contour_data.shape, 3))
 
         thickness = int(self.thickness.value())
 
@@ -648,13 +650,13 @@ class IsochroneWindow(QMainWindow):
 
         if img is None:
             # create empty background
-            output_img = np.zeros((128,128,3), np.uint16)
+            output_img = np.zeros((*contour.shape, 3), np.uint16)
             #scale = 511 / contour.max()
             #output_img = np.take(lut, (contour * scale).astype(np.uint16), axis=0)
             #return output_img
         else:
             # normalize image, [0-511]
-            output_img = np.copy(img)
+            output_img = np.array(img, dtype=np.float32)
             output_img -= levels[0]
             output_img /= levels[1] - levels[0]
             output_img *= 511
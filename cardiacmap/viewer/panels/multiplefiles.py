@@ -1,4 +1,3 @@
-import pickle
 import os
 import numpy as np
 import scipy
@@ -19,8 +18,9 @@ from cardiacmap.viewer.export import ImportExportDirectories
 from cardiacmap.model.cascade import load_cascade_file
 from cardiacmap.model.scimedia import load_scimedia_data
 from cardiacmap.model.data import CardiacSignal
+from cardiacmap.model.container import load_signal, save_signal
+from cardiacmap.model.index import RecordingIndex, find_recordings
 from cardiacmap.transforms.transforms import FFT
-from cardiacmap.transforms.apd import GetThresholdIntersections
 
 from cardiacmap.viewer.components import FrameInputDialog, LargeFilePopUp
 
@@ -34,10 +34,14 @@ class ParameterWidget(QWidget):
         super().__init__()
 
 class FileWidget(QWidget):
-    def __init__(self, parent, filename):
+    def __init__(self, parent, filename, info=None):
         super().__init__()
         self.parent = parent
         self.label = QLabel(filename)
+        # header summary from the recording index, if the file could be indexed
+        self.info = QLabel(
+            f"{info['span_T']} frames, {info['span_X']}x{info['span_Y']}" if info else ""
+        )
         self.delButton = QPushButton("X")
         self.delButton.setMaximumSize(20, 20)
         self.delButton.clicked.connect(self.delete)
@@ -51,12 +55,15 @@ class FileWidget(QWidget):
         self.layout = QHBoxLayout()
         self.layout.addWidget(self.delButton)
         self.layout.addWidget(self.label)
+        self.layout.addWidget(self.info)
         self.layout.addWidget(self.fileMode)
         self.layout.addWidget(self.editMode)
         self.layout.addStretch(10)
         self.layout.addWidget(self.status)
         self.setLayout(self.layout)
         self.editMode.hide()
+        if info and info["dual"]:
+            self.fileMode.setCurrentIndex(1)
 
     def delete(self):
         self.parent.delete_file(self)
@@ -64,6 +71,8 @@ class FileWidget(QWidget):
         self.delButton.destroy()
         self.label.setParent(None)
         self.label.destroy()
+        self.info.setParent(None)
+        self.info.destroy()
         self.fileMode.setParent(None)
         self.fileMode.destroy()
         self.editMode.setParent(None)
@@ -165,12 +174,19 @@ class MultipleFilesWindow(QDialog):
         self.instruction_list = []
         self.instruction_params = []
 
+        self.recording_index = RecordingIndex()
+
         self.add_file_button = QPushButton("+ Add a file")
         self.add_file_button.clicked.connect(self.add_file)
+        self.add_folder_button = QPushButton("+ Add a folder")
+        self.add_folder_button.clicked.connect(self.add_folder)
+        add_layout = QHBoxLayout()
+        add_layout.addWidget(self.add_file_button)
+        add_layout.addWidget(self.add_folder_button)
         self.file_list_layout = QVBoxLayout()
         self.file_parent_layout = QVBoxLayout()
         self.file_parent_layout.addLayout(self.file_list_layout)
-        self.file_parent_layout.addWidget(self.add_file_button)
+        self.file_parent_layout.addLayout(add_layout)
 
 
         self.add_instruction_button = QPushButton("+ Add an instruction")
@@ -213,16 +229,32 @@ class MultipleFilesWindow(QDialog):
             dirs.importDir,
             "All Files (*)",
         )[0]
+        if filepaths:
+            # update import directory
+            dirs.importDir = filepaths[0][:filepaths[0].rindex("/") + 1]
+            dirs.SaveDirectories()
+            self._add_files(filepaths)
+
+    def add_folder(self):
+        """Add every recording in a directory tree. Only headers are read, through the
+        recording index."""
+        dirs = ImportExportDirectories() # get import directory
+        directory = QFileDialog.getExistingDirectory(self, "Add Folder", dirs.importDir)
+        if directory:
+            dirs.importDir = directory.rstrip("/") + "/"
+            dirs.SaveDirectories()
+            self._add_files(find_recordings(directory))
+
+    def _add_files(self, filepaths):
+        infos = self.recording_index.update(filepaths)
+        self.recording_index.save()
         for filepath in filepaths:
-            if filepath:
-                # add file to GUI
-                newFile = FileWidget(self, filepath[filepath.rindex("/") + 1:])
-                self.file_list_layout.addWidget(newFile)
-                # add file to file list
-                self.file_list.append(filepath)
-                # update import directory
-                dirs.importDir = filepath[:filepath.rindex("/") + 1]
-                dirs.SaveDirectories()
+            # add file to GUI
+            info = infos.get(os.path.abspath(filepath))
+            newFile = FileWidget(self, os.path.basename(filepath), info)
+            self.file_list_layout.addWidget(newFile)
+            # add file to file list
+            self.file_list.append(filepath)
 
     def delete_file(self, fileWidget):
         self.file_list_layout.removeWidget(fileWidget)
@@ -247,12 +279,7 @@ class MultipleFilesWindow(QDialog):
             savedFilename = filepath[:filepath.rindex(".")] + str(self.file_suffix.text())
 
             if file_ext == "signal":
-                with open(filepath, "rb") as f:
-                    signal = pickle.load(f)
-                    if signal.transformed_data is None:
-                        # repopulate data fields
-                        signal.transformed_data = signal.base_data
-                        signal.previous_transform = signal.base_data
+                signal = load_signal(filepath)
 
             elif file_ext == "dat":
                 if file_item.fileMode.currentIndex() == 1:
@@ -261,8 +288,9 @@ class MultipleFilesWindow(QDialog):
                     signal_2 = signals[1]
                     if file_item.editMode.currentIndex() > 0:
                         # determine which is V and Ca
-                        s1FFT = FFT(signal.transformed_data[:, 64, 64])
-                        s2FFT =  FFT(signal_2.transformed_data[:, 64, 64])
+                        y, x = signal.center
+                        s1FFT = FFT(signal.transformed_data[:, y, x])
+                        s2FFT =  FFT(signal_2.transformed_data[:, y, x])
                         if s1FFT[0:10].sum() > s2FFT[0:10].sum():
                             #s2 is voltage
                             if file_item.editMode.currentIndex() == 1: # edit voltage
@@ -397,8 +425,8 @@ class MultipleFilesWindow(QDialog):
                         output = widget.hlayout.itemAt(o).widget().currentIndex()
                         file_item.status.setText("Calculating APDs...")
                         self.repaint()
-                        apds, dis, offsets = GetThresholdIntersections(signal.transformed_data, threshold, spacing)
-                        apdDiOutput = np.zeros((len(apds[0]) + len(dis[0]) + 1, 128, 128))
+                        apds, dis, offsets = signal.perform_apd(threshold, spacing)
+                        apdDiOutput = np.zeros((len(apds[0]) + len(dis[0]) + 1, *signal.frame_shape))
                         apdDiOutput[0] = offsets
                         apdDiOutput[1::2] = dis[0]
                         apdDiOutput[2::2] = apds[0]
@@ -408,8 +436,8 @@ class MultipleFilesWindow(QDialog):
                         else:
                             np.save(savedFilename + "_APD-DI.npy", apdDiOutput)
                         if s2:
-                            apds, dis, offsets = GetThresholdIntersections(signal_2.transformed_data, threshold, spacing)
-                            apdDiOutput = np.zeros((len(apds[0]) + len(dis[0]) + 1, 128, 128))
+                            apds, dis, offsets = signal_2.perform_apd(threshold, spacing)
+                            apdDiOutput = np.zeros((len(apds[0]) + len(dis[0]) + 1, *signal_2.frame_shape))
                             apdDiOutput[0] = offsets
                             apdDiOutput[1::2] = dis[0]
                             apdDiOutput[2::2] = apds[0]
@@ -425,40 +453,25 @@ class MultipleFilesWindow(QDialog):
             if self.saveAs.currentIndex() == 0:
                 if s2:
                     print("Saving file:", savedFilename + "_odd.signal")
-                    with open(savedFilename + "_odd.signal", "wb") as f:
-                        signal.base_data = signal.transformed_data
-                        # empty these copies to save space
-                        signal.transformed_data = None
-                        signal.previous_transform = None
-                        pickle.dump(signal, f)
+                    save_signal(signal, savedFilename + "_odd.signal")
                     print("Saving file:", savedFilename + "_even.signal")
-                    with open(savedFilename + "_even.signal", "wb") as f:
-                        signal_2.base_data = signal_2.transformed_data
-                        # empty these copies to save space
-                        signal_2.transformed_data = None
-                        signal_2.previous_transform = None
-                        pickle.dump(signal_2, f)
+                    save_signal(signal_2, savedFilename + "_even.signal")
                 else:
                     print("Saving file:", savedFilename + ".signal")
-                    with open(savedFilename + ".signal", "wb") as f:
-                        signal.base_data = signal.transformed_data
-                        # empty these copies to save space
-                        signal.transformed_data = None
-                        signal.previous_transform = None
-                        pickle.dump(signal, f)
+                    save_signal(signal, savedFilename + ".signal")
             # save as .mat
             else:
                 if s2:
                     print("Saving file:", savedFilename + "_odd.mat")
                     scipy.io.savemat(savedFilename + "_odd.mat", 
-                                     {'data': signal.transformed_data})
+                                     {'data': np.asarray(signal.transformed_data, dtype=np.float32)})
                     print("Saving file:", savedFilename + "_even.mat")
                     scipy.io.savemat(savedFilename + "_even.mat", 
-                                     {'data': signal_2.transformed_data})
+                                     {'data': np.asarray(signal_2.transformed_data, dtype=np.float32)})
                 else:
                     print("Saving file:", savedFilename + ".mat")
                     scipy.io.savemat(savedFilename + ".mat", 
-                                     {'data': signal.transformed_data})
+                                     {'data': np.asarray(signal.transformed_data, dtype=np.float32)})
             file_item.status.setText("Done!")
             self.repaint()
 
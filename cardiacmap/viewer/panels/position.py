@@ -40,8 +40,6 @@ SPINBOX_STYLE = """QSpinBox
                 right: 0px;
             }"""
 
-IMAGE_SIZE = 128
-INITIAL_POSITION = (64, 64)
 POSITION_MARKER_SIZE = 5
 VIEWPORT_MARGIN = 2
 
@@ -107,9 +105,10 @@ class PositionView(QWidget):
         self.image_view.view.enableAutoRange(enable=True)
         self.image_view.view.setMouseEnabled(False, False)
 
+        height, width = self.parent.signal.frame_shape
         self.image_view.view.setRange(
-            xRange=(-VIEWPORT_MARGIN, IMAGE_SIZE + VIEWPORT_MARGIN),
-            yRange=(-VIEWPORT_MARGIN, IMAGE_SIZE + VIEWPORT_MARGIN),
+            xRange=(-VIEWPORT_MARGIN, height + VIEWPORT_MARGIN),
+            yRange=(-VIEWPORT_MARGIN, width + VIEWPORT_MARGIN),
         )
 
         # Hide UI stuff not needed
@@ -122,7 +121,7 @@ class PositionView(QWidget):
 
         # Draggable posiiton marker
         self.position_marker = pg.ScatterPlotItem(
-            pos=[INITIAL_POSITION],
+            pos=[[self.parent.x, self.parent.y]],
             size=POSITION_MARKER_SIZE,
             pen=pg.mkPen("r"),
             brush=pg.mkBrush("r"),
@@ -182,11 +181,12 @@ class PositionView(QWidget):
         self.show_marker.setChecked(True)
         self.show_marker.stateChanged.connect(self.toggle_marker)
 
+        height, width = self.parent.signal.frame_shape
         self.x_box = Spinbox(
-            min=0, max=127, val=64, min_width=50, max_width=50, step=1
+            min=0, max=height - 1, val=self.parent.x, min_width=50, max_width=50, step=1
         )
         self.y_box = Spinbox(
-            min=0, max=127, val=64, min_width=50, max_width=50, step=1
+            min=0, max=width - 1, val=self.parent.y, min_width=50, max_width=50, step=1
         )
             
         self.x_box.valueChanged.connect(self.update_position_boxes)
@@ -216,8 +216,9 @@ class PositionView(QWidget):
 
     def update_position(self, x, y):
 
-        y = np.clip(y, 0, IMAGE_SIZE - 1)
-        x = np.clip(x, 0, IMAGE_SIZE - 1)
+        height, width = self.parent.signal.frame_shape
+        y = np.clip(y, 0, width - 1)
+        x = np.clip(x, 0, height - 1)
 
         self.update_marker(x, y)
         self.parent.x = x
@@ -253,13 +254,15 @@ class PositionView(QWidget):
 
     def update_data(self):
         mode = self.data_select.currentText() or "Base"
-        mask = np.ones((self.parent.signal.span_X, self.parent.signal.span_X))
+        mask = np.ones(self.parent.signal.frame_shape)
         if self.parent.signal.mask is not None:
             mask = self.parent.signal.mask
             #print(mask)
         if mode == "Base":
             self.image_view.setImage(
-                self.parent.signal.image_data * mask, autoLevels=True, autoRange=True
+                # keep the product in the image's own (half precision) dtype
+                self.parent.signal.image_data * mask.astype(self.parent.signal.image_data.dtype),
+                autoLevels=True, autoRange=True,
             )
         elif mode == "Transformed":
             self.image_view.setImage(
@@ -121,6 +121,9 @@ class SignalPanel(QWidget):
         self.baseline_data.scatter.setData(brush=self.pt_brush, tip=self.point_hover_tooltip, hoverable=True)
         self.baseline_data.setSymbolBrush(self.pt_brush)
         
+        # trace of the selected pixel as a transform being edited would leave it
+        self.preview_data: pg.PlotDataItem = self.plot.plot(pen=self.preview_pen)
+
         self.apd_data: pg.PlotDataItem = self.plot.plot(pen=self.apd_pen, symbol="o")
         self.apd_data.scatter.setData(brush=self.pt_brush, tip=self.point_hover_tooltip, hoverable=True)
         self.apd_data.setSymbolBrush(self.pt_brush)
@@ -190,6 +193,7 @@ class SignalPanel(QWidget):
         # set up colors
         self.sig_pen = pg.mkPen(self.colors['signal'], width=thickness)
         self.sig2_pen = pg.mkPen(self.colors['signal 2'], width=thickness)
+        self.preview_pen = pg.mkPen(self.colors['signal'], width=thickness, style=Qt.PenStyle.DashLine)
         self.apd_pen = pg.mkPen(self.colors['apd'], width=thickness)
         self.base_pen = pg.mkPen(self.colors['baseline'], width=thickness)
         self.pt_brush = pg.mkBrush(self.colors['points'])
@@ -210,21 +214,28 @@ class SignalPanel(QWidget):
         self.undo = QAction(text="Undo", parent=self)
         self.undo.setToolTip("Undo Last Action")
 
+        self.redo = QAction(text="Redo", parent=self)
+        self.redo.setToolTip("Redo Last Undone Action")
+
         invert = QAction("Invert", self)
 
         time_average = ParameterButton(
-            "Time Average", self.settings.child("Time Average")
+            "Time Average", self.settings.child("Time Average"),
+            preview=partial(self.parent.preview_transform, "time_average")
         )
         butterworth = ParameterButton(
-            "Butterworth Filter", self.settings.child("Butterworth Filter")
+            "Butterworth Filter", self.settings.child("Butterworth Filter"),
+            preview=partial(self.parent.preview_transform, "butterworth")
         )
 
         spatial_average = ParameterButton(
-            "Spatial Average", self.settings.child("Spatial Average")
+            "Spatial Average", self.settings.child("Spatial Average"),
+            preview=partial(self.parent.preview_transform, "spatial_average")
         )
         
         normalize = ParameterButton(
-            "Normalize", self.settings.child("Normalize")
+            "Normalize", self.settings.child("Normalize"),
+            preview=partial(self.parent.preview_transform, "normalize")
         )
         trim = QAction("Trim", self)
 
@@ -257,6 +268,9 @@ class SignalPanel(QWidget):
         self.undo.triggered.connect(
             partial(self.parent.signal_transform, transform="undo")
         )
+        self.redo.triggered.connect(
+            partial(self.parent.signal_transform, transform="redo")
+        )
 
         self.reset.triggered.connect(
             partial(self.parent.signal_transform, transform="reset")
@@ -303,6 +317,7 @@ class SignalPanel(QWidget):
 
         self.transform_bar.addAction(self.reset)
         self.transform_bar.addAction(self.undo)
+        self.transform_bar.addAction(self.redo)
         self.transform_bar.addAction(invert)
         self.transform_bar.addAction(trim)
         self.transform_bar.addWidget(normalize)
@@ -346,7 +361,7 @@ class SignalPanel(QWidget):
         self.plotting_bar.addWidget(self.show_range_marker)
 
         # Add spinbox for start and end ranges
-        dl = len(self.parent.signal.transformed_data) * 2
+        dl = self.parent.signal.frame_count * 2
         self.start_spinbox = Spinbox(1, dl, 0, min_width=40, max_width=80)
         self.end_spinbox = Spinbox(1, dl, dl, min_width=40, max_width=80)
         self.start_spinbox.valueChanged.connect(self.update_range_spinbox)
@@ -377,7 +392,7 @@ class SignalPanel(QWidget):
     def update_range_spinbox(self):
         start = int(self.start_spinbox.value())
         end = int(self.end_spinbox.value())
-        maxRange = int(self.ms_per_frame.value() * len(self.parent.signal.transformed_data))
+        maxRange = int(self.ms_per_frame.value() * self.parent.signal.frame_count)
         self.start_spinbox.resetMax(maxRange)
         self.end_spinbox.resetMax(maxRange)
         
@@ -448,6 +463,8 @@ class SignalPanel(QWidget):
             if c == "signal":
                 self.sig_pen.setColor(self.colors[c])
                 self.sig_pen.setWidth(self.thickness)
+                self.preview_pen.setColor(self.colors[c])
+                self.preview_pen.setWidth(self.thickness)
             elif c == "baseline":
                 self.base_pen.setColor(self.colors[c])
                 self.base_pen.setWidth(self.thickness)
@@ -66,9 +66,6 @@ SPINBOX_STYLE = """QSpinBox
                 right: 0px;
             }"""
 
-IMAGE_SIZE = 128
-
-
 class DraggablePlot(pg.PlotItem):
 
     # Draggable PlotItem that takes in a callback function.
@@ -123,8 +120,9 @@ class StackingPositionView(QWidget):
         self.image_view.view.enableAutoRange(enable=True)
         self.image_view.view.setMouseEnabled(False, False)
 
+        height, width = self.image_data.shape
         self.image_view.view.setRange(
-            xRange=(-2, IMAGE_SIZE + 2), yRange=(-2, IMAGE_SIZE + 2)
+            xRange=(-2, height + 2), yRange=(-2, width + 2)
         )
 
         # Hide UI stuff not needed
@@ -141,7 +139,7 @@ class StackingPositionView(QWidget):
         # Draggable Red Dot
         # Add posiiton marker
         self.position_marker = pg.ScatterPlotItem(
-            pos=[[64, 64]], size=5, pen=pg.mkPen("r"), brush=pg.mkBrush("r")
+            pos=[[self.parent.x, self.parent.y]], size=5, pen=pg.mkPen("r"), brush=pg.mkBrush("r")
         )
 
         self.image_view.getView().addItem(self.position_marker)
@@ -154,11 +152,12 @@ class StackingPositionView(QWidget):
         self.show_marker.stateChanged.connect(self.toggle_marker)
         
         self.px_bar = QToolBar()
+        height, width = self.image_data.shape
         self.x_box = Spinbox(
-            min=0, max=127, val=64, min_width=50, max_width=50, step=1
+            min=0, max=height - 1, val=self.parent.x, min_width=50, max_width=50, step=1
         )
         self.y_box = Spinbox(
-            min=0, max=127, val=64, min_width=50, max_width=50, step=1
+            min=0, max=width - 1, val=self.parent.y, min_width=50, max_width=50, step=1
         )
             
         self.x_box.valueChanged.connect(self.update_position_boxes)
@@ -171,8 +170,9 @@ class StackingPositionView(QWidget):
 
     def update_position(self, x, y):
 
-        y = np.clip(y, 0, IMAGE_SIZE - 1)
-        x = np.clip(x, 0, IMAGE_SIZE - 1)
+        height, width = self.image_data.shape
+        y = np.clip(y, 0, width - 1)
+        x = np.clip(x, 0, height - 1)
 
         self.update_marker(x, y)
         self.parent.x = x
@@ -219,8 +219,7 @@ class StackingWindow(QMainWindow):
         self.mask = parent.signal.mask
         self.setWindowTitle("Stacking")
         
-        self.x = 64
-        self.y = 64
+        self.x, self.y = parent.signal.center
 
         #        image, stack,
 
@@ -425,14 +424,14 @@ class StackingWindow(QMainWindow):
     def update_signal_plot(self):
         if self.stack is not None:
             self.stack_tab.signal_data.setData(
-                x=self.xVals, y=self.stack[:, self.x, self.y] # stacking results are transposed
+                x=self.xVals, y=self.stack[:, self.x, self.y] # laid out as transformed_data
             )
             
         start = int(self.start_time.value()//self.ms)
         end = int(self.end_time.value()//self.ms)
 
         # transformed data preview
-        self.preview = self.parent.signal.transformed_data[start:end, self.y, self.x]
+        self.preview = self.parent.signal.transformed_region[start:end, self.x, self.y]
         self.preview_tab.signal_data.setData(x=np.arange(len(self.preview))* int(self.ms), y=self.preview)
 
         # raw data preview
@@ -441,7 +440,7 @@ class StackingWindow(QMainWindow):
             f = 1
             if self.parent.signal.inverted:
                 f = -1
-            self.preview_base = NormalizeData(f * self.parent.signal.base_data[start:end, self.y, self.x])
+            self.preview_base = NormalizeData(f * self.parent.signal.base_data[start:end, self.x, self.y].astype(np.float32))
             self.preview_tab.signal2_data.setData(x=np.arange(len(self.preview_base))* int(self.ms), y=self.preview_base)
         else:
             self.preview_tab.signal2_data.setData()
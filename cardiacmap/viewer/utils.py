@@ -96,7 +96,37 @@ DEFAULT_VALUES = {
     "Normalize": [
         {"name": "Auto", "type": "bool", "value": True},
         {"name": "Mode", "type": "list", "value": "Pixel", "limits": ["Global", "Pixel"]},
-    ]
+    ],
+    "Load Options": [
+        {"name": "Binning", "type": "int", "value": 1, "limits": (1, 16)},
+        {"name": "Decimation", "type": "int", "value": 1, "limits": (1, 100)},
+        {"name": "X Start", "type": "int", "value": 0, "limits": (0, 100000)},
+        {"name": "X End", "type": "int", "value": -1, "limits": (-1, 100000)},
+        {"name": "Y Start", "type": "int", "value": 0, "limits": (0, 100000)},
+        {"name": "Y End", "type": "int", "value": -1, "limits": (-1, 100000)},
+        {"name": "Dark Frame", "type": "str", "value": ""},
+        {"name": "Flat Field", "type": "str", "value": ""},
+        {"name": "Flat Field from Background", "type": "bool", "value": False},
+    ],
+    "Undo History": [
+        {"name": "Memory Budget (MB)", "type": "int", "value": 1024, "limits": (0, 1000000)},
+    ],
+    "Mask": [
+        {"name": "Store Masked Pixels Only", "type": "bool", "value": False},
+    ],
+    "Autosave": [
+        {"name": "Enabled", "type": "bool", "value": True},
+        {"name": "Interval (s)", "type": "int", "value": 120, "limits": (10, 86400)},
+        {"name": "Folder", "type": "str", "value": "./autosave"},
+    ],
+    "Precision": [
+        {
+            "name": "Working Data",
+            "type": "list",
+            "value": "float32",
+            "limits": ["float16", "float32", "float64"],
+        },
+    ],
 }
 
 
@@ -1,7 +1,5 @@
 import os
-import pickle
 import sys
-import copy
 from functools import partial
 from typing import List, Literal, Optional
 import numpy as np
@@ -39,10 +37,9 @@ from PySide6.QtWidgets import (
     QLineEdit,
 )
 
-from cardiacmap.model.cascade import load_cascade_file
-from cardiacmap.model.scimedia import load_scimedia_data
-from cardiacmap.model.sql import load_sql_file
-from cardiacmap.model.mkv import load_mkv_file
+from cardiacmap.model.container import save_signal
+from cardiacmap.model.session import SESSION_SUFFIX, Autosave
+from cardiacmap.model import pipeline
 from cardiacmap.model.data import CardiacSignal
 
 from cardiacmap.viewer.panels import (
@@ -57,7 +54,11 @@ from cardiacmap.viewer.panels import (
     SignalPanel,
     StackingWindow,
 )
-from cardiacmap.viewer.components import FrameInputDialog, LargeFilePopUp
+from cardiacmap.model.load_options import load_options_from_settings
+from cardiacmap.model.npy import SIGNAL_LAYOUT
+from cardiacmap.model.sidecar import read_sidecar, write_sidecar
+from cardiacmap.viewer.components import LoadingPanel, RawLayoutPopUp
+from cardiacmap.viewer.loader import FileLoader
 from cardiacmap.viewer.utils import load_settings, loading_popup, save_settings
 from cardiacmap.viewer.export import ExportVideoWindow, ImportExportDirectories
 
@@ -71,7 +72,6 @@ padding-left: 10px;
 padding-top: 4px;
 }
 """
-INITIAL_POSITION = (64, 64)
 WIDTH_SCALE = 0.6
 HEIGHT_SCALE = 0.4
 
@@ -105,7 +105,22 @@ class CardiacMap(QMainWindow):
 
         self.signal = signal
 
-        self.default_widget = QWidget()
+        # Background file loader, while a file is loading into this window
+        self.loader: Optional[FileLoader] = None
+        # Other windows opened from this one, kept here so they aren't garbage collected
+        self.viewers: List[CardiacMap] = []
+
+        # Background saves of the signal to its session file, see autosave
+        self.autosave_timer = QtCore.QTimer(self)
+        self.autosave_timer.timeout.connect(self.autosave)
+        self.autosaver: Optional[Autosave] = None
+
+        self.default_widget = self._create_default_widget()
+
+        self.init_viewer()
+
+    def _create_default_widget(self):
+        default_widget = QWidget()
         layout = QHBoxLayout()
         layout.addStretch()
         layout.addWidget(
@@ -114,10 +129,9 @@ class CardiacMap(QMainWindow):
             )
         )
         layout.addStretch()
-        self.default_widget.setLayout(layout)
-        self.default_widget.setStyleSheet("QLabel {font-size:20px; }")
-
-        self.init_viewer()
+        default_widget.setLayout(layout)
+        default_widget.setStyleSheet("QLabel {font-size:20px; }")
+        return default_widget
 
     def init_menu(self):
 
@@ -151,6 +165,9 @@ class CardiacMap(QMainWindow):
         self.save_signal = QAction("Save Signal Object")
         self.save_signal.triggered.connect(self.save_preprocessed)
 
+        self.restore_session = QAction("Restore Autosaved Session")
+        self.restore_session.triggered.connect(self.load_session)
+
         self.export_vid = QAction("Export Video")
         self.export_vid.triggered.connect(self.create_export_window)
         
@@ -162,6 +179,7 @@ class CardiacMap(QMainWindow):
 
         self.file_menu.addAction(self.load_voltage)
         self.file_menu.addAction(self.load_calcium)
+        self.file_menu.addAction(self.restore_session)
         self.file_menu.addSeparator()
         self.file_menu.addAction(self.save_signal)
         self.file_menu.addSeparator()
@@ -206,7 +224,10 @@ class CardiacMap(QMainWindow):
 
         if self.signal is not None:
 
-            self.x, self.y = INITIAL_POSITION
+            self.x, self.y = self.signal.center
+
+            # transform whose parameters are being edited, previewed on the signal plot
+            self.previewed_transform = None
 
             self.metadata_panel = MetadataPanel(self.signal, self)
 
@@ -250,6 +271,9 @@ class CardiacMap(QMainWindow):
             self.default_widget.setVisible(False)
             self._disable_menus(False)
 
+            self.autosaver = None
+            self.autosave_timer.start(self.settings.child("Autosave").child("Interval (s)").value() * 1000)
+
             self.resizeDocks(
                 [self.image_dock, self.signal_dock],
                 [500, 2500],
@@ -287,83 +311,117 @@ class CardiacMap(QMainWindow):
 
     def load_file(self, calcium_mode: bool):
         dirs = ImportExportDirectories() # get import directory
-        filepath = QFileDialog.getOpenFileName(
+        filepaths = QFileDialog.getOpenFileNames(
             self,
             "Load File",
             dirs.importDir,
-            "All Files (*);;Cascade File (*.dat);;SciMedia CMOS File(*.gsd);;MKV File (*.mkv);;MATLAB File (*.mat);;CardiacMap Signal (*.signal)",
+            "All Files (*);;Cascade File (*.dat);;SciMedia CMOS File(*.gsd);;SQLite Frame Store (*.sql);;MKV File (*.mkv);;TIFF Stack (*.tif *.tiff);;Raw Binary (*.raw *.bin);;NumPy Array (*.npy *.npz);;MATLAB File (*.mat);;CardiacMap Signal (*.signal)",
         )[0]
 
-        if filepath:
+        if filepaths:
             # update import directory
-            dirs.importDir = filepath[:filepath.rindex("/") + 1]
+            dirs.importDir = filepaths[0][:filepaths[0].rindex("/") + 1]
             dirs.SaveDirectories()
-            if ".dat" in filepath:
+            for filepath in filepaths:
                 self._load_signal(filepath, calcium_mode=calcium_mode)
 
-            elif ".sql" in filepath:
-                self._load_signal(filepath, calcium_mode=calcium_mode, mode="sql")
-
-            elif ".gsd" in filepath:
-                self._load_signal(filepath, calcium_mode=calcium_mode, mode="gsd")
-
-            elif ".mkv" in filepath:
-                self._load_signal(filepath, calcium_mode=calcium_mode, mode="mkv")
-
-            elif ".mat" in filepath:
-                data = scipy.io.loadmat(filepath)["data"]
-                data = np.transpose(data, axes=(0,2, 1))
-                emptyMetadata = {"span_T": 0, "span_X": 0, "span_Y": 0, 
-                                    "file_metadata": 0, "datetime": 0, "framerate": 0, 
-                                    "filename": os.path.split(filepath)[-1]}
-                signal = CardiacSignal(signal=data, metadata=emptyMetadata, channel="Single")
-                self.create_viewer(signal, os.path.split(filepath)[-1])
-
-            elif ".signal" in filepath:
-                with open(filepath, "rb") as f:
-                    signal = pickle.load(f)
-                    if signal.transformed_data is None:
-                        # repopulate data fields
-                        signal.transformed_data = signal.base_data
-                        signal.previous_transform = signal.base_data
-                self.create_viewer(signal, os.path.split(filepath)[-1])
-
-    def _load_signal(
-        self,
-        filepath,
-        calcium_mode: bool,
-        mode: Literal["dat", "gsd", "sql", "mkv"] = "dat",
-        update_progress=None,
-    ):
-
-        filename = os.path.split(filepath)[-1]
-
-        if mode == "dat":
-            signals = load_cascade_file(filepath, LargeFilePopUp, dual_mode=calcium_mode)
-        elif mode == "gsd":
-            signals = load_scimedia_data(filepath, LargeFilePopUp)
-        elif mode == "sql":
-            signals = load_sql_file(filepath, LargeFilePopUp)
-        elif mode == "mkv":
-             signals = load_mkv_file(filepath)
-
-        if signals:
-
-            if calcium_mode:
-
-                signal_odd: CardiacSignal = signals[0]
-                signal_even: CardiacSignal = signals[1]
-
-                print(signal_odd.signal_name)
+    def _load_signal(self, filepath, calcium_mode: bool):
+        """Load a file in the background. The file goes into this window if it is empty,
+        otherwise into a new window, so several files can load at once."""
+        if os.path.splitext(filepath)[1].lower() in (".raw", ".bin") and read_sidecar(filepath) is None:
+            # raw files carry no header, so ask for the layout and keep it in a sidecar
+            layout = RawLayoutPopUp(os.path.split(filepath)[-1])
+            if layout is None:
+                return
+            write_sidecar(filepath, layout)
+
+        if self.signal is None and self.loader is None:
+            viewer = self
+        else:
+            viewer = CardiacMap()
+            self.viewers.append(viewer)
+            viewer.show()
 
-                for signal, suffix in [(signal_odd, "_odd"), (signal_even, "_even")]:
-                    self.create_viewer(signal, filename + suffix)
+        viewer.start_loading(filepath, calcium_mode)
+
+    def start_loading(self, filepath, calcium_mode: bool):
+        """Show a loading panel and start loading filepath on a worker thread. The panel
+        fills in with metadata and a preview of the first frames, and the viewer is
+        created once the signal is ready."""
+        self.title = os.path.split(filepath)[-1]
+        self.setWindowTitle(self.title + " – VizCOM")
+
+        self.loader = FileLoader(filepath, calcium_mode, load_options_from_settings(self.settings), self)
+        self.default_widget = LoadingPanel(self.title, self.cancel_loading)
+        self.setCentralWidget(self.default_widget)
+
+        self.loader.preview.connect(self.default_widget.set_preview)
+        self.loader.progress.connect(self.default_widget.set_progress)
+        self.loader.finished.connect(self._loading_finished)
+        self.loader.failed.connect(self._loading_failed)
+        self.loader.cancelled.connect(self._reset_loading)
+        self.loader.start()
+
+    def cancel_loading(self):
+        if self.loader is not None:
+            self.loader.cancel()
+            self.default_widget.set_cancelling()
+
+    def _loading_finished(self, signals):
+        self.loader = None
+        if not signals:
+            self._loading_failed("No data was read from the file.")
+            return
+
+        filename = self.title
+        self.title = ""
+        for signal in signals.values():
+            if signal.channel == "Single":
+                self.create_viewer(signal, filename)
             else:
-                signal = signals[0]
+                self.create_viewer(signal, filename + "_" + signal.channel.lower())
 
-                self.create_viewer(signal, filename)
+    def _loading_failed(self, message):
+        QMessageBox.warning(self, "Error", f"There was an Error loading {self.title}:\n{message}")
+        self._reset_loading()
 
-        else: print("There was an Error loading that file.")
+    def _reset_loading(self):
+        self.loader = None
+        self.title = ""
+        self.default_widget = self._create_default_widget()
+        self.init_viewer()
+
+    def closeEvent(self, event):
+        self.cancel_loading()
+        self.autosave_timer.stop()
+        if self.autosaver is not None:
+            # an interrupted save leaves the previous one in place, so don't wait long
+            self.autosaver.wait(timeout=5)
+        super().closeEvent(event)
+
+    def autosave(self):
+        """Save what changed in the signal since the last autosave to its session file,
+        on a background thread. Runs on a timer."""
+        params = self.settings.child("Autosave")
+        self.autosave_timer.setInterval(params.child("Interval (s)").value() * 1000)
+        if self.signal is None or not params.child("Enabled").value():
+            return
+        folder = params.child("Folder").value()
+        if self.autosaver is None or os.path.dirname(self.autosaver.filepath) != os.path.normpath(folder):
+            self.autosaver = Autosave(self.signal, folder)
+        self.autosaver.request()
+
+    def load_session(self):
+        """Open an autosaved session. Its data is read from the session file as needed."""
+        folder = self.settings.child("Autosave").child("Folder").value()
+        filepath, _ = QFileDialog.getOpenFileName(
+            self,
+            "Restore Autosaved Session",
+            folder,
+            f"Autosaved Session (*{SESSION_SUFFIX});;All Files (*)",
+        )
+        if filepath:
+            self._load_signal(filepath, calcium_mode=False)
 
     def save_preprocessed(self):
         dirs = ImportExportDirectories() # get import directory
@@ -377,14 +435,7 @@ class CardiacMap(QMainWindow):
             # update import directory
             dirs.exportDir = filepath[:filepath.rindex("/") + 1]
             dirs.SaveDirectories()
-            with open(filepath, "wb") as f:
-                #print(self.signal.transformed_data)
-                signal_copy = copy.deepcopy(self.signal)
-                signal_copy.base_data = signal_copy.transformed_data
-                # empty these copies to save space
-                signal_copy.transformed_data = None
-                signal_copy.previous_transform = None
-                pickle.dump(signal_copy, f)
+            save_signal(self.signal, filepath)
             
     def export_numpy(self):
         start_frame = self.signal_panel.start_frame
@@ -401,7 +452,14 @@ class CardiacMap(QMainWindow):
             # update import directory
             dirs.exportDir = filepath[:filepath.rindex("/") + 1]
             dirs.SaveDirectories()
-            np.save(filepath, self.signal.transformed_data[start_frame:end_frame])
+            # float32, also before the first transform, while this is the recording's own data
+            data = np.asarray(self.signal.transformed_data[start_frame:end_frame], dtype=np.float32)
+            np.save(filepath, data)
+            # keep the metadata next to the array, so it survives reopening the file
+            write_sidecar(
+                filepath,
+                dict(self.signal.metadata, span_T=len(data), layout=SIGNAL_LAYOUT, start_frame=start_frame),
+            )
         
     def export_matlab(self):
         start_frame = self.signal_panel.start_frame
@@ -418,7 +476,7 @@ class CardiacMap(QMainWindow):
             # update export directory
             dirs.exportDir = filepath[:filepath.rindex("/") + 1]
             dirs.SaveDirectories()
-            scipy.io.savemat(filepath, {'data': self.signal.transformed_data[start_frame:end_frame]})
+            scipy.io.savemat(filepath, {'data': np.asarray(self.signal.transformed_data[start_frame:end_frame], dtype=np.float32)})
 
     # TODO: Fix scroll / header issue here
     def load_help(self):
@@ -465,6 +523,7 @@ class CardiacMap(QMainWindow):
 
         if self.signal:
             viewer = CardiacMap(signal, title)
+            self.viewers.append(viewer)
             viewer.show()
 
         else:
@@ -493,7 +552,7 @@ class CardiacMap(QMainWindow):
         self.position_tab.image_view.setCurrentIndex(idx)
 
     def update_signal_plot(self):
-        signal_data = self.signal.transformed_data[:, self.x, self.y]
+        signal_data = self.signal.transformed_region[:, self.x, self.y]
 
         xs = self.xVals[0 : len(signal_data)]  # ensure len(xs) == len(signal_data)
         self.signal_panel.signal_data.setData(x=xs, y=signal_data)
@@ -504,6 +563,8 @@ class CardiacMap(QMainWindow):
 
         self.start_frame_offset = self.signal_panel.start_spinbox.value() * self.ms
 
+        self.update_preview()
+
         if self.signal.show_baseline:
             self.signal_panel.show_baseline()
         else:
@@ -521,6 +582,58 @@ class CardiacMap(QMainWindow):
         else:
             self.signal_panel.apd_data.setData()
 
+    def preview_transform(self, transform, show=True):
+        """Preview `transform` with the current settings on the selected pixel, while its
+        parameters are being edited"""
+        self.previewed_transform = transform if show else None
+        self.update_preview()
+
+    def update_preview(self):
+        if self.previewed_transform is None:
+            self.signal_panel.preview_data.setData()
+            return
+        ops = self._preview_ops(
+            self.previewed_transform, self.signal_panel.start_frame, self.signal_panel.end_frame
+        )
+        signal_data = self.signal.preview(ops, self.x, self.y)
+        xs = self.xVals[0 : len(signal_data)]
+        self.signal_panel.preview_data.setData(x=xs, y=signal_data)
+
+    def _preview_ops(self, transform, start_frame, end_frame):
+        # the pipeline operations signal_transform would record for `transform`
+        start = start_frame or 0
+        end = end_frame or self.signal.frame_count - 1
+        normalize_global = self.settings.child("Normalize").child("Mode").value() == "Global"
+        ops = []
+        if transform in ("spatial_average", "time_average"):
+            params = self.settings.child("Spatial Average" if transform == "spatial_average" else "Time Average")
+            ops.append(
+                pipeline.Average(
+                    transform.split("_")[0],
+                    params.child("Sigma").value(),
+                    params.child("Radius").value(),
+                    params.child("Mode").value(),
+                    start,
+                    end,
+                    self.signal.mask,
+                )
+            )
+        elif transform == "butterworth":
+            params = self.settings.child("Butterworth Filter")
+            ops.append(
+                pipeline.Butterworth(
+                    params.child("Order").value(),
+                    params.child("Low Cutoff").value(),
+                    params.child("High Cutoff").value(),
+                    self.ms,
+                )
+            )
+            return ops
+
+        if transform == "normalize" or self.settings.child("Normalize").child("Auto").value():
+            ops.append(pipeline.Normalize(normalize_global, start, end_frame or self.signal.frame_count))
+        return ops
+
     def ms_changed(self):
         self.ms = self.signal_panel.ms_per_frame.value()
         self.xVals = np.arange(0, self.ms * self.signal.span_T, self.ms)
@@ -532,7 +645,8 @@ class CardiacMap(QMainWindow):
     def signal_transform(
         self,
         transform: Literal[
-            "spatial_average", "time_average", "butterworth", "trim", "normalize", "reset", "invert"
+            "spatial_average", "time_average", "butterworth", "trim", "normalize", "reset",
+            "invert", "undo", "redo",
         ],
         update_progress=None,
     ):
@@ -543,6 +657,19 @@ class CardiacMap(QMainWindow):
             # print(update_progress)
             # print("progres update?")
             update_progress(0.1)
+
+        history = self.signal.history
+        history.budget = self.settings.child("Undo History").child("Memory Budget (MB)").value() * 2**20
+        # a transform and the normalize that may follow it are undone together
+        with history.grouped():
+            if transform not in ("reset", "undo", "redo"):
+                self.signal.set_precision(self.settings.child("Precision").child("Working Data").value())
+            self._apply_transform(transform, start_frame, end_frame, update_progress)
+
+        self.update_signal_plot()
+        self.position_tab.update_data()
+
+    def _apply_transform(self, transform, start_frame, end_frame, update_progress=None):
         # Calls a transform function within the signal item
         if transform == "spatial_average":
             sigma = self.settings.child("Spatial Average").child("Sigma").value()
@@ -588,13 +715,13 @@ class CardiacMap(QMainWindow):
             
         elif transform == "trim":
             left = start_frame
-            right = max(len(self.signal.transformed_data) - end_frame, 1)
+            right = max(self.signal.frame_count - end_frame, 1)
             print("Trim Left", left, "Trim Right", right)
             self.signal.trim_data(startTrim=left, endTrim=right)
             if (self.settings.child("Normalize").child("Auto").value()):
                     normalize_global = self.settings.child("Normalize").child("Mode").value()
                     normalize_global = True if normalize_global == "Global" else False
-                    self.signal.normalize(start=0, end=len(self.signal.transformed_data), normalize_global=normalize_global)
+                    self.signal.normalize(start=0, end=self.signal.frame_count, normalize_global=normalize_global)
             
         elif transform == "normalize":
             normalize_global = self.settings.child("Normalize").child("Mode").value()
@@ -606,14 +733,15 @@ class CardiacMap(QMainWindow):
         elif transform == "undo":
             self.signal.undo()
 
+        elif transform == "redo":
+            self.signal.redo()
+
         elif transform == "invert":
             self.signal.invert_data()
             if (self.settings.child("Normalize").child("Auto").value()):
                 normalize_global = self.settings.child("Normalize").child("Mode").value()
                 normalize_global = True if normalize_global == "Global" else False
                 self.signal.normalize(start=start_frame, end=end_frame, normalize_global=normalize_global)
-        self.update_signal_plot()
-        self.position_tab.update_data()
 
     # @loading_popup
     def calculate_baseline_drift(
@@ -642,13 +770,15 @@ class CardiacMap(QMainWindow):
             self.signal.show_baseline = True
         else:
             if action == "confirm":
-                self.signal.remove_baseline(
-                    params, peaks=False, start=start_frame, end=end_frame
-                )
-                if (self.settings.child("Normalize").child("Auto").value()):
-                    normalize_global = self.settings.child("Normalize").child("Mode").value()
-                    normalize_global = True if normalize_global == "Global" else False
-                    self.signal.normalize(start=start_frame, end=end_frame, normalize_global=normalize_global)
+                # the baseline removal and the normalize that may follow it are undone together
+                with self.signal.history.grouped():
+                    self.signal.remove_baseline(
+                        params, peaks=False, start=start_frame, end=end_frame
+                    )
+                    if (self.settings.child("Normalize").child("Auto").value()):
+                        normalize_global = self.settings.child("Normalize").child("Mode").value()
+                        normalize_global = True if normalize_global == "Global" else False
+                        self.signal.normalize(start=start_frame, end=end_frame, normalize_global=normalize_global)
 
             self.signal_panel.show_baseline(0)
             self.signal.reset_baseline()
@@ -1,101 +1,123 @@
-### Simple parser script for .dat format. Writes locally to the same directory as a binary file
+### Bulk converter for cascade .dat files. Writes each recording as a .npy array plus a .json header sidecar
+###
+### Run from the repository root as a module, so the cardiacmap package is found without
+### installing it (only numpy and psutil are needed, no Qt):
+###     python -m scripts.cascade_parser recordings/ -o converted/ -r
 
 import argparse
-import io
-import pickle
-import struct
+import concurrent.futures as cf
+import os
 
 import numpy as np
 
-CHUNK_SIZE = 100000
+from cardiacmap.model.cascade import map_cascade_frames, read_cascade_header
+from cardiacmap.model.sidecar import write_sidecar
 
+CHUNK_SIZE = 1024
 
-def cascade_import(filepath: str):
-    """Main function to import cascade .DAT files.
+
+def cascade_import(filepath: str, output_dir: str = None, chunk_frames: int = CHUNK_SIZE, overwrite: bool = False):
+    """Convert a single cascade .DAT file. Frames are read through a memory map and copied
+    into the output .npy chunk by chunk, so memory use stays at one chunk regardless of
+    the file size.
 
     Args:
         filepath (str): path to file to be converted
-        format (str): which format to save / return the file in. Can be "binary" or "pickle"
-        save (bool, optional): Whether to save the file locally. Defaults to True.
+        output_dir (str, optional): directory to write to. Defaults to the input file's directory.
+        chunk_frames (int): number of frames copied at a time
+        overwrite (bool): whether to replace existing output files
+
+    Returns:
+        output_path (str): path of the written .npy, or None if it was skipped
     """
-    """Main function to import cascade .DAT files"""
+    output_dir = output_dir or os.path.dirname(filepath)
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    output_path = os.path.join(output_dir, name + ".npy")
 
-    filename = filepath.split(".")[-2]
+    if os.path.exists(output_path) and not overwrite:
+        return None
 
     with open(filepath, "rb") as file:
-
-        endian = "<"
-
-        # First byte of the data is the file version
-        file_version = file.read(1).decode()
-
-        if file_version == "d":
-            # TODO: Version D needs testing
-            header = file.read(1023)
-
-            # In the original code, it reads 17 + 7 bytes of datetime.
-            datetime = header.pop(24).decode().rstrip("\x00")
-
-            file.read(8)
-            framerate = struct.unpack(endian + "I", file.read(4))[0] / 100
-
-            span_T = struct.unpack(endian + "I", file.read(4))[0]
-            span_X = struct.unpack(endian + "I", file.read(4))[0]
-            span_Y = struct.unpack(endian + "I", file.read(4))[0]
-
-            skip_bytes = 0
-
-            metadata = ""
-
-        elif file_version == "f" or file_version == "e":
-
-            # First integer is the byte order
-            byte_order = struct.unpack("I", file.read(4))[0]
-
-            if byte_order == 439041101:
-                endian = "<"
+        header = read_cascade_header(file)
+    frames = map_cascade_frames(filepath, header)
+
+    # Write to a temporary name so an interrupted run never leaves a partial .npy behind
+    tmp_path = output_path + ".part"
+    output = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=np.uint16, shape=frames.shape
+    )
+    for t in range(0, len(frames), chunk_frames):
+        output[t : t + chunk_frames] = frames[t : t + chunk_frames]
+    output.flush()
+    del output
+    os.replace(tmp_path, output_path)
+
+    sidecar = dict(header["metadata"])
+    sidecar.update(
+        filename=os.path.basename(filepath),
+        span_T=len(frames),
+        span_X=header["span_X"],
+        span_Y=header["span_Y"],
+    )
+    write_sidecar(output_path, sidecar)
+
+    return output_path
+
+
+def find_dat_files(paths, recursive=False):
+    """Expand a list of files / directories into the .dat files they contain"""
+    for path in paths:
+        if os.path.isdir(path):
+            if recursive:
+                for root, _, files in os.walk(path):
+                    for f in sorted(files):
+                        if f.lower().endswith(".dat"):
+                            yield os.path.join(root, f)
             else:
-                endian = ">"
-
-            # Next three integers are the span
-            span_T = struct.unpack(endian + "I", file.read(4))[0]
-            span_X = struct.unpack(endian + "I", file.read(4))[0]
-            span_Y = struct.unpack(endian + "I", file.read(4))[0]
-
-            # Skip 8 bytes
-            file.read(8)
-            framerate = struct.unpack(endian + "I", file.read(4))[0] / 100
-            datetime = file.read(24).decode().rstrip("\x00")
-            metadata = file.read(971).decode().rstrip("\x00")
-
-            skip_bytes = 8
-
-        bstream = file.read()
-
-    # TODO Sort out chunking here and make it more elegant
-
-    len_file = len(bstream)
-    raw_image_data = list(struct.unpack("H" * (len_file // 2), bstream))
-
-    skip = skip_bytes / 2  # Because each long integer is 2 bytes)
-    output_file = open(filename, "wb'")
-
-    for t in range(span_T):
-
-        position = int(t * (span_X * span_Y + skip))
-
-        im_raw = raw_image_data[position : position + span_X * span_Y]
-
-        output_file.write(struct.pack("H" * len(im_raw), *im_raw))
-
-    output_file.close()
+                for f in sorted(os.listdir(path)):
+                    if f.lower().endswith(".dat"):
+                        yield os.path.join(path, f)
+        else:
+            yield path
+
+
+def convert_all(filepaths, output_dir=None, workers=None, chunk_frames=CHUNK_SIZE, overwrite=False):
+    """Convert many files in parallel with a process pool. Returns the number of failures."""
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    failures = 0
+    with cf.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(cascade_import, f, output_dir, chunk_frames, overwrite): f
+            for f in filepaths
+        }
+        for future in cf.as_completed(futures):
+            filepath = futures[future]
+            try:
+                output_path = future.result()
+            except Exception as e:
+                failures += 1
+                print("Error converting", filepath, ":", e)
+                continue
+            if output_path is None:
+                print("Skipped", filepath, "(output exists)")
+            else:
+                print("Converted", filepath, "->", output_path)
+    return failures
 
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
+    parser = argparse.ArgumentParser(description="Convert cascade .dat recordings to .npy")
 
-    # Required positional argument
-    parser.add_argument("filepath", help="Path to the .dat file")
+    parser.add_argument("paths", nargs="+", help="Paths to .dat files or directories of .dat files")
+    parser.add_argument("-o", "--output-dir", help="Directory to write to. Defaults to next to each input")
+    parser.add_argument("-j", "--workers", type=int, help="Number of parallel processes. Defaults to the CPU count")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Search directories recursively")
+    parser.add_argument("--chunk-frames", type=int, default=CHUNK_SIZE, help="Frames copied at a time")
+    parser.add_argument("--overwrite", action="store_true", help="Replace existing outputs")
 
     args = parser.parse_args()
-    cascade_import(**vars(args))
+    filepaths = list(find_dat_files(args.paths, args.recursive))
+    failures = convert_all(filepaths, args.output_dir, args.workers, args.chunk_frames, args.overwrite)
+    raise SystemExit(1 if failures else 0)
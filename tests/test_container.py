@@ -0,0 +1,107 @@
+import gc
+import pickle
+
+import numpy as np
+
+from cardiacmap.model.container import (
+    ChunkedArray,
+    SignalContainer,
+    is_signal_container,
+    load_signal,
+    save_signal,
+    write_signal_container,
+)
+from cardiacmap.model.data import CardiacSignal
+
+
+def make_signal(seed=0, shape=(70, 20, 18)):
+    rng = np.random.default_rng(seed)
+    data = rng.integers(1000, 4000, shape).astype(np.uint16)
+    return CardiacSignal(data, {"filename": "test.dat", "framerate": 500}, "Single")
+
+
+def test_chunked_array_indexing(tmp_path):
+    data = np.arange(70 * 20 * 18, dtype=np.float32).reshape(70, 20, 18)
+    path = str(tmp_path / "arrays.signal")
+    write_signal_container(path, {"data": data}, {}, {}, chunk_shape=(16, 8, 8))
+
+    with SignalContainer(path) as container:
+        array = container["data"]
+        assert isinstance(array, ChunkedArray)
+        assert array.shape == data.shape and array.dtype == data.dtype
+        np.testing.assert_array_equal(array[10:40], data[10:40])
+        np.testing.assert_array_equal(array[:, 5, 17], data[:, 5, 17])
+        np.testing.assert_array_equal(array[-1, 3:19, 2], data[-1, 3:19, 2])
+        np.testing.assert_array_equal(array[::3, 1], data[::3, 1])
+        np.testing.assert_array_equal(array.read(threads=4), data)
+        assert array.min() == data.min() and array.max() == data.max()
+
+
+def test_signal_round_trip(tmp_path):
+    signal = make_signal()
+    signal.normalize(normalize_global=False)
+    signal.trim_data(2, 3)
+    mask = np.ones(signal.frame_shape)
+    mask[0, 0] = 0
+    signal.apply_mask(mask)
+    signal.apds = [np.array([1.5, 2.5], dtype=np.float32), np.array([], dtype=np.float32)]
+    signal.apd_indices = [np.array([[1, 2], [3, 4]], dtype=np.int64), np.array([7], dtype=np.int64)]
+    path = str(tmp_path / "test.signal")
+    save_signal(signal, path)
+    assert is_signal_container(path)
+
+    for lazy in (False, True):
+        loaded = load_signal(path, lazy=lazy)
+        np.testing.assert_array_equal(np.asarray(loaded.transformed_data), signal.transformed_data)
+        np.testing.assert_array_equal(loaded.mask, signal.mask)
+        assert loaded.trimmed == [2, 3]
+        assert loaded.signal_name == signal.signal_name
+        assert loaded.metadata == signal.metadata
+        assert [t["transform"] for t in loaded.transform_history] == ["normalize", "trim", "mask"]
+        for saved, original in zip(loaded.apds + loaded.apd_indices, signal.apds + signal.apd_indices):
+            assert saved.dtype == original.dtype and saved.shape == original.shape
+            np.testing.assert_array_equal(saved, original)
+
+
+def test_lazy_signal_closes_file_with_its_data(tmp_path):
+    path = str(tmp_path / "test.signal")
+    save_signal(make_signal(), path)
+
+    loaded = load_signal(path, lazy=True)
+    file = loaded.base_data.file
+    shared = loaded.share()
+    del loaded
+    gc.collect()
+    assert not file.closed
+    shared.transformed_data[0]
+
+    del shared
+    gc.collect()
+    assert file.closed
+
+
+def test_pickled_signal_fallback(tmp_path):
+    # a signal as pickled by older versions: transformed_data is a plain attribute,
+    # and nothing of the transform pipeline or undo history exists yet
+    signal = make_signal()
+    old = CardiacSignal.__new__(CardiacSignal)
+    old.__dict__.update(
+        {
+            k: v
+            for k, v in signal.__dict__.items()
+            if k not in ("pipeline", "history", "region_cache", "_changed_frames", "_transformed_data")
+        }
+    )
+    old.__dict__["transformed_data"] = np.asarray(signal.base_data, dtype=np.float32) * 2
+    old.__dict__["image_data"] = np.zeros(signal.base_data.shape)
+    path = str(tmp_path / "old.signal")
+    with open(path, "wb") as f:
+        pickle.dump(old, f)
+    assert not is_signal_container(path)
+
+    loaded = load_signal(path)
+    np.testing.assert_array_equal(loaded.transformed_data, old.__dict__["transformed_data"])
+    assert loaded.image_data.dtype == CardiacSignal.IMAGE_DTYPE
+    loaded.invert_data()
+    loaded.undo()
+    np.testing.assert_array_equal(loaded.transformed_data, old.__dict__["transformed_data"])
@@ -0,0 +1,109 @@
+import numpy as np
+
+from cardiacmap.model.data import CardiacSignal
+from cardiacmap.model.history import FrameDelta, TransformHistory, frame_union
+
+
+def make_signal(seed=0, shape=(40, 9, 8)):
+    rng = np.random.default_rng(seed)
+    data = rng.integers(1000, 4000, shape).astype(np.uint16)
+    return CardiacSignal(data, {"filename": "test.dat"}, "Single")
+
+
+def test_undo_redo_each_kind_of_step():
+    signal = make_signal()
+    states = [np.array(signal.transformed_data, dtype=np.float32)]
+    # FrameDelta, Affine (invert, normalize) and Snapshot (trim) steps
+    signal.perform_average("time", sig=1, rad=3, mode="Uniform", start=2, end=30)
+    states.append(signal.transformed_data.copy())
+    signal.invert_data()
+    states.append(signal.transformed_data.copy())
+    signal.normalize(normalize_global=False, start=5, end=25)
+    states.append(signal.transformed_data.copy())
+    signal.trim_data(3, 2)
+    states.append(signal.transformed_data.copy())
+
+    for expected in reversed(states[:-1]):
+        signal.undo()
+        np.testing.assert_allclose(signal.transformed_data, expected, rtol=1e-5, atol=1e-3)
+    assert not signal.inverted and signal.trimmed == [0, 0]
+
+    for expected in states[1:]:
+        signal.redo()
+        np.testing.assert_allclose(signal.transformed_data, expected, rtol=1e-5, atol=1e-3)
+    assert signal.inverted and signal.trimmed == [3, 2]
+
+
+def test_undo_across_compaction():
+    signal = make_signal()
+    mask = np.zeros(signal.frame_shape)
+    mask[2:7, 1:6] = 1
+
+    signal.perform_average("spatial", sig=1, rad=2, mode="Gaussian")
+    before_mask = signal.transformed_data.copy()
+    signal.apply_mask(mask, compact=True)
+    assert signal.pixels is not None
+    compacted = np.array(signal.transformed_data)
+    signal.normalize(normalize_global=False)
+    normalized = np.array(signal.transformed_data)
+
+    signal.undo()
+    np.testing.assert_allclose(np.array(signal.transformed_data), compacted, rtol=1e-5, atol=1e-3)
+    signal.undo()
+    assert signal.pixels is None
+    np.testing.assert_allclose(signal.transformed_data, before_mask, rtol=1e-5, atol=1e-3)
+
+    signal.redo()
+    signal.redo()
+    assert signal.pixels is not None
+    np.testing.assert_allclose(np.array(signal.transformed_data), normalized, rtol=1e-5, atol=1e-3)
+
+
+def test_grouped_steps_undo_together():
+    signal = make_signal()
+    original = np.array(signal.transformed_data, dtype=np.float32)
+    with signal.history.grouped():
+        signal.perform_average("time", sig=1, rad=3, mode="Uniform")
+        signal.normalize(normalize_global=False)
+    signal.transformed_data
+
+    assert len(signal.history.undo_steps) == 1
+    signal.undo()
+    np.testing.assert_allclose(signal.transformed_data, original, rtol=1e-5, atol=1e-3)
+    assert not signal.history.can_undo()
+
+
+def test_budget_keeps_latest_step():
+    data = np.zeros((10, 4, 4), dtype=np.float32)
+    step_bytes = data.nbytes
+    history = TransformHistory(budget=2 * step_bytes)
+    steps = [FrameDelta(data, 0, 10) for _ in range(3)]
+    for step in steps:
+        history.push(step)
+    assert list(history.undo_steps) == steps[1:]
+
+    history.budget = 0
+    history.evict()
+    assert list(history.undo_steps) == steps[2:]
+
+
+def test_changed_frames_follow_the_steps():
+    signal = make_signal()
+    signal.transformed_data
+    signal.take_changed_frames()
+    assert signal.take_changed_frames() is None
+
+    signal.normalize(normalize_global=False, start=5, end=12)
+    signal.transformed_data
+    assert signal.take_changed_frames() == (5, 12)
+
+    signal.undo()
+    assert signal.take_changed_frames() == (5, 12)
+
+    signal.trim_data(1, 1)
+    signal.transformed_data
+    assert signal.take_changed_frames() == (0, None)
+
+    assert frame_union([None, (3, 5), (1, 4)]) == (1, 5)
+    assert frame_union([(3, None), (1, 4)]) == (1, None)
+    assert frame_union([None]) is None
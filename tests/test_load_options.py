@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from cardiacmap.model.load_options import Decimator, LoadOptions, read_reduced_frames, reduced_size
+
+
+def decimate(frames, factor, chunk_frames):
+    decimator = Decimator(factor)
+    out = [decimator.push(frames[i : i + chunk_frames]) for i in range(0, len(frames), chunk_frames)]
+    out.append(decimator.flush())
+    return np.concatenate(out)
+
+
+@pytest.mark.parametrize("factor", [2, 3, 5])
+def test_decimation_does_not_depend_on_block_size(factor):
+    rng = np.random.default_rng(0)
+    frames = rng.normal(size=(301, 3, 2)).astype(np.float32)
+
+    whole = decimate(frames, factor, len(frames))
+    assert len(whole) == -(-len(frames) // factor)
+    for chunk_frames in (1, 7, 64):
+        np.testing.assert_allclose(decimate(frames, factor, chunk_frames), whole, rtol=1e-5, atol=1e-6)
+
+
+def test_decimation_keeps_slow_signals():
+    t = np.arange(400, dtype=np.float32)
+    frames = (np.sin(2 * np.pi * t / 100)[:, None, None] + 2) * np.ones((1, 2, 2), dtype=np.float32)
+    out = decimate(frames, 4, 50)
+    # constant DC gain, no time shift: kept frames are the input's every 4th frame
+    np.testing.assert_allclose(out[5:-5], frames[::4][5:-5], atol=1e-2)
+
+
+def test_decimation_removes_aliasing_frequencies():
+    t = np.arange(800, dtype=np.float32)
+    # above the Nyquist frequency after decimating by 4
+    frames = np.sin(2 * np.pi * 0.2 * t)[:, None, None].astype(np.float32)
+    out = decimate(frames, 4, 100)
+    assert np.abs(out[10:-10]).max() < 0.05
+
+
+def test_flush_without_frames():
+    assert len(Decimator(3).flush()) == 0
+
+
+def test_reduced_frames_match_reduced_size(tmp_path):
+    frames = np.arange(20 * 9 * 7, dtype=np.uint16).reshape(20, 9, 7)
+    path = str(tmp_path / "frames.npy")
+    np.save(path, frames)
+    options = LoadOptions(binning=2, decimation=3)
+
+    (reduced,) = read_reduced_frames(path, options, 0, len(frames), chunk_frames=6)
+    assert reduced.shape == (7,) + reduced_size(9, 7, options)
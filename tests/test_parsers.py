@@ -0,0 +1,152 @@
+import struct
+import zipfile
+
+import numpy as np
+import pytest
+
+from cardiacmap.model.npy import SIGNAL_LAYOUT, map_numpy_array, map_numpy_frames
+from cardiacmap.model.sidecar import write_sidecar
+from cardiacmap.model.tiff import map_tiff_frames, read_tiff_frames, read_tiff_header
+
+
+def write_tiff(path, frames, endian="<", sample_format=None, description=None, strips=1):
+    """Minimal uncompressed multi-page TIFF: each page's strips, then its directory"""
+    frames = np.asarray(frames).astype(frames.dtype.newbyteorder(endian))
+    n_rows, n_cols = frames.shape[1:]
+    rows_per_strip = -(-n_rows // strips)
+    with open(path, "wb") as f:
+        f.write((b"II" if endian == "<" else b"MM") + struct.pack(endian + "HI", 42, 0))
+        previous_link = 4
+        for page in frames:
+            # pixel data aligned to 8 bytes, as writers do
+            f.write(b"\x00" * (-f.tell() % 8))
+            strip_offsets, strip_counts = [], []
+            for r in range(0, n_rows, rows_per_strip):
+                data = page[r : r + rows_per_strip].tobytes()
+                strip_offsets.append(f.tell())
+                strip_counts.append(len(data))
+                f.write(data)
+
+            extra = b""
+            ifd_offset = f.tell()
+            entries = [
+                (256, 4, 1, n_cols),
+                (257, 4, 1, n_rows),
+                (258, 3, 1, frames.dtype.itemsize * 8),
+                (259, 3, 1, 1),
+                (277, 3, 1, 1),
+            ]
+            n_entries = 7 + (sample_format is not None) + (description is not None)
+            extra_offset = ifd_offset + 2 + 12 * n_entries + 4
+
+            def array_entry(tag, values):
+                nonlocal extra
+                if len(values) == 1:
+                    return (tag, 4, 1, values[0])
+                offset = extra_offset + len(extra)
+                extra += struct.pack(f"{endian}{len(values)}I", *values)
+                return (tag, 4, len(values), offset)
+
+            entries.append(array_entry(273, strip_offsets))
+            entries.append(array_entry(279, strip_counts))
+            if sample_format is not None:
+                entries.append((339, 3, 1, sample_format))
+            if description is not None:
+                text = description.encode() + b"\x00"
+                entries.append((270, 2, len(text), extra_offset + len(extra)))
+                extra += text
+            entries.sort()
+
+            f.write(struct.pack(endian + "H", len(entries)))
+            for tag, kind, count, value in entries:
+                value = struct.pack(endian + ("HH" if kind == 3 else "I"), *((value, 0) if kind == 3 else (value,)))
+                f.write(struct.pack(endian + "HHI", tag, kind, count) + value)
+            f.write(struct.pack(endian + "I", 0))
+            f.write(extra)
+
+            end = f.tell()
+            f.seek(previous_link)
+            f.write(struct.pack(endian + "I", ifd_offset))
+            previous_link = ifd_offset + 2 + 12 * n_entries
+            f.seek(end)
+
+
+@pytest.mark.parametrize("endian", ["<", ">"])
+@pytest.mark.parametrize("dtype", [np.uint16, np.int16, np.float32, np.uint8])
+def test_tiff_stack_is_memory_mapped(tmp_path, endian, dtype):
+    frames = (np.arange(5 * 6 * 7) % 200).astype(dtype).reshape(5, 6, 7)
+    sample_format = {"u": 1, "i": 2, "f": 3}[np.dtype(dtype).kind]
+    path = tmp_path / "stack.tif"
+    write_tiff(path, frames, endian, sample_format=sample_format)
+
+    with open(path, "rb") as f:
+        header = read_tiff_header(f)
+    assert (header["span_T"], header["span_X"], header["span_Y"]) == frames.shape
+    assert header["dtype"] == np.dtype(dtype).newbyteorder(endian)
+
+    mapped = map_tiff_frames(str(path), header)
+    assert mapped is not None
+    np.testing.assert_array_equal(mapped, frames)
+    np.testing.assert_array_equal(read_tiff_frames(str(path), header, 1, 4), frames[1:4])
+
+
+def test_tiff_pages_in_several_strips_are_read(tmp_path):
+    frames = np.arange(3 * 8 * 5, dtype=np.uint16).reshape(3, 8, 5)
+    path = tmp_path / "strips.tif"
+    write_tiff(path, frames, strips=3, description="ImageJ=1.54\nimages=3\nfinterval=0.002\n")
+
+    with open(path, "rb") as f:
+        header = read_tiff_header(f)
+    assert header["metadata"]["framerate"] == pytest.approx(500)
+    np.testing.assert_array_equal(read_tiff_frames(str(path), header), frames)
+
+
+def test_tiff_unsupported_sample_format(tmp_path):
+    path = tmp_path / "complex.tif"
+    write_tiff(path, np.zeros((2, 4, 4), dtype=np.uint16), sample_format=6)
+    with open(path, "rb") as f, pytest.raises(ValueError, match="SampleFormat"):
+        read_tiff_header(f)
+
+
+def test_not_a_tiff(tmp_path):
+    path = tmp_path / "junk.tif"
+    path.write_bytes(b"not a tiff file")
+    with open(path, "rb") as f, pytest.raises(ValueError):
+        read_tiff_header(f)
+
+
+def test_npy_is_memory_mapped(tmp_path):
+    frames = np.arange(4 * 3 * 5, dtype=np.uint16).reshape(4, 3, 5)
+    path = str(tmp_path / "frames.npy")
+    np.save(path, frames)
+    array = map_numpy_array(path)
+    assert isinstance(array, np.memmap)
+    np.testing.assert_array_equal(array, frames)
+
+
+def test_npz_members(tmp_path):
+    frames = np.arange(4 * 3 * 5, dtype=np.float32).reshape(4, 3, 5)
+
+    stored = str(tmp_path / "stored.npz")
+    np.savez(stored, other=np.zeros(3), data=frames)
+    array = map_numpy_array(stored)
+    assert isinstance(array, np.memmap)
+    np.testing.assert_array_equal(array, frames)
+
+    compressed = str(tmp_path / "compressed.npz")
+    np.savez_compressed(compressed, frames=frames)
+    with zipfile.ZipFile(compressed) as archive:
+        assert archive.getinfo("frames.npy").compress_type == zipfile.ZIP_DEFLATED
+    np.testing.assert_array_equal(map_numpy_array(compressed), frames)
+
+
+def test_signal_layout_is_swapped_back(tmp_path):
+    frames = np.arange(4 * 3 * 5, dtype=np.float32).reshape(4, 3, 5)
+    path = str(tmp_path / "exported.npy")
+    np.save(path, frames.transpose(0, 2, 1))
+    write_sidecar(path, {"layout": SIGNAL_LAYOUT})
+    np.testing.assert_array_equal(map_numpy_frames(path), frames)
+
+    np.save(path, frames[0])
+    with pytest.raises(ValueError):
+        map_numpy_frames(path)
@@ -0,0 +1,107 @@
+import numpy as np
+
+from cardiacmap.model import pipeline
+from cardiacmap.model.data import CardiacSignal
+from cardiacmap.model.pipeline import Region, RegionCache
+
+
+def make_signal(seed=0, shape=(80, 14, 11)):
+    rng = np.random.default_rng(seed)
+    data = rng.integers(1000, 4000, shape).astype(np.uint16)
+    return CardiacSignal(data, {"filename": "test.dat"}, "Single")
+
+
+def transform(signal):
+    signal.perform_average("spatial", sig=1, rad=2, mode="Gaussian")
+    signal.perform_average("time", sig=1, rad=3, mode="Uniform", start=5, end=70)
+    signal.invert_data()
+    signal.butterworth(order=3, low=1, high=100, ms=2)
+    signal.trim_data(4, 6)
+
+
+def test_region_matches_eager():
+    lazy, eager = make_signal(), make_signal()
+    transform(lazy)
+    transform(eager)
+    data = eager.transformed_data
+
+    assert lazy.pipeline
+    assert lazy.frame_count == len(data)
+    np.testing.assert_allclose(lazy.transformed_region[:, 3, 7], data[:, 3, 7], rtol=1e-5, atol=1e-3)
+    np.testing.assert_allclose(lazy.transformed_region[10], data[10], rtol=1e-5, atol=1e-3)
+    np.testing.assert_allclose(
+        lazy.transformed_region[20:30, 0:4, 8:11], data[20:30, 0:4, 8:11], rtol=1e-5, atol=1e-3
+    )
+    # regions are evaluated without running the pipeline over the recording
+    assert lazy.pipeline
+    np.testing.assert_allclose(lazy.transformed_data, data, rtol=1e-5, atol=1e-3)
+
+
+def test_full_input_transform_runs_before_region():
+    lazy, eager = make_signal(), make_signal()
+    for signal in (lazy, eager):
+        signal.normalize(normalize_global=True)
+        signal.trim_data(3, 3)
+
+    trace = lazy.transformed_region[:, 2, 2]
+    # the global normalize was run, the trim after it is still pending
+    assert len(lazy.pipeline) == 1
+    np.testing.assert_allclose(trace, eager.transformed_data[:, 2, 2], rtol=1e-5, atol=1e-6)
+
+
+def test_preview_matches_applying_the_ops():
+    signal, applied = make_signal(), make_signal()
+    ops = [pipeline.Average("spatial", 1, 2, "Gaussian", 0, 79, signal.mask), pipeline.Trim(2, 5)]
+    preview = signal.preview(ops, 5, 6)
+
+    applied.perform_average("spatial", sig=1, rad=2, mode="Gaussian", start=0, end=79)
+    applied.trim_data(2, 5)
+    np.testing.assert_allclose(preview, applied.transformed_data[:, 5, 6], rtol=1e-5, atol=1e-3)
+    # nothing was recorded
+    assert not signal.pipeline and not signal.transform_history
+
+
+def test_undo_pending_transform_drops_it():
+    signal = make_signal()
+    signal.invert_data()
+    assert len(signal.pipeline) == 1
+    signal.undo()
+    assert not signal.pipeline
+    np.testing.assert_array_equal(signal.transformed_data, signal.base_data)
+
+
+def test_region_cache_evicts_least_recently_used():
+    block = np.zeros(100, dtype=np.float32)
+    cache = RegionCache(max_bytes=3 * block.nbytes)
+    for key in "abc":
+        cache.put(key, block.copy())
+    cache.get("a")
+    cache.put("d", block.copy())
+
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in "acd")
+    assert cache.nbytes == 3 * block.nbytes
+
+    cache.put("e", np.zeros(1000, dtype=np.float32))
+    assert cache.get("e") is None
+
+
+def test_region_cache_reuses_prefix():
+    data = np.arange(6 * 3 * 4, dtype=np.float32).reshape(6, 3, 4)
+    calls = []
+
+    class Counting(pipeline.Trim):
+        def apply(self, block, in_region, out_region):
+            calls.append(in_region)
+            return super().apply(block, in_region, out_region)
+
+    trim = Counting(1, 1)
+    cache = RegionCache()
+    region = Region(0, 2, 1, 2, 0, 4)
+    first = pipeline.evaluate_region(data, [trim], region, cache, key=0)
+    np.testing.assert_array_equal(first, data[1:3, 1:2, 0:4])
+
+    # the cached output of [trim] is the input of the next operation
+    second = pipeline.evaluate_region(data, [trim, pipeline.Trim(0, 1)], region, cache, key=0)
+    assert len(calls) == 1
+    np.testing.assert_array_equal(second, first)
@@ -0,0 +1,46 @@
+from cardiacmap.model.planner import USAGE_THRESHOLD, frame_nbytes, large_file_check, plan_load
+
+
+def test_frame_cost():
+    resident = frame_nbytes(128, 128, itemsize=2, mapped=False)
+    mapped = frame_nbytes(128, 128, itemsize=2, mapped=True)
+    assert resident - mapped == 128 * 128 * 2
+
+
+def test_fits_in_memory():
+    per_frame = frame_nbytes(64, 64)
+    plan = plan_load(1000, 64, 64, free_mem=int(1000 * per_frame / USAGE_THRESHOLD) + 1)
+    assert plan.strategy == "memory"
+    assert plan.footprint == 1000 * per_frame
+    assert plan.max_frames == 1000
+
+
+def test_mapping_when_only_that_fits():
+    free_mem = int(1000 * frame_nbytes(64, 64, mapped=True) / USAGE_THRESHOLD) + 1
+    assert plan_load(1000, 64, 64, free_mem=free_mem).strategy is None
+    assert plan_load(1000, 64, 64, mappable=True, free_mem=free_mem).strategy == "mmap"
+
+
+def test_too_large():
+    per_frame = frame_nbytes(64, 64, mapped=True)
+    plan = plan_load(1000, 64, 64, mappable=True, free_mem=int(400 * per_frame / USAGE_THRESHOLD))
+    assert plan.strategy is None
+    assert plan.max_frames == 400
+
+
+def test_large_file_check_only_asks_when_nothing_fits(monkeypatch):
+    asked = []
+
+    def popup(n_frames, max_frames):
+        asked.append((n_frames, max_frames))
+        return 100, 300
+
+    monkeypatch.setattr("psutil.virtual_memory", lambda: type("Memory", (), {"available": 2**40})())
+    assert large_file_check("rec.dat", popup, 1000, 64, 64) == (0, 0)
+    assert not asked
+
+    monkeypatch.setattr("psutil.virtual_memory", lambda: type("Memory", (), {"available": 2**20})())
+    assert large_file_check("rec.dat", popup, 1000, 64, 64) == (100, 200)
+    assert asked and asked[0][0] == 1000
+
+    assert large_file_check("rec.dat", lambda *args: (None, None), 1000, 64, 64) is None
@@ -0,0 +1,139 @@
+import os
+
+import numpy as np
+import pytest
+
+from cardiacmap.model import session
+from cardiacmap.model.container import SignalContainer, load_signal
+from cardiacmap.model.data import CardiacSignal
+from cardiacmap.model.session import (
+    Autosave,
+    SessionChanged,
+    SessionSnapshot,
+    SessionWriter,
+    session_path,
+)
+
+
+def make_signal(seed=0, shape=(200, 32, 32)):
+    rng = np.random.default_rng(seed)
+    data = rng.integers(1000, 4000, shape).astype(np.uint16)
+    return CardiacSignal(data, {"filename": "rec.dat"}, "Single")
+
+
+def data_digests(path):
+    with SignalContainer(path) as container:
+        return container.header["arrays"]["data"]["digests"]
+
+
+def test_first_write_then_append_changed_chunks(tmp_path):
+    signal = make_signal()
+    signal.transformed_data = np.asarray(signal.base_data, dtype=np.float32)
+    writer = SessionWriter(session_path(str(tmp_path), signal))
+
+    assert writer.write(SessionSnapshot(signal))
+    assert not os.path.exists(writer.filepath + ".part")
+    digests = data_digests(writer.filepath)
+    size = os.path.getsize(writer.filepath)
+
+    # nothing changed: nothing is written
+    assert not writer.write(SessionSnapshot(signal))
+    assert os.path.getsize(writer.filepath) == size
+
+    # frames 70-80 lie in the second row of (64, 16, 16) chunks
+    signal.normalize(normalize_global=False, start=70, end=80)
+    signal.transformed_data
+    assert writer.write(SessionSnapshot(signal))
+    changed = [i for i, (a, b) in enumerate(zip(digests, data_digests(writer.filepath))) if a != b]
+    assert changed == [4, 5, 6, 7]
+    # only those chunks and a new header were appended
+    assert os.path.getsize(writer.filepath) - size < size / 2
+
+    loaded = load_signal(writer.filepath)
+    np.testing.assert_array_equal(loaded.transformed_data, signal.transformed_data)
+    assert loaded.transform_history == signal.transform_history
+
+
+def test_only_changed_frames_are_read(tmp_path, monkeypatch):
+    signal = make_signal()
+    signal.transformed_data = np.asarray(signal.base_data, dtype=np.float32)
+    writer = SessionWriter(session_path(str(tmp_path), signal))
+    writer.write(SessionSnapshot(signal))
+
+    reads = []
+    check = SessionSnapshot.check
+    monkeypatch.setattr(SessionSnapshot, "check", lambda self: reads.append(1) or check(self))
+    signal.normalize(normalize_global=False, start=130, end=140)
+    signal.transformed_data
+    writer.write(SessionSnapshot(signal))
+    # one row of 4 chunks, then the check before the header is written
+    assert len(reads) == 5
+
+
+def test_data_changing_mid_write_leaves_file(tmp_path):
+    signal = make_signal()
+    writer = SessionWriter(session_path(str(tmp_path), signal))
+    writer.write(SessionSnapshot(signal))
+    with open(writer.filepath, "rb") as f:
+        before = f.read()
+
+    signal.invert_data()
+    signal.transformed_data
+    snapshot = SessionSnapshot(signal)
+    signal._data_changed(None)
+    with pytest.raises(SessionChanged):
+        writer.write(snapshot)
+    with open(writer.filepath, "rb") as f:
+        assert f.read() == before
+
+    # the frames of the failed write are written by the next one
+    assert writer.write(SessionSnapshot(signal))
+    np.testing.assert_array_equal(load_signal(writer.filepath).transformed_data, signal.transformed_data)
+
+
+def test_stale_file_is_rewritten(tmp_path, monkeypatch):
+    monkeypatch.setattr(session, "COMPACT_SLACK_BYTES", 0)
+    signal = make_signal()
+    signal.transformed_data = np.asarray(signal.base_data, dtype=np.float32)
+    writer = SessionWriter(session_path(str(tmp_path), signal))
+    writer.write(SessionSnapshot(signal))
+    size = os.path.getsize(writer.filepath)
+
+    for _ in range(3):
+        signal.invert_data()
+        signal.transformed_data
+        writer.write(SessionSnapshot(signal))
+    # appending every chunk three times would have quadrupled the file
+    assert os.path.getsize(writer.filepath) < 3 * size
+    np.testing.assert_array_equal(load_signal(writer.filepath).transformed_data, signal.transformed_data)
+
+
+def test_writer_resumes_existing_file(tmp_path):
+    signal = make_signal()
+    path = session_path(str(tmp_path), signal)
+    SessionWriter(path).write(SessionSnapshot(signal))
+    size = os.path.getsize(path)
+
+    # a new writer reads every chunk again, but only writes a new header
+    signal.signal_name = "renamed"
+    assert SessionWriter(path).write(SessionSnapshot(signal))
+    assert os.path.getsize(path) - size < 4096
+    with SignalContainer(path) as container:
+        assert container.state["signal_name"] == "renamed"
+
+
+def test_autosave_skips_pending_transforms(tmp_path):
+    signal = make_signal()
+    autosave = Autosave(signal, str(tmp_path))
+    other = Autosave(signal.share(), str(tmp_path))
+    assert autosave.filepath != other.filepath
+
+    signal.invert_data()
+    assert not autosave.request()
+    assert signal.pipeline
+
+    signal.transformed_data
+    assert autosave.request()
+    autosave.wait()
+    with SignalContainer(autosave.filepath) as container:
+        assert container.state["transform_history"] == [{"transform": "invert"}]